@@ -0,0 +1,246 @@
+import math
+
+import networkx as nx
+import pandas as pd
+
+
+MEMBER = "member"
+TEAM = "team"
+ROLE = "role"
+
+DIRECT = "direct"
+
+# networkx needs scipy for spring_layout above 500 nodes
+SPRING_LAYOUT_LIMIT = 500
+
+
+def node_id(kind, key):
+    return f"{kind}:{key}"
+
+
+def split_node_id(node):
+    kind, _, key = node.partition(":")
+    return kind, key
+
+
+def valid_team_roles(team_keys, team_role_keys, role_keys):
+    # team key -> the roles it grants that the account has, teams can name deleted roles
+    return {team: [role for role in roles if role in role_keys] for team, roles in zip(team_keys, team_role_keys)}
+
+
+def effective_access(direct_roles, team_list, team_roles, role_keys):
+    # role key -> [DIRECT and/or team keys] of one member; deleted roles and teams
+    # missing from team_roles are skipped
+    access = {}
+    for role in direct_roles:
+        if role in role_keys:
+            access.setdefault(role, []).append(DIRECT)
+    for team in team_list:
+        for role in team_roles.get(team, ()):
+            access.setdefault(role, []).append(team)
+    return access
+
+
+class AccessGraph:
+    # Directed graph member -> role (direct), member -> team and team -> role.
+    # Effective access, per-role reach, degree statistics and the role/team
+    # layout are computed once so that exploring a single node stays cheap.
+
+    def __init__(self, members_df, teams_df, roles_df, member_access=None):
+        # member_access can be passed in when it was already resolved, e.g. by the member workers
+        self.graph = nx.DiGraph()
+        self.member_labels = dict(zip(members_df['_id'], members_df['email'] if 'email' in members_df else members_df['_id']))
+
+        self.graph.add_nodes_from((node_id(ROLE, key), {"kind": ROLE}) for key in roles_df['key'])
+        self.graph.add_nodes_from((node_id(TEAM, key), {"kind": TEAM}) for key in teams_df['key'])
+        self.graph.add_nodes_from((node_id(MEMBER, _id), {"kind": MEMBER}) for _id in members_df['_id'])
+
+        # references to deleted roles and to teams the teams table does not have are left
+        # out, so every node has a kind
+        role_keys = set(roles_df['key'])
+        team_roles = valid_team_roles(teams_df['key'], teams_df['customRoleKeys'], role_keys)
+        self.graph.add_edges_from((node_id(TEAM, team), node_id(ROLE, role), {"kind": "grants"})
+                                  for team, roles in team_roles.items() for role in roles)
+
+        # member id -> {role key -> [DIRECT and/or team keys]}
+        resolve = member_access is None
+        self.member_access = {} if resolve else member_access
+        for member_id, direct_roles, team_list in zip(members_df['_id'], members_df['customRoles'], members_df['team_list']):
+            member = node_id(MEMBER, member_id)
+            for role in direct_roles:
+                if role in role_keys:
+                    self.graph.add_edge(member, node_id(ROLE, role), kind=DIRECT)
+            for team in team_list:
+                if team in team_roles:
+                    self.graph.add_edge(member, node_id(TEAM, team), kind="member_of")
+            if resolve:
+                self.member_access[member_id] = effective_access(direct_roles, team_list, team_roles, role_keys)
+
+        self.role_reach = self._compute_role_reach(roles_df['key'])
+        self.degree_stats = self._compute_degree_stats()
+        self._layout = None
+
+    def _compute_role_reach(self, role_keys):
+        reach = {key: {"direct": 0, "via_team": 0, "total": 0} for key in role_keys}
+        for access in self.member_access.values():
+            for role, paths in access.items():
+                counts = reach.setdefault(role, {"direct": 0, "via_team": 0, "total": 0})
+                counts["total"] += 1
+                if DIRECT in paths:
+                    counts["direct"] += 1
+                if any(path != DIRECT for path in paths):
+                    counts["via_team"] += 1
+        return reach
+
+    def role_reach_df(self):
+        df = pd.DataFrame.from_dict(self.role_reach, orient='index')
+        df.index.name = 'role'
+        return df.sort_values('total', ascending=False).reset_index()
+
+    def _compute_degree_stats(self):
+        rows = []
+        for kind in (MEMBER, TEAM, ROLE):
+            nodes = [node for node, data in self.graph.nodes(data=True) if data["kind"] == kind]
+            if kind == ROLE:
+                # for roles the interesting degree is how many members and teams hold them
+                degrees = [self.graph.in_degree(node) for node in nodes]
+            elif kind == TEAM:
+                degrees = [self.graph.in_degree(node) + self.graph.out_degree(node) for node in nodes]
+            else:
+                degrees = [self.graph.out_degree(node) for node in nodes]
+            series = pd.Series(degrees, dtype=float)
+            rows.append({
+                "kind": kind,
+                "nodes": len(nodes),
+                "mean_degree": round(series.mean(), 2) if len(series) else 0,
+                "median_degree": series.median() if len(series) else 0,
+                "max_degree": series.max() if len(series) else 0,
+                "isolated": int((series == 0).sum()),
+            })
+        return pd.DataFrame(rows)
+
+    def member_paths(self, member_id):
+        rows = []
+        for role, paths in sorted(self.member_access.get(member_id, {}).items()):
+            for path in paths:
+                rows.append({"role": role, "via": "direct" if path == DIRECT else f"team {path}"})
+        return pd.DataFrame(rows, columns=["role", "via"])
+
+    def role_paths(self, role_key):
+        role = node_id(ROLE, role_key)
+        rows = []
+        if role not in self.graph:
+            return pd.DataFrame(rows, columns=["member", "via"])
+
+        for source in self.graph.predecessors(role):
+            kind, key = split_node_id(source)
+            if kind == MEMBER:
+                rows.append({"member": self.member_labels.get(key, key), "via": "direct"})
+            else:
+                for member in self.graph.predecessors(source):
+                    member_id = split_node_id(member)[1]
+                    rows.append({"member": self.member_labels.get(member_id, member_id), "via": f"team {key}"})
+        return pd.DataFrame(rows, columns=["member", "via"])
+
+    def layout(self):
+        # only the comparatively small role/team skeleton is laid out, members
+        # are placed on rings around the selected node at render time
+        if self._layout is None:
+            skeleton = self.graph.subgraph(
+                node for node, data in self.graph.nodes(data=True) if data["kind"] != MEMBER).to_undirected()
+            if skeleton.number_of_nodes() == 0:
+                self._layout = {}
+            elif skeleton.number_of_nodes() <= SPRING_LAYOUT_LIMIT:
+                scale = 200 * math.sqrt(skeleton.number_of_nodes())
+                self._layout = nx.spring_layout(skeleton, seed=42, scale=scale)
+            else:
+                self._layout = self._ring_layout(skeleton)
+        return self._layout
+
+    def _ring_layout(self, skeleton):
+        # spring_layout needs scipy and O(n^2) memory beyond a few hundred nodes;
+        # instead roles go on a circle grouped by connected component and each
+        # team sits at the mean position of the roles it grants
+        roles = []
+        for component in sorted(nx.connected_components(skeleton), key=len, reverse=True):
+            roles.extend(sorted(node for node in component if skeleton.nodes[node]["kind"] == ROLE))
+
+        radius = 200 * math.sqrt(skeleton.number_of_nodes())
+        layout = {}
+        for index, role in enumerate(roles):
+            theta = 2 * math.pi * index / len(roles)
+            layout[role] = (radius * math.cos(theta), radius * math.sin(theta))
+
+        for node, data in skeleton.nodes(data=True):
+            if data["kind"] != TEAM:
+                continue
+            points = [layout[role] for role in skeleton.neighbors(node) if role in layout]
+            if points:
+                layout[node] = (0.6 * sum(x for x, _ in points) / len(points),
+                                0.6 * sum(y for _, y in points) / len(points))
+            else:
+                layout[node] = (0.0, 0.0)
+        return layout
+
+    def label(self, node):
+        kind, key = split_node_id(node)
+        if kind == MEMBER:
+            return self.member_labels.get(key, key)
+        return key
+
+    def neighborhood(self, node, max_neighbors=40):
+        # returns (nodes, edges); neighbors of one kind beyond max_neighbors are
+        # folded into a single aggregate node so huge roles stay renderable
+        if node not in self.graph:
+            return [], []
+
+        neighbors = {}
+        for other in list(self.graph.predecessors(node)) + list(self.graph.successors(node)):
+            neighbors.setdefault(split_node_id(other)[0], []).append(other)
+
+        nodes = [{"id": node, "kind": split_node_id(node)[0], "label": self.label(node), "center": True}]
+        edges = []
+        for kind, others in sorted(neighbors.items()):
+            others = sorted(set(others), key=lambda other: -self.graph.degree(other))
+            for other in others[:max_neighbors]:
+                nodes.append({"id": other, "kind": kind, "label": self.label(other), "center": False})
+                if self.graph.has_edge(node, other):
+                    edges.append((node, other))
+                else:
+                    edges.append((other, node))
+
+            hidden = len(others) - max_neighbors
+            if hidden > 0:
+                aggregate = f"{node}:more:{kind}"
+                nodes.append({"id": aggregate, "kind": kind, "label": f"+{hidden} {kind}s", "center": False,
+                              "aggregate": True})
+                edges.append((aggregate, node) if kind == MEMBER else (node, aggregate))
+
+        return nodes, edges
+
+    def positions(self, nodes):
+        # the center goes to the origin and each kind of neighbor on its own ring;
+        # within a ring, roles and teams keep the angular order of the precomputed
+        # layout so related nodes stay next to each other between selections
+        layout = self.layout()
+        if not nodes:
+            return {}
+
+        center = nodes[0]["id"]
+        cx, cy = layout.get(center, (0.0, 0.0))
+
+        def angle(node):
+            if node in layout:
+                x, y = layout[node]
+                return math.atan2(y - cy, x - cx)
+            return 0.0
+
+        positions = {center: (0.0, 0.0)}
+        rings = {TEAM: (250, 0.0), ROLE: (450, 0.3), MEMBER: (650, 0.6)}
+        for kind, (radius, phase) in rings.items():
+            ring = sorted((n["id"] for n in nodes[1:] if n["kind"] == kind), key=angle)
+            radius += 4 * len(ring)
+            for index, other in enumerate(ring):
+                theta = 2 * math.pi * index / len(ring) + phase
+                positions[other] = (radius * math.cos(theta), radius * math.sin(theta))
+        return positions
@@ -0,0 +1,45 @@
+import streamlit as st
+import plotly.express as px
+
+from multi_account import COMPARISON_METRICS, compare_metrics
+
+
+class AccountsTab:
+    def __init__(self, results):
+        self.results = results
+        self.comparison = compare_metrics(results)
+
+    def _render_errors(self):
+        for result in self.results:
+            if result.error is not None:
+                st.error(f"{result.name}: {result.error}")
+
+    def _render_comparison_chart(self):
+        metric = st.selectbox("Metric", COMPARISON_METRICS, key="accounts_metric")
+
+        df = self.comparison[self.comparison['error'].isna()].reset_index()
+        fig = px.bar(df, x='account', y=metric, color='account',
+                     labels={"account": "Account", metric: metric},
+                     title=f"{metric} by Account")
+        st.plotly_chart(fig, theme="streamlit")
+
+    def _render_comparison_table(self):
+        st.markdown(f'##### Accounts:{len(self.results)}')
+        st.dataframe(self.comparison.drop(columns=['error']), use_container_width=True)
+
+    def render(self):
+        self._render_errors()
+        col1, col2 = st.columns([0.5, 0.5])
+        with col1:
+            self._render_comparison_chart()
+        with col2:
+            self._render_comparison_table()
+
+    def get_account(self, name):
+        for result in self.results:
+            if result.name == name:
+                return result
+        return None
+
+    def account_names(self):
+        return [result.name for result in self.results if result.error is None]
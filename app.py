@@ -1,76 +1,112 @@
-from ldapiclient import LaunchDarklyAPIClient
-from transformer import Transformer
-from custom_utils import Utils
 import streamlit as st
 
-from roles_tab import RolesTab
-from members_tab import MembersTab
-from teams_tab import TeamsTab
 from app_config import AppConfig
-from zipfile import ZipFile
-import io
-import json
-from faker import Faker
+import os
+
+# pandas, plotly.express, requests, duckdb and Faker are imported on first use inside
+# the functions below, so the header and inputs render before they are loaded.
+# benchmarks/import_budget.py guards this.
+
+# seconds raw API data is reused before it is fetched again
+DATA_TTL = 300
 
 
 class DetailsTab:
-    def __init__(self, transformer):
+    views = ["Roles", "Members", "Teams", "Access Graph", "What-If", "Role Mining", "Privileges", "SQL"]
+
+    def __init__(self, transformer, trends_store=None, account='default', audit_log_path=None,
+                 audit_log_workers=1):
+        self.transformer = transformer
+        self.trends_store = trends_store
+        self.account = account
+        self.audit_log_path = audit_log_path
+        self.audit_log_workers = audit_log_workers
+
         self.roles = transformer.get_roles_df()
         self.members = transformer.get_members_df()
         self.teams = transformer.get_teams_df()
         self.metrics = transformer.get_summary_metrics()
 
-        self.roles_tab = RolesTab(
-            roles=self.roles, metrics=self.metrics, members=self.members, teams=self.teams)
-        self.members_tab = MembersTab(
-            roles=self.roles, metrics=self.metrics, members=self.members, teams=self.teams)
-        self.teams_tab = TeamsTab(
-            roles=self.roles, metrics=self.metrics, members=self.members, teams=self.teams)
+        # tabs are built on first view and kept, so their cached data survives reruns
+        self._tabs = {}
+
+    def get_views(self):
+        return self.views + (["Permission Usage"] if self.audit_log_path else []) \
+            + (["Trends"] if self.trends_store is not None else [])
+
+    def _create_tab(self, view):
+        tab_args = dict(roles=self.roles, metrics=self.metrics, members=self.members, teams=self.teams)
+        if view == "Roles":
+            from roles_tab import RolesTab
+            return RolesTab(**tab_args, statements=self.transformer.get_policy_index().statements)
+        if view == "Members":
+            from members_tab import MembersTab
+            return MembersTab(**tab_args)
+        if view == "Teams":
+            from teams_tab import TeamsTab
+            return TeamsTab(**tab_args)
+        if view == "Access Graph":
+            from graph_tab import GraphTab
+            return GraphTab(self.transformer)
+        if view == "What-If":
+            from what_if_tab import WhatIfTab
+            return WhatIfTab(self.transformer, account=self.account)
+        if view == "Role Mining":
+            from role_mining_tab import RoleMiningTab
+            return RoleMiningTab(self.transformer)
+        if view == "Privileges":
+            from privilege_tab import PrivilegeTab
+            return PrivilegeTab(self.transformer)
+        if view == "SQL":
+            from sql_tab import SQLTab
+            return SQLTab(self.transformer)
+        if view == "Permission Usage":
+            from permission_usage_tab import PermissionUsageTab
+            return PermissionUsageTab(self.transformer, self.audit_log_path, self.audit_log_workers)
+        if view == "Trends":
+            from trends_tab import TrendsTab
+            return TrendsTab(self.trends_store, account=self.account)
+        return None
+
+    def get_tab(self, view):
+        if view not in self._tabs:
+            self._tabs[view] = self._create_tab(view)
+        return self._tabs[view]
 
     def show_roles_tab(self):
-        self.roles_tab.render()
+        self.get_tab("Roles").render()
 
     def show_members_tab(self):
-        self.members_tab.render()
+        self.get_tab("Members").render()
 
     def show_teams_tab(self):
-        self.teams_tab.render()
-
-
-@st.cache_data(show_spinner=False, ttl=300)
-def _fetch_remote(_app_config=None):
-    client = LaunchDarklyAPIClient(_app_config.access_token, _app_config.debug)
-    output_dir = _app_config.output_dir
+        self.get_tab("Teams").render()
 
-    ld_data = {
-        "teams": client.list_teams(),
-        "roles": client.list_custom_roles(),
-        "members": client.list_members(),
-    }
+    def show(self, view):
+        self.get_tab(view).render()
 
-    if not _app_config.save_data:
-        return ld_data
 
-    teams_json = f"{output_dir}/teams.json"
-    roles_json = f"{output_dir}/roles.json"
-    members_json = f"{output_dir}/members.json"
+@st.cache_data(show_spinner=False, ttl=DATA_TTL)
+def _fetch_remote(_app_config=None):
+    from data_source import fetch_remote
+    return fetch_remote(_app_config)
 
-    client.save_data_to_file(ld_data['teams'], teams_json)
-    client.save_data_to_file(ld_data['roles'], roles_json)
-    client.save_data_to_file(ld_data['members'], members_json)
 
-    return ld_data
+def _fetch_local(_app_config=None):
+    from data_source import fetch_local
+    return fetch_local(_app_config)
 
 
-def _fetch_local(_app_config=None):
-    output_dir = _app_config.output_dir
+@st.cache_data(show_spinner=False, ttl=DATA_TTL)
+def _analyze_accounts(accounts_file, _app_config=None):
+    from multi_account import analyze_accounts, load_accounts
 
-    ld_data = {
-        "teams": Utils.read_json_file(f"{output_dir}/teams.json"),
-        "roles":  Utils.read_json_file(f"{output_dir}/roles.json"),
-        "members": Utils.read_json_file(f"{output_dir}/members.json")
-    }
-    return ld_data
+    accounts = load_accounts(accounts_file)
+    return analyze_accounts(accounts,
+                            output_dir=_app_config.output_dir,
+                            save_data=_app_config.save_data,
+                            debug=_app_config.debug,
+                            max_workers=_app_config.max_workers)
 
 
 def get_data(app_config=None):
@@ -89,9 +125,87 @@ def get_data(app_config=None):
     return ld_data
 
 
+@st.cache_resource(show_spinner=False)
+def _get_shared_cache(cache_dir, max_mb, _secret=None):
+    from shared_cache import SharedCache
+    return SharedCache(cache_dir, _secret, max_mb=max_mb)
+
+
+def _transform(ld_data, app_config):
+    from transformer import Transformer
+
+    transformer = Transformer(save=app_config.save_data, ld_data=ld_data, workers=app_config.member_workers)
+    transformer.process(output_dir=app_config.output_dir)
+    return transformer
+
+
+def _analysis_compute(app_config):
+    # fetch and transform, through the shared cache when it is configured
+    from data_source import fetch_data, is_complete
+
+    def compute():
+        ld_data = fetch_data(app_config)
+        if not is_complete(ld_data):
+            raise ValueError("unable to load teams, roles and members data")
+        return ld_data, _transform(ld_data, app_config)
+
+    if not app_config.shared_cache_dir:
+        return compute
+
+    cache = _get_shared_cache(app_config.shared_cache_dir, app_config.shared_cache_max_mb,
+                              app_config.shared_cache_secret)
+    key = analysis_key(app_config)
+    return lambda: cache.get_or_compute(key, compute, cacheable=lambda value: is_complete(value[0]))
+
+
+def analysis_key(app_config):
+    # account and data version, concurrent users of an account cost one fetch and one transform
+    from refresher import token_fingerprint
+    from shared_cache import cache_key, local_data_version, remote_data_version
+
+    if app_config.read_local:
+        return cache_key("local", os.path.abspath(app_config.output_dir), local_data_version(app_config.output_dir))
+    return cache_key("remote", token_fingerprint(app_config.access_token), remote_data_version(DATA_TTL))
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _shared_analysis(key, _app_config=None):
+    # sessions of this process share the loaded entry, other processes share the cache files
+    return _analysis_compute(_app_config)()
+
+
+def get_shared_analysis(app_config):
+    return _shared_analysis(analysis_key(app_config), app_config)
+
+
+@st.cache_data(show_spinner=False, ttl=DATA_TTL)
+def _get_preview(key, _app_config=None):
+    from data_source import fetch_preview, is_complete
+    from preview import estimate_preview
+
+    ld_data = fetch_preview(_app_config, _app_config.preview_pages)
+    if not is_complete(ld_data) or (ld_data['failed_pages'] and not ld_data['member_pages']):
+        return None
+    return estimate_preview(ld_data['teams'], ld_data['roles'], ld_data['member_pages'], ld_data['total_members'],
+                            failed_pages=ld_data['failed_pages'])
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _get_exact_pass(key, _app_config=None):
+    import copy
+    from preview import BackgroundPass
+
+    # private copy, the UI rebinds access_token on the shared config object
+    return BackgroundPass(_analysis_compute(copy.copy(_app_config))).start()
+
+
 def anonymize_data(data):
+    import copy
+    from faker import Faker
+
     fake = Faker()
-    cp_data = data.copy()
+    # the members are shared with the cached analysis and other sessions, only the copy is changed
+    cp_data = copy.deepcopy(data)
     for item in cp_data:
         item['firstName'] = fake.first_name(
         ) if item.get('firstName') else None
@@ -101,30 +215,235 @@ def anonymize_data(data):
     return cp_data
 
 
+def build_export(ld_data, anonymous_export=True):
+    from zipfile import ZipFile
+    import io
+    import json
+    from member_records import json_default
+
+    zip_buffer = io.BytesIO()
+    with ZipFile(zip_buffer, "w") as zipf:
+        for key, value in ld_data.items():
+            tmp_data = value
+
+            if anonymous_export and key == 'members':
+                tmp_data = anonymize_data(value)
+
+            zipf.writestr(
+                f"{key}.json", json.dumps(tmp_data, indent=4, default=json_default))
+
+    return zip_buffer
+
+
+@st.cache_resource
+def _get_snapshot_store(db_path):
+    from snapshot_store import SnapshotStore
+    return SnapshotStore(db_path)
+
+
+def save_history(transformer, app_config, account='default'):
+    if not app_config.save_history:
+        return
+
+    from snapshot_store import history_db_path
+    store = _get_snapshot_store(history_db_path(app_config.output_dir))
+    store.save_snapshot(transformer, account=account)
+
+
+@st.cache_resource(show_spinner=False)
+def _get_refresher(fingerprint, _app_config=None):
+    from refresher import BackgroundRefresher
+    from snapshot_store import SnapshotStore, history_db_path
+
+    on_snapshot = None
+    if _app_config.save_history:
+        # the worker thread gets its own connection
+        on_snapshot = SnapshotStore(history_db_path(_app_config.output_dir)).save_snapshot
+
+    shared_cache = None
+    if _app_config.shared_cache_dir:
+        shared_cache = _get_shared_cache(_app_config.shared_cache_dir, _app_config.shared_cache_max_mb,
+                                         _app_config.shared_cache_secret)
+    refresher = BackgroundRefresher(_app_config,
+                                    interval=_app_config.refresh_interval,
+                                    on_snapshot=on_snapshot,
+                                    shared_cache=shared_cache)
+    refresher.start()
+    return refresher
+
+
+@st.fragment(run_every=2)
+def _wait_for_snapshot(refresher):
+    if refresher.current() is not None:
+        st.rerun()
+
+    if refresher.last_error is not None:
+        st.error(f"{refresher.last_error}")
+    st.info("Aligning our digital ducks in a row... the page will update once the data is loaded.")
+
+
+def _render_data_age(snapshot, refresher):
+    age_minutes = int(snapshot.age().total_seconds() // 60)
+    status = "refreshing..." if refresher.refreshing else f"next refresh in {refresher.interval // 60} min"
+    st.caption(f"Data as of {snapshot.loaded_at:%Y-%m-%d %H:%M:%S} ({age_minutes} min ago, {status})")
+
+    changes = snapshot.policy_changes
+    if changes and (changes['added_roles'] or changes['removed_roles'] or changes['changed_roles']):
+        st.caption(f"Policy changes since the previous refresh: {changes['changed_roles']} roles changed, "
+                   f"{changes['added_roles']} added, {changes['removed_roles']} removed")
+
+    if refresher.last_error is not None:
+        st.warning(f"Last refresh failed: {refresher.last_error}")
+
+
+def run_refreshed(app_config=None):
+    from refresher import token_fingerprint
+
+    refresher = _get_refresher(token_fingerprint(app_config.access_token), app_config)
+    snapshot = refresher.current()
+
+    if snapshot is None:
+        _wait_for_snapshot(refresher)
+        return
+
+    st.session_state.ld_data = snapshot.ld_data
+    _render_data_age(snapshot, refresher)
+    show_details(snapshot.transformer, app_config)
+
+
+@st.fragment
+def _render_details(details_tab):
+    # st.tabs renders every tab on the server, the selector only renders the open one.
+    # Running inside a fragment, switching views or using a tab's widgets reruns only this part.
+    view = st.radio("View", details_tab.get_views(), horizontal=True,
+                    label_visibility="collapsed", key=f"details_view_{details_tab.account}")
+    details_tab.show(view)
+
+
+def show_details(transformer, app_config, account='default'):
+    from snapshot_store import history_db_path
+
+    db_path = history_db_path(app_config.output_dir)
+    has_history = app_config.save_history or os.path.exists(db_path)
+    trends_store = _get_snapshot_store(db_path) if has_history else None
+
+    cache_key = f"details_tab_{account}"
+    details_tab = st.session_state.get(cache_key)
+    if details_tab is None or details_tab.transformer is not transformer:
+        details_tab = DetailsTab(transformer, trends_store=trends_store, account=account,
+                                 audit_log_path=app_config.audit_log_path,
+                                 audit_log_workers=app_config.audit_log_workers)
+        st.session_state[cache_key] = details_tab
+
+    _render_details(details_tab)
+
+
+@st.fragment(run_every=2)
+def _wait_for_exact_pass(exact_pass):
+    if exact_pass.done():
+        st.rerun()
+    st.caption("Computing the exact results... the page will update once they are ready.")
+
+
+def run_preview(app_config=None):
+    # reruns keep the key of the analysis the preview started, the token input may not be bound yet
+    key = st.session_state.get('exact_pass_key') or analysis_key(app_config)
+    st.session_state.exact_pass_key = key
+    exact_pass = _get_exact_pass(key, app_config)
+
+    if not exact_pass.done():
+        from preview_tab import PreviewTab
+
+        with st.spinner("Sampling member pages..."):
+            preview = _get_preview(key, app_config)
+        if preview is None:
+            st.warning("Unable to sample members, waiting for the full analysis.")
+        else:
+            PreviewTab(preview).render()
+        _wait_for_exact_pass(exact_pass)
+        return
+
+    if exact_pass.error is not None:
+        # dropped so the next run starts over
+        _get_exact_pass.clear()
+        st.session_state.exact_pass_key = None
+        st.error(f"Unable to load the data: {exact_pass.error}")
+        return
+
+    st.session_state.ld_data, transformer = exact_pass.result
+    save_history(transformer, app_config)
+    show_details(transformer, app_config)
+
+
+def run_accounts(app_config=None):
+    from accounts_tab import AccountsTab
+
+    loading_message = "Aligning our digital ducks in a row..."
+    with st.spinner(loading_message):
+        try:
+            results = _analyze_accounts(app_config.accounts_file, app_config)
+        except ValueError as e:
+            st.error(f"{e}")
+            return
+
+    accounts_tab = AccountsTab(results)
+    accounts_tab.render()
+
+    account_names = accounts_tab.account_names()
+    if len(account_names) == 0:
+        return
+
+    for name in account_names:
+        save_history(accounts_tab.get_account(name), app_config, account=name)
+
+    selected = st.selectbox("Account", account_names, key="selected_account")
+    show_details(accounts_tab.get_account(selected), app_config, account=selected)
+
+
 def run_main(app_config=None):
     st.session_state.ld_data = None
 
+    if app_config.accounts_file:
+        run_accounts(app_config)
+        return
+
+    if app_config.preview_pages > 0 and st.session_state.get('exact_pass_key'):
+        run_preview(app_config)
+        return
+
     if app_config.access_token == None and app_config.read_local is False:
         st.warning("Please enter your access token.")
         return
 
+    if app_config.refresh_interval > 0 and not app_config.read_local:
+        run_refreshed(app_config)
+        return
+
+    if app_config.preview_pages > 0:
+        run_preview(app_config)
+        return
+
     loading_message = "Aligning our digital ducks in a row..."
     with st.spinner(loading_message):
-        st.session_state.ld_data = get_data(app_config)
+        try:
+            if app_config.shared_cache_dir:
+                st.session_state.ld_data, transformer = get_shared_analysis(app_config)
+            else:
+                from data_source import is_complete
 
-    transformer = Transformer(
-        save=app_config.save_data, ld_data=st.session_state.ld_data)
+                st.session_state.ld_data = get_data(app_config)
+                if not is_complete(st.session_state.ld_data):
+                    # not kept for the TTL, the next run fetches again
+                    _fetch_remote.clear()
+                    raise ValueError("unable to load teams, roles and members data")
+                transformer = _transform(st.session_state.ld_data, app_config)
+        except ValueError as e:
+            st.error(f"Unable to load the data: {e}")
+            return
 
-    transformer.process(output_dir=app_config.output_dir)
+    save_history(transformer, app_config)
 
-    roles_tab, members_tab, teams_tab = st.tabs(["Roles", "Members", "Teams"])
-    detailsTab = DetailsTab(transformer)
-    with roles_tab:
-        detailsTab.show_roles_tab()
-    with members_tab:
-        detailsTab.show_members_tab()
-    with teams_tab:
-        detailsTab.show_teams_tab()
+    show_details(transformer, app_config)
 
 
 if __name__ == "__main__":
@@ -141,7 +460,8 @@ if __name__ == "__main__":
         st.header("Policy Explorer")
         col1, col2 = st.columns([0.5, 1])
 
-        if app_config.read_local or st.session_state.get('download_clicked', False):
+        serve_refreshed = app_config.refresh_interval > 0 and app_config.access_token is not None
+        if app_config.read_local or app_config.accounts_file or serve_refreshed or st.session_state.get('exact_pass_key') or st.session_state.get('download_clicked', False):
             with content_container.container():
                 run_main(app_config)
                 if 'download_clicked' in st.session_state:
@@ -162,28 +482,23 @@ if __name__ == "__main__":
             subcol1, subcol2 = st.columns([0.2, 1])
 
             with subcol1:
-                if st.button("Analyze", key="execute_button",  on_click=lambda: st.session_state.update({'ld_data': None})):
+                if st.button("Analyze", key="execute_button",  on_click=lambda: st.session_state.update({'ld_data': None, 'exact_pass_key': None})):
                     with content_container.container():
                         analysis = run_main(app_config)
 
             with subcol2:
                 if st.session_state.get('ld_data', None) is not None:
-                    zip_buffer = io.BytesIO()
-                    with ZipFile(zip_buffer, "w") as zipf:
-                        for key, value in st.session_state.ld_data.items():
-                            tmp_data = value
-
-                            if app_config.anonymous_export and key == 'members':
-                                tmp_data = anonymize_data(value)
-
-                            zipf.writestr(
-                                f"{key}.json", json.dumps(tmp_data, indent=4))
-
-                    st.download_button(
-                        label="export",
-                        data=zip_buffer,
-                        file_name="policies.zip",
-                        mime="application/zip",
-                        on_click=lambda: st.session_state.update(
-                            {'download_clicked': True})
-                    )
+                    # the archive (and Faker for anonymizing) is only built once export is requested
+                    if st.session_state.get('export_requested', False):
+                        st.download_button(
+                            label="download",
+                            data=build_export(st.session_state.ld_data, app_config.anonymous_export),
+                            file_name="policies.zip",
+                            mime="application/zip",
+                            on_click=lambda: st.session_state.update(
+                                {'download_clicked': True, 'export_requested': False})
+                        )
+                    else:
+                        st.button("export", key="export_button",
+                                  on_click=lambda: st.session_state.update(
+                                      {'download_clicked': True, 'export_requested': True}))
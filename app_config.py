@@ -14,5 +14,28 @@ class AppConfig:
 
         self.output_dir = os.getenv("OUTPUT_DIR",'output')
 
+        self.save_history = os.getenv("SAVE_HISTORY",'False').lower() == 'true'
+
+        self.refresh_interval = int(os.getenv("REFRESH_INTERVAL", '0'))
+
+        self.accounts_file = os.getenv("ACCOUNTS_FILE")
+        self.max_workers = int(os.getenv("MAX_WORKERS", '0')) or None
+
+        self.shared_cache_dir = os.getenv("SHARED_CACHE_DIR")
+        self.shared_cache_max_mb = int(os.getenv("SHARED_CACHE_MAX_MB", '2048'))
+        # signs the pickled entries, other writers of the directory can not make the app load theirs
+        self.shared_cache_secret = os.getenv("SHARED_CACHE_SECRET")
+        if self.shared_cache_dir and not self.shared_cache_secret:
+            print("Error: SHARED_CACHE_DIR needs SHARED_CACHE_SECRET, the shared cache is disabled")
+            self.shared_cache_dir = None
+
+        self.preview_pages = int(os.getenv("PREVIEW_PAGES", '0'))
+
+        self.memory_budget_mb = int(os.getenv("MEMORY_BUDGET_MB", '0'))
+        self.member_workers = int(os.getenv("MEMBER_WORKERS", '1'))
+
+        self.audit_log_path = os.getenv("AUDIT_LOG_PATH")
+        self.audit_log_workers = int(os.getenv("AUDIT_LOG_WORKERS", '1'))
+
     def __str__(self) -> str:
-        return f"access_token={self.access_token}, debug={self.debug}, save_data={self.save_data}, read_local={self.read_local}, output_dir={self.output_dir}"
+        return f"access_token={self.access_token}, debug={self.debug}, save_data={self.save_data}, read_local={self.read_local}, output_dir={self.output_dir}, save_history={self.save_history}, refresh_interval={self.refresh_interval}, accounts_file={self.accounts_file}, max_workers={self.max_workers}, shared_cache_dir={self.shared_cache_dir}, shared_cache_max_mb={self.shared_cache_max_mb}, preview_pages={self.preview_pages}, memory_budget_mb={self.memory_budget_mb}, member_workers={self.member_workers}, audit_log_path={self.audit_log_path}, audit_log_workers={self.audit_log_workers}"
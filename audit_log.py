@@ -0,0 +1,571 @@
+import gzip
+import os
+from collections import Counter
+from typing import List, Optional
+
+from member_records import DECODE_ERRORS, loads
+from policy_index import pattern_regex, strip_tags
+from transformer import days_from_today
+
+try:
+    import msgspec
+except ImportError:
+    # optional, without it every line is decoded into a dict
+    msgspec = None
+
+
+# bytes read from a log per step, a step holds at most this much undecoded text
+READ_SIZE = 16 * 1024 * 1024
+# resources (and actions) whose matching statements are kept
+MATCH_CACHE_SIZE = 100_000
+# distinct (member, matched statements) pairs counted before they are credited to roles
+PENDING_SIZE = 100_000
+LOG_SUFFIXES = (".jsonl", ".json", ".ndjson", ".log", ".gz")
+
+def _segment_key(segment):
+    # "flag/my-flag" stays as is, "flag/*" or "flag/beta-*" becomes the wildcard of its type
+    kind, _, name = segment.partition("/")
+    return f"{kind}/*" if "*" in name else segment
+
+
+def _step(nodes, segment):
+    # children of trie nodes for the next resource segment, by name and by the wildcard of its type
+    wildcard = segment.partition("/")[0] + "/*"
+    return [child for node in nodes for child in (node[0].get(segment), node[0].get(wildcard)) if child is not None]
+
+
+def _bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class StatementMatcher:
+    # The distinct statements of a PolicyIndex as bit positions, like the RoleBitsets of
+    # role mining. A resource is matched against the distinct resource patterns through a
+    # trie over their segments ("proj/x", "env/*", ...) and an action against the distinct
+    # action names, each to the Python int bitset of the statements they allow or deny;
+    # an access matches the statements in both. Both are cached, logs repeat their resources.
+
+    def __init__(self, policy_index, role_order=None):
+        # Statements of the roles first in role_order get the lowest bits. With the most
+        # held roles first, most member bitsets stay a few machine words long.
+        self.digests = list(dict.fromkeys(digest for role_key in role_order or ()
+                                          for digest in policy_index.role_statements.get(role_key, ())))
+        self.digests += sorted(set(policy_index.statements) - set(self.digests))
+        index = {digest: position for position, digest in enumerate(self.digests)}
+        self.role_masks = {}
+        for role_key, hashes in policy_index.role_statements.items():
+            mask = 0
+            for digest in hashes:
+                mask |= 1 << index[digest]
+            self.role_masks[role_key] = mask
+
+        self.deny_mask = 0
+        resource_masks = {}
+        action_masks = {}
+        # notResources / notActions statements are tested one by one
+        self.not_resources = []
+        self.not_actions = []
+        for digest, statement in policy_index.statements.items():
+            bit = 1 << index[digest]
+            if statement.get("effect") == "deny":
+                self.deny_mask |= bit
+
+            if "notResources" in statement:
+                self.not_resources.append((pattern_regex(statement["notResources"] or []), bit))
+            for pattern in statement.get("resources") or []:
+                pattern = strip_tags(pattern)
+                resource_masks[pattern] = resource_masks.get(pattern, 0) | bit
+
+            if "notActions" in statement:
+                self.not_actions.append((pattern_regex(statement["notActions"] or []), bit))
+            for pattern in statement.get("actions") or []:
+                action_masks[pattern] = action_masks.get(pattern, 0) | bit
+
+        # node: [segment key -> child node, statements of the exact patterns ending here,
+        #        [(regex, statements)] of the patterns ending here that need their regex]
+        self.trie = [{}, 0, []]
+        # patterns with a wildcard resource type ("proj/x:*") are tested one by one
+        self.other_resources = []
+        for pattern, mask in resource_masks.items():
+            segments = pattern.split(":")
+            if any("*" in segment.partition("/")[0] for segment in segments):
+                self.other_resources.append((pattern_regex([pattern]), mask))
+                continue
+            node = self.trie
+            for segment in segments:
+                node = node[0].setdefault(_segment_key(segment), [{}, 0, []])
+            # the trie already matches whole-name wildcards, "beta-*" needs the regex
+            names = [segment.partition("/")[2] for segment in segments]
+            if all(name == "*" or "*" not in name for name in names):
+                node[1] |= mask
+            else:
+                node[2].append((pattern_regex([pattern]), mask))
+
+        self.action_names = {pattern: mask for pattern, mask in action_masks.items() if "*" not in pattern}
+        self.action_patterns = [(pattern_regex([pattern]), mask) for pattern, mask in action_masks.items() if "*" in pattern]
+
+        self._resources = {}
+        self._actions = {}
+        # resource prefix ("proj/x:env/y") -> trie nodes it reaches, shared by the resources below it
+        self._prefixes = {}
+
+    def _nodes(self, prefix):
+        nodes = self._prefixes.get(prefix)
+        if nodes is None:
+            nodes = [self.trie]
+            for segment in prefix.split(":"):
+                nodes = _step(nodes, segment)
+            if len(self._prefixes) >= MATCH_CACHE_SIZE:
+                self._prefixes.clear()
+            self._prefixes[prefix] = nodes
+        return nodes
+
+    def _resource_mask(self, resource):
+        stripped = strip_tags(resource)
+        prefix, _, last = stripped.rpartition(":")
+        parents = self._nodes(prefix) if prefix else [self.trie]
+        nodes = _step(parents, last)
+
+        shared = None
+        if not self.other_resources and not self.not_resources \
+                and not any(last in node[0] for node in parents) and not any(node[2] for node in nodes):
+            # no pattern names it, like every resource of its type below the prefix ("proj/x:env/y:flag/*")
+            shared = f"{prefix}:{last.partition('/')[0]}/*"
+            mask = self._resources.get(shared)
+            if mask is not None:
+                self._cache_resource(resource, mask)
+                return mask
+
+        mask = 0
+        for node in nodes:
+            mask |= node[1]
+            for regex, pattern_mask in node[2]:
+                if regex.fullmatch(stripped):
+                    mask |= pattern_mask
+        for regex, pattern_mask in self.other_resources:
+            if regex.fullmatch(stripped):
+                mask |= pattern_mask
+        for regex, bit in self.not_resources:
+            if regex.fullmatch(stripped) is None:
+                mask |= bit
+
+        if shared is not None:
+            self._cache_resource(shared, mask)
+        self._cache_resource(resource, mask)
+        return mask
+
+    def _cache_resource(self, resource, mask):
+        if len(self._resources) >= MATCH_CACHE_SIZE:
+            self._resources.clear()
+        self._resources[resource] = mask
+
+    def _action_mask(self, action):
+        mask = self.action_names.get(action, 0)
+        for regex, pattern_mask in self.action_patterns:
+            if regex.fullmatch(action):
+                mask |= pattern_mask
+        for regex, bit in self.not_actions:
+            if regex.fullmatch(action) is None:
+                mask |= bit
+        return mask
+
+    def match(self, action, resource):
+        # bitset of the statements matching an access
+        resource_mask = self._resources.get(resource)
+        if resource_mask is None:
+            resource_mask = self._resource_mask(resource)
+        action_mask = self._actions.get(action)
+        if action_mask is None:
+            if len(self._actions) >= MATCH_CACHE_SIZE:
+                self._actions.clear()
+            action_mask = self._actions[action] = self._action_mask(action)
+        return resource_mask & action_mask
+
+    def statements(self, mask):
+        return [self.digests[position] for position in _bits(mask)]
+
+
+if msgspec is not None:
+    # only the fields the usage needs are decoded, the rest of an entry is skipped
+    class _AuditMember(msgspec.Struct, gc=False):
+        _id: str = ""
+
+    class _AuditAccess(msgspec.Struct, gc=False):
+        action: str = ""
+        resource: str = ""
+
+    class _AuditEntry(msgspec.Struct, gc=False):
+        date: Optional[int] = None
+        member: Optional[_AuditMember] = None
+        accesses: List[_AuditAccess] = []
+
+    _entry_decoder = msgspec.json.Decoder(_AuditEntry)
+
+
+def audit_log_files(path):
+    # a log file, or the log files of a directory in name order
+    if not os.path.isdir(path):
+        return [path]
+    return [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(LOG_SUFFIXES)]
+
+
+def log_ranges(paths, parts):
+    # (file, start, end) byte ranges of about 1/parts of each file, split at line ends;
+    # end None reads to the end. Compressed files can not be split and stay one range.
+    ranges = []
+    for path in paths:
+        size = os.path.getsize(path)
+        if parts <= 1 or path.endswith(".gz") or size < parts * READ_SIZE // 4:
+            ranges.append((path, 0, None))
+            continue
+        starts = [0]
+        with open(path, "rb") as f:
+            for part in range(1, parts):
+                f.seek(max(part * size // parts, starts[-1]))
+                f.readline()
+                if f.tell() < size:
+                    starts.append(f.tell())
+        starts = sorted(set(starts))
+        ranges.extend((path, start, end) for start, end in zip(starts, starts[1:] + [None]))
+    return ranges
+
+
+def _read_lines(path, read_size, start=0, end=None):
+    # blocks of complete lines, the last partial line is carried into the next block
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        if start:
+            f.seek(start)
+        remaining = None if end is None else end - start
+        rest = b""
+        while True:
+            size = read_size if remaining is None else min(read_size, remaining)
+            data = f.read(size) if size > 0 else b""
+            if not data:
+                break
+            if remaining is not None:
+                remaining -= len(data)
+            end = data.rfind(b"\n")
+            if end < 0:
+                rest += data
+                continue
+            yield rest + data[:end + 1]
+            rest = data[end + 1:]
+        if rest.strip():
+            yield rest
+
+
+def _entry(item):
+    # (member id, date, [(action, resource)]) of a decoded line, None for entries without
+    # a member (API tokens and integrations)
+    if isinstance(item, dict):
+        member = item.get("member")
+        if not isinstance(member, dict) or not member.get("_id"):
+            return None
+        return member["_id"], item.get("date") or 0, [(access.get("action", ""), access.get("resource", ""))
+                                                      for access in item.get("accesses") or []
+                                                      if isinstance(access, dict)]
+    if item.member is None or not item.member._id:
+        return None
+    return item.member._id, item.date or 0, [(access.action, access.resource) for access in item.accesses]
+
+
+# marks lines that are not a JSON object
+INVALID = object()
+
+
+def _decode_block(block):
+    if msgspec is not None:
+        try:
+            return _entry_decoder.decode_lines(block)
+        except DECODE_ERRORS:
+            # retried line by line to skip only the bad lines
+            pass
+
+    items = []
+    for line in block.splitlines():
+        if not line.strip():
+            continue
+        try:
+            item = _entry_decoder.decode(line) if msgspec is not None else loads(line)
+        except DECODE_ERRORS:
+            item = INVALID
+        if msgspec is None and not isinstance(item, dict):
+            item = INVALID
+        items.append(item)
+    return items
+
+
+class AuditUsage:
+    # Granted vs. used permissions from audit-log entries. Each access of an entry is
+    # credited to the custom roles of its member (direct and through teams) whose allow
+    # statements match it, unless one of the member's roles denies it. Only counters per
+    # role, statement and member are kept, so memory does not grow with the log size.
+
+    def __init__(self, policy_index, member_access, member_labels=None):
+        self.policy_index = policy_index
+        self.member_roles = {member_id: tuple(access) for member_id, access in member_access.items()}
+        holders = Counter(role_key for roles in self.member_roles.values() for role_key in roles)
+        self.matcher = StatementMatcher(policy_index, [role_key for role_key, _ in holders.most_common()])
+        self.member_labels = member_labels or {}
+        # the member's roles with their statement bitsets, and all their statements
+        role_masks = self.matcher.role_masks
+        self._member_roles = {}
+        self._member_masks = {}
+        for member_id, roles in self.member_roles.items():
+            self._member_roles[member_id] = tuple((role_key, role_masks.get(role_key, 0)) for role_key in roles)
+            mask = 0
+            for role_key in roles:
+                mask |= role_masks.get(role_key, 0)
+            self._member_masks[member_id] = mask
+
+        self.reset()
+
+    def reset(self):
+        # (member id, action, resource) -> [accesses, last date]; accesses repeat, they are
+        # counted here and matched and credited to roles once per batch
+        self._pending = {}
+        # (role key, bitset of the role's statements matching an access) -> accesses
+        self.statement_hits = Counter()
+        self.role_uses = Counter()
+        # (member id, role key) -> date of the last access the role allowed
+        self.member_role_last_used = {}
+        self.member_actions = Counter()
+        self.member_last_action = {}
+        self.stats = Counter()
+        # statement uses merged from other AuditUsage counts, see merge_counts
+        self._merged_statement_uses = Counter()
+
+    def add(self, member_id, date, accesses):
+        self.stats["entries"] += 1
+        if member_id not in self._member_masks:
+            # members removed since, or of another account
+            self.stats["unknown_member_entries"] += 1
+            return
+
+        pending = self._pending
+        for action, resource in accesses:
+            key = (member_id, action, resource)
+            counts = pending.get(key)
+            if counts is None:
+                pending[key] = [1, date]
+            else:
+                counts[0] += 1
+                if date > counts[1]:
+                    counts[1] = date
+        if not accesses:
+            self.member_last_action[member_id] = max(date, self.member_last_action.get(member_id, date))
+        if len(pending) >= PENDING_SIZE:
+            self.flush()
+
+    def flush(self):
+        # credits the pending accesses to the member's roles, unless one of them denies it
+        match = self.matcher.match
+        deny_mask = self.matcher.deny_mask
+        member_masks = self._member_masks
+        member_roles = self._member_roles
+        member_actions = self.member_actions
+        member_last_action = self.member_last_action
+        role_uses = self.role_uses
+        statement_hits = self.statement_hits
+        last_used = self.member_role_last_used
+        accesses = base_role = denied = 0
+        for (member_id, action, resource), (count, date) in self._pending.items():
+            statements = match(action, resource) & member_masks[member_id]
+            accesses += count
+            member_actions[member_id] = member_actions.get(member_id, 0) + count
+            if date > member_last_action.get(member_id, -1):
+                member_last_action[member_id] = date
+
+            if not statements:
+                # allowed by the member's base role, not by a custom role
+                base_role += count
+                continue
+            if statements & deny_mask:
+                denied += count
+                continue
+
+            for role_key, role_mask in member_roles[member_id]:
+                hit = role_mask & statements
+                if not hit:
+                    continue
+                role_uses[role_key] = role_uses.get(role_key, 0) + count
+                key = (role_key, hit)
+                statement_hits[key] = statement_hits.get(key, 0) + count
+                key = (member_id, role_key)
+                if date > last_used.get(key, -1):
+                    last_used[key] = date
+
+        self.stats["accesses"] += accesses
+        self.stats["base_role_accesses"] += base_role
+        self.stats["denied_accesses"] += denied
+        self._pending.clear()
+
+    def statement_uses(self):
+        # (role key, statement hash) -> accesses the statement allowed for the role
+        uses = Counter(self._merged_statement_uses)
+        for (role_key, hit), count in self.statement_hits.items():
+            for digest in self.matcher.statements(hit):
+                uses[role_key, digest] += count
+        return uses
+
+    def ingest(self, path, read_size=READ_SIZE):
+        for file_path in audit_log_files(path):
+            self.ingest_range(file_path, read_size=read_size)
+        self.flush()
+        return self
+
+    def ingest_range(self, file_path, start=0, end=None, read_size=READ_SIZE):
+        for block in _read_lines(file_path, read_size, start, end):
+            self.stats["bytes"] += len(block)
+            for item in _decode_block(block):
+                if item is INVALID:
+                    self.stats["invalid_lines"] += 1
+                    continue
+                entry = _entry(item)
+                if entry is None:
+                    self.stats["entries_without_member"] += 1
+                    continue
+                self.add(*entry)
+
+    def counts(self):
+        # the counters of the accesses added so far, with statements by hash instead of
+        # bitset so that they merge into an AuditUsage of another process
+        self.flush()
+        return {
+            "statement_uses": self.statement_uses(),
+            "role_uses": self.role_uses,
+            "member_role_last_used": self.member_role_last_used,
+            "member_actions": self.member_actions,
+            "member_last_action": self.member_last_action,
+            "stats": self.stats,
+        }
+
+    def merge_counts(self, counts):
+        self._merged_statement_uses.update(counts["statement_uses"])
+        self.role_uses.update(counts["role_uses"])
+        self.member_actions.update(counts["member_actions"])
+        self.stats.update(counts["stats"])
+        for name in ("member_role_last_used", "member_last_action"):
+            last_dates = getattr(self, name)
+            for key, date in counts[name].items():
+                if date > last_dates.get(key, -1):
+                    last_dates[key] = date
+
+    def role_rows(self, today=None):
+        holders = Counter(role_key for roles in self.member_roles.values() for role_key in roles)
+        active = Counter(role_key for _, role_key in self.member_role_last_used)
+        last_used = {}
+        for (_, role_key), date in self.member_role_last_used.items():
+            last_used[role_key] = max(date, last_used.get(role_key, date))
+
+        statement_uses = self.statement_uses()
+        rows = []
+        for role_key, hashes in self.policy_index.role_statements.items():
+            allow = [digest for digest in dict.fromkeys(hashes)
+                     if self.policy_index.statements[digest].get("effect") != "deny"]
+            used = sum(1 for digest in allow if statement_uses[role_key, digest] > 0)
+            rows.append({
+                "role": role_key,
+                "members": holders[role_key],
+                "active_members": active[role_key],
+                "unused_members": holders[role_key] - active[role_key],
+                "allow_statements": len(allow),
+                "used_statements": used,
+                "unused_statements": len(allow) - used,
+                "accesses": self.role_uses[role_key],
+                "days_since_last_used": days_from_today(last_used[role_key], today) if role_key in last_used else None,
+            })
+        return rows
+
+    def member_rows(self, today=None):
+        rows = []
+        for member_id, roles in self.member_roles.items():
+            unused = [role_key for role_key in roles if (member_id, role_key) not in self.member_role_last_used]
+            last_action = self.member_last_action.get(member_id)
+            rows.append({
+                "member": self.member_labels.get(member_id, member_id),
+                "_id": member_id,
+                "roles": len(roles),
+                "used_roles": len(roles) - len(unused),
+                "unused_roles": unused,
+                "accesses": self.member_actions[member_id],
+                "days_since_last_action": days_from_today(last_action, today) if last_action is not None else None,
+            })
+        return rows
+
+    def statement_rows(self):
+        # one row per allow statement of a role, with the accesses it allowed
+        statement_uses = self.statement_uses()
+        rows = []
+        for role_key, hashes in self.policy_index.role_statements.items():
+            for digest in dict.fromkeys(hashes):
+                statement = self.policy_index.statements[digest]
+                if statement.get("effect") == "deny":
+                    continue
+                rows.append({
+                    "role": role_key,
+                    "statement": digest,
+                    "resources": ", ".join(statement.get("resources", statement.get("notResources", []))),
+                    "actions": ", ".join(statement.get("actions", statement.get("notActions", []))),
+                    "accesses": statement_uses[role_key, digest],
+                })
+        return rows
+
+    def summary(self):
+        roles = self.role_rows()
+        members_with_roles = [row for row in self.member_rows() if row["roles"] > 0]
+        return {
+            "entries": self.stats["entries"],
+            "accesses": self.stats["accesses"],
+            "invalid_lines": self.stats["invalid_lines"],
+            "entries_without_member": self.stats["entries_without_member"],
+            "unknown_member_entries": self.stats["unknown_member_entries"],
+            "denied_accesses": self.stats["denied_accesses"],
+            "base_role_accesses": self.stats["base_role_accesses"],
+            "unused_roles": sum(1 for row in roles if row["accesses"] == 0),
+            "unused_statements": sum(row["unused_statements"] for row in roles),
+            "members_with_unused_roles": sum(1 for row in members_with_roles if row["unused_roles"]),
+        }
+
+
+# the AuditUsage of a worker process, set once by _init_worker
+_worker_usage = None
+
+
+def _init_worker(policy_index, member_access):
+    global _worker_usage
+    _worker_usage = AuditUsage(policy_index, member_access)
+
+
+def _ingest_range(log_range):
+    _worker_usage.reset()
+    _worker_usage.ingest_range(*log_range)
+    return _worker_usage.counts()
+
+
+def audit_usage(transformer, paths, workers=1):
+    # workers > 1 reads byte ranges of the logs in that many processes, each with its own
+    # matcher, and merges their counters
+    graph = transformer.get_access_graph()
+    policy_index = transformer.get_policy_index()
+    usage = AuditUsage(policy_index, graph.member_access, graph.member_labels)
+    files = [file_path for path in paths for file_path in audit_log_files(path)]
+    if workers <= 1:
+        for file_path in files:
+            usage.ingest_range(file_path)
+        usage.flush()
+        return usage
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_worker,
+                             initargs=(policy_index, graph.member_access)) as executor:
+        for counts in executor.map(_ingest_range, log_ranges(files, workers)):
+            usage.merge_counts(counts)
+    return usage
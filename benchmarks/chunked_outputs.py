@@ -0,0 +1,172 @@
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from benchmarks.synthetic_org import generate_audit_log, generate_org, save_org
+
+
+# chunk size that splits the synthetic account into several chunks
+MEMORY_BUDGET_MB = 1
+WORKERS = 2
+MODES = {
+    "default": [],
+    "member-workers": ["--member-workers", str(WORKERS)],
+    "memory-budget": ["--memory-budget", str(MEMORY_BUDGET_MB)],
+    "memory-budget-workers": ["--memory-budget", str(MEMORY_BUDGET_MB), "--member-workers", str(WORKERS)],
+}
+# pairs of modes whose output files are byte for byte the same
+IDENTICAL = [("default", "member-workers"), ("memory-budget", "memory-budget-workers")]
+TRANSFORMED = ["metrics", "roles", "teams", "members"]
+# roles table column the chunked modes do not have, member ids per role are not kept
+CHUNKED_ONLY_MISSING = ["members"]
+
+
+def _at_noon(timestamp_ms):
+    # runs a few seconds apart then agree on the days since a member was last seen
+    if timestamp_ms is None:
+        return None
+    date = datetime.datetime.fromtimestamp(timestamp_ms / 1000).date()
+    return int(datetime.datetime.combine(date, datetime.time(12)).timestamp() * 1000)
+
+
+def stable_org(members, seed):
+    ld_data = generate_org(members, seed)
+    for member in ld_data["members"]:
+        member["_lastSeen"] = _at_noon(member["_lastSeen"])
+        member["creationDate"] = _at_noon(member["creationDate"])
+    return ld_data
+
+
+def _run(raw_dir, output_dir, options):
+    import cli
+
+    os.makedirs(output_dir)
+    for name in ("teams", "roles", "members"):
+        shutil.copy(f"{raw_dir}/{name}.json", output_dir)
+    return cli.main(["--local", "--output-dir", output_dir, "--quiet"] + options)
+
+
+def _read(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+
+def _read_bytes(filename):
+    with open(filename, "rb") as f:
+        return f.read()
+
+
+def _without_nulls(records):
+    # the members DataFrame has a column for every key, missing keys are written as null
+    return sorted((json.dumps({key: value for key, value in record.items() if value is not None}, sort_keys=True)
+                   for record in records))
+
+
+def check_transformer(data_dir):
+    # the parallel Transformer against the serial one, table by table
+    from app_config import AppConfig
+    from data_source import fetch_local
+    from transformer import Transformer
+
+    app_config = AppConfig()
+    app_config.read_local = True
+    app_config.output_dir = data_dir
+    serial = Transformer(ld_data=fetch_local(app_config))
+    serial.process()
+    parallel = Transformer(ld_data=fetch_local(app_config), workers=WORKERS)
+    parallel.process()
+
+    failures = []
+    for name in ("roles", "members", "teams"):
+        if not getattr(serial, f"get_{name}_df")().equals(getattr(parallel, f"get_{name}_df")()):
+            failures.append(f"Transformer(workers={WORKERS}): {name}_df differs from the serial run")
+    if serial.get_summary_metrics() != parallel.get_summary_metrics():
+        failures.append(f"Transformer(workers={WORKERS}): the summary metrics differ from the serial run")
+    if serial.get_access_graph().member_access != parallel.get_access_graph().member_access:
+        failures.append(f"Transformer(workers={WORKERS}): the effective access differs from the serial run")
+    return failures
+
+
+def _members_table_options(data_dir):
+    # options that need the full members table, the chunked modes reject them
+    return [["--sql", "SELECT count(*) FROM members"], ["--history"], ["--audit-log", f"{data_dir}/audit-log.jsonl"]]
+
+
+def check_outputs(data_dir):
+    # runs every mode on the same account and compares their outputs, returns the differences
+    # beyond the documented ones
+    failures = []
+    outputs = {}
+    for mode, options in MODES.items():
+        outputs[mode] = f"{data_dir}/{mode}"
+        if _run(data_dir, outputs[mode], options) != 0:
+            failures.append(f"{mode}: the run failed")
+    if failures:
+        return failures
+
+    for mode, other in IDENTICAL:
+        names = TRANSFORMED + (["member-activity"] if mode == "memory-budget" else [])
+        for name in names:
+            filename = f"transformed-{name}.json"
+            if _read_bytes(f"{outputs[mode]}/{filename}") != _read_bytes(f"{outputs[other]}/{filename}"):
+                failures.append(f"{other}: {filename} is not identical to {mode}")
+
+    for options in _members_table_options(data_dir):
+        run_dir = f"{outputs['member-workers']}-{options[0].strip('-')}"
+        if _run(data_dir, run_dir, MODES["member-workers"] + options) != 0:
+            failures.append(f"member-workers: {options[0]} failed")
+
+    default = outputs["default"]
+    for mode in ("memory-budget", "memory-budget-workers"):
+        output = outputs[mode]
+        for name in ("metrics", "teams"):
+            if _read(f"{output}/transformed-{name}.json") != _read(f"{default}/transformed-{name}.json"):
+                failures.append(f"{mode}: transformed-{name}.json differs from the default mode")
+
+        roles = [{key: value for key, value in role.items() if key not in CHUNKED_ONLY_MISSING}
+                 for role in _read(f"{default}/transformed-roles.json")]
+        if _read(f"{output}/transformed-roles.json") != roles:
+            failures.append(f"{mode}: transformed-roles.json differs beyond the {CHUNKED_ONLY_MISSING} columns")
+
+        members = _read(f"{output}/transformed-members.json")
+        if _without_nulls(members) != _without_nulls(_read(f"{default}/transformed-members.json")):
+            failures.append(f"{mode}: transformed-members.json holds other members than the default mode")
+
+        for options in _members_table_options(data_dir):
+            run_dir = f"{output}-{options[0].strip('-')}"
+            if _run(data_dir, run_dir, MODES[mode] + options) != 2:
+                failures.append(f"{mode}: {options[0]} was not rejected")
+    return failures
+
+
+def main(argv=None):
+    from transformer import MIN_SHARD_SIZE
+
+    parser = argparse.ArgumentParser(description="Check that --member-workers writes the same outputs as the "
+                                                 "default mode, and --memory-budget apart from the documented "
+                                                 "differences.")
+    parser.add_argument("--members", type=int, default=3 * MIN_SHARD_SIZE)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    if args.members <= MIN_SHARD_SIZE:
+        parser.error(f"--members must be over {MIN_SHARD_SIZE}, below that the Transformer does not use workers")
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        ld_data = stable_org(args.members, args.seed)
+        save_org(ld_data, data_dir)
+        generate_audit_log(ld_data, args.members, f"{data_dir}/audit-log.jsonl", args.seed)
+        failures = check_transformer(data_dir) + check_outputs(data_dir)
+
+    for failure in failures:
+        print(f"FAILED {failure}", file=sys.stderr)
+    if not failures:
+        print("parallel and chunked outputs match the default mode")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import argparse
+import sys
+import tempfile
+
+from benchmarks.synthetic_org import generate_org, save_org
+
+
+DELETED_ROLE = "deleted-role"
+DELETED_TEAM = "deleted-team"
+
+
+def add_dangling_refs(ld_data):
+    # teams granting a role that was deleted, and members in a team the teams table does not have,
+    # like an account changing between the fetches of its teams, roles and members
+    for team in ld_data["teams"][::3]:
+        team["customRoleKeys"] = team["customRoleKeys"] + [DELETED_ROLE]
+    for member in ld_data["members"][::5]:
+        member["teams"] = member["teams"] + [{"customRoleKeys": [DELETED_ROLE], "key": DELETED_TEAM,
+                                              "name": "Deleted Team"}]
+    return ld_data
+
+
+def check_graph(data_dir):
+    from access_graph import ROLE, TEAM, node_id
+    from app_config import AppConfig
+    from data_source import fetch_local
+    from transformer import Transformer
+
+    app_config = AppConfig()
+    app_config.read_local = True
+    app_config.output_dir = data_dir
+    transformer = Transformer(ld_data=fetch_local(app_config))
+    transformer.process()
+    graph = transformer.get_access_graph()
+
+    failures = []
+    if any("kind" not in data for _, data in graph.graph.nodes(data=True)):
+        failures.append("the access graph has nodes without a kind")
+    for node in (node_id(ROLE, DELETED_ROLE), node_id(TEAM, DELETED_TEAM)):
+        if node in graph.graph:
+            failures.append(f"the access graph has a node for {node}")
+    if any(DELETED_ROLE in access for access in graph.member_access.values()):
+        failures.append(f"member access includes {DELETED_ROLE}")
+    if DELETED_ROLE in graph.role_reach:
+        failures.append(f"role reach includes {DELETED_ROLE}")
+    graph.layout()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that the access graph and the views built on it "
+                                                 "skip teams and roles that members and teams refer to "
+                                                 "but the account does not have.")
+    parser.add_argument("--members", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from benchmarks.details_views import check_views
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        save_org(add_dangling_refs(generate_org(args.members, args.seed)), data_dir)
+        failures = check_graph(data_dir)
+        if not failures:
+            failures = check_views(data_dir, None)
+
+    for failure in failures:
+        print(f"FAILED {failure}", file=sys.stderr)
+    if not failures:
+        print("dangling team and role references are skipped")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
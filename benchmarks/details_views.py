@@ -0,0 +1,73 @@
+import argparse
+import os
+import sys
+import tempfile
+import traceback
+
+from benchmarks.synthetic_org import generate_audit_log, generate_org, save_org
+
+
+def _sources(data_dir):
+    # a Transformer like the single-account app, and the AccountResult of multi-account mode
+    from app_config import AppConfig
+    from data_source import fetch_local
+    from multi_account import AccountSpec, analyze_account
+    from transformer import Transformer
+
+    app_config = AppConfig()
+    app_config.read_local = True
+    app_config.output_dir = data_dir
+    transformer = Transformer(ld_data=fetch_local(app_config))
+    transformer.process()
+
+    result = analyze_account(AccountSpec("check", snapshot_dir=data_dir))
+    if result.error is not None:
+        raise RuntimeError(f"unable to analyze the synthetic account: {result.error}")
+    return [("Transformer", transformer), ("AccountResult", result)]
+
+
+def check_views(data_dir, audit_log_path):
+    # builds and renders every DetailsTab view outside a Streamlit server, widgets keep their defaults
+    from streamlit.logger import set_log_level
+
+    # without a server Streamlit logs a warning per cached function and call
+    set_log_level("error")
+    from app import DetailsTab
+    from snapshot_store import SnapshotStore, history_db_path
+
+    trends_store = SnapshotStore(history_db_path(data_dir))
+    failures = []
+    for name, source in _sources(data_dir):
+        details_tab = DetailsTab(source, trends_store=trends_store, account="check", audit_log_path=audit_log_path)
+        for view in details_tab.get_views():
+            try:
+                details_tab.get_tab(view).render()
+            except Exception:
+                failures.append(f"{name} {view}:\n{traceback.format_exc()}")
+            else:
+                print(f"{name:<14} {view:<18} ok")
+    trends_store.close()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that every details view renders from a Transformer "
+                                                 "and from a multi-account AccountResult.")
+    parser.add_argument("--members", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        ld_data = generate_org(args.members, args.seed)
+        save_org(ld_data, data_dir)
+        audit_log_path = os.path.join(data_dir, "audit-log.jsonl")
+        generate_audit_log(ld_data, args.members * 5, audit_log_path, args.seed)
+        failures = check_views(data_dir, audit_log_path)
+
+    for failure in failures:
+        print(f"FAILED {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import argparse
+import os
+import subprocess
+import sys
+
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# cumulative import time allowed per entry point, and modules it must not load eagerly
+IMPORT_BUDGETS = {
+    "app": {
+        "max_ms": 1500,
+        "forbidden": ["pandas", "plotly.express", "requests", "faker", "duckdb", "networkx"],
+    },
+    "cli": {
+        "max_ms": 2000,
+        "forbidden": ["streamlit", "plotly", "faker", "duckdb", "networkx"],
+    },
+}
+
+
+def measure_import(module):
+    # -X importtime reports per-module microseconds on stderr, the target module is the last entry
+    code = f"import sys, {module}; print(','.join(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=PROJECT_DIR, capture_output=True, text=True, check=True)
+
+    cumulative_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line.split("|")
+        if fields[-1].strip() == module:
+            cumulative_us = int(fields[1])
+
+    loaded = set(result.stdout.strip().split(","))
+    return cumulative_us / 1000, loaded
+
+
+def check_module(module, budget, runs):
+    elapsed_ms = None
+    loaded = set()
+    # the fastest of several runs, the first one pays for cold file caches
+    for _ in range(runs):
+        ms, loaded = measure_import(module)
+        elapsed_ms = ms if elapsed_ms is None else min(elapsed_ms, ms)
+
+    violations = []
+    if elapsed_ms > budget["max_ms"]:
+        violations.append(f"{module}: import took {elapsed_ms:.0f}ms, budget is {budget['max_ms']}ms")
+
+    for name in budget["forbidden"]:
+        if name in loaded:
+            violations.append(f"{module}: imports {name} at startup")
+
+    return elapsed_ms, violations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the startup import time of the app and CLI.")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    all_violations = []
+    for module, budget in IMPORT_BUDGETS.items():
+        elapsed_ms, violations = check_module(module, budget, args.runs)
+        print(f"{module:<6} {elapsed_ms:>8.0f}ms  budget {budget['max_ms']}ms")
+        all_violations.extend(violations)
+
+    for violation in all_violations:
+        print(f"OVER BUDGET {violation}", file=sys.stderr)
+
+    return 1 if all_violations else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
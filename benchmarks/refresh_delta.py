@@ -0,0 +1,164 @@
+import argparse
+import copy
+import random
+import sys
+import tempfile
+
+from benchmarks.chunked_outputs import stable_org
+from benchmarks.synthetic_org import save_org
+
+
+# items changed between the two fetches, per kind of change
+CHANGES = 10
+
+
+def change_org(ld_data, seed):
+    # a second fetch of the account: members, teams and roles added, changed and removed like
+    # the API reports them, e.g. a deleted role is gone from every member and team holding it
+    rng = random.Random(seed)
+    ld_data = copy.deepcopy(ld_data)
+    roles, teams, members = ld_data["roles"], ld_data["teams"], ld_data["members"]
+
+    removed_role = roles.pop(rng.randrange(len(roles)))
+    for team in teams:
+        team["customRoleKeys"] = [key for key in team["customRoleKeys"] if key != removed_role["key"]]
+    for member in members:
+        member["customRoles"] = [_id for _id in member["customRoles"] if _id != removed_role["_id"]]
+        for team in member["teams"]:
+            team["customRoleKeys"] = [key for key in team["customRoleKeys"] if key != removed_role["key"]]
+
+    for role in rng.sample(roles, CHANGES):
+        role["policy"] = role["policy"][1:] + [{"effect": "deny", "resources": ["proj/*"], "actions": ["deleteFlag"]}]
+    for role in rng.sample(roles, CHANGES):
+        role["name"] = f"{role['name']} (renamed)"
+    added_role = dict(copy.deepcopy(roles[0]), _id="%024x" % rng.getrandbits(96), key="added-role", name="Added Role")
+    roles.append(added_role)
+
+    removed_team = teams.pop(rng.randrange(len(teams)))
+    for member in members:
+        member["teams"] = [team for team in member["teams"] if team["key"] != removed_team["key"]]
+    for team in rng.sample(teams, CHANGES):
+        team["customRoleKeys"] = list(dict.fromkeys(team["customRoleKeys"] + [added_role["key"]]))
+    teams.append(dict(copy.deepcopy(teams[0]), key="added-team", name="Added Team"))
+
+    for member in rng.sample(members, CHANGES):
+        member["customRoles"] = list(dict.fromkeys(member["customRoles"] + [added_role["_id"]]))
+    for member in rng.sample(members, CHANGES):
+        member["role"] = "admin"
+    for member in rng.sample(members, CHANGES):
+        members.remove(member)
+    for i in range(CHANGES):
+        members.append(dict(copy.deepcopy(members[i]), _id="%024x" % rng.getrandbits(96),
+                            email=f"added.{i}@example.com"))
+    return ld_data
+
+
+def _fetch(data_dir):
+    # decoded like a refresh decodes the API responses, records with msgspec installed
+    from app_config import AppConfig
+    from data_source import fetch_local
+
+    app_config = AppConfig()
+    app_config.read_local = True
+    app_config.output_dir = data_dir
+    return fetch_local(app_config)
+
+
+def _sorted_frame(df, key, holder_columns=()):
+    # row and column order and the order of the holders per role depend on when items were added
+    df = df.copy()
+    for column in holder_columns:
+        df[column] = [sorted(holders) for holders in df[column]]
+    return df[sorted(df.columns)].sort_values(key).reset_index(drop=True)
+
+
+def _state(transformer):
+    from member_records import dumps
+    from transformer import SOURCE_KEYS
+
+    sources = transformer.get_sources()
+    return {
+        "metrics": dict(transformer.get_summary_metrics()),
+        # recounted, the metrics above are the ones of the last delta
+        "counts": transformer.get_role_counter().summary_metrics(),
+        "sources": {name: sorted(dumps(item) for item in sources[name]) for name in SOURCE_KEYS},
+        "roles": _sorted_frame(transformer.get_roles_df(), "key", ("members", "teams")),
+        "members": _sorted_frame(transformer.get_members_df(), "_id"),
+        "teams": _sorted_frame(transformer.get_teams_df(), "key"),
+        "role_hashes": dict(transformer.get_policy_index().role_hashes),
+        "policies": dict(transformer.get_policies()),
+        "member_access": transformer.get_access_graph().member_access,
+    }
+
+
+def _differences(state, expected):
+    differences = []
+    for name, value in state.items():
+        same = value.equals(expected[name]) if hasattr(value, "equals") else value == expected[name]
+        if not same:
+            differences.append(name)
+    return differences
+
+
+def check_refresh(first, second):
+    from app_config import AppConfig
+    from refresher import BackgroundRefresher, Snapshot
+    from transformer import Transformer
+
+    full = Transformer(ld_data=second())
+    full.process()
+    expected = _state(full)
+
+    refresher = BackgroundRefresher(AppConfig())
+    ld_data, transformer, digests = refresher._transform(first())
+    previous = Snapshot(ld_data, transformer, None, "remote", digests=digests)
+    refresher._swap(previous)
+    # members prepared a day ago, the refresh has to count their days since last seen from today
+    stale = list(transformer.get_members_df()['_id'][::7])
+    for member_id in stale:
+        transformer._members_by_id[member_id]['days_since_last_seen'] -= 1
+    before = _state(transformer)
+
+    failures = []
+    ld_data, refreshed, digests = refresher._transform(second())
+    if refreshed is transformer:
+        failures.append("the refresh did not apply the changes")
+    for name in _differences(_state(refreshed), expected):
+        failures.append(f"the refresh differs from a full process() in {name}")
+    for name in _differences(_state(transformer), before):
+        failures.append(f"the refresh changed {name} of the previous snapshot")
+
+    sources = refreshed.get_sources()
+    for name, key in (("teams", "key"), ("roles", "key"), ("members", "_id")):
+        if sorted(item[key] for item in ld_data[name]) != sorted(item[key] for item in sources[name]):
+            failures.append(f"the snapshot {name} are not the refreshed ones")
+
+    refresher._swap(Snapshot(ld_data, refreshed, None, "remote", digests=digests))
+    if refresher._transform(second())[1] is not refreshed:
+        failures.append("a refresh without changes built a new transformer")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that a refresh applying the changed items as a delta "
+                                                 "gives the tables and metrics of a full process().")
+    parser.add_argument("--members", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    ld_data = stable_org(args.members, args.seed)
+    changed = change_org(ld_data, args.seed)
+    with tempfile.TemporaryDirectory() as first_dir, tempfile.TemporaryDirectory() as second_dir:
+        save_org(ld_data, first_dir)
+        save_org(changed, second_dir)
+        failures = check_refresh(lambda: _fetch(first_dir), lambda: _fetch(second_dir))
+
+    for failure in failures:
+        print(f"FAILED {failure}", file=sys.stderr)
+    if not failures:
+        print("refreshes apply the changes like a full process()")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
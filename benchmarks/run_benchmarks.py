@@ -0,0 +1,192 @@
+import argparse
+import copy
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic_org import SIZES, generate_org, save_org
+from data_source import fetch_local
+from members_tab import MembersTab
+from roles_tab import RolesTab
+from teams_tab import TeamsTab
+from transformer import Transformer
+
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baselines.json")
+DEFAULT_SIZES = ["1k", "10k"]
+# a stage regresses when it is this much slower than the baseline...
+DEFAULT_THRESHOLD = 0.25
+# ...and slower by at least this many seconds, so timer noise on tiny stages is ignored
+MIN_REGRESSION_SECONDS = 0.05
+
+TRANSFORMER_STAGES = [
+    "_prep_roles",
+    "_prep_members",
+    "_prep_teams",
+    "_update_members_assigned_roles",
+    "_update_teams_assigned_roles",
+    "_generate_summary_metrics",
+]
+# stages on top of the access graph, which is built once outside their timings
+ANALYSIS_STAGES = [
+    "_score_privileges",
+]
+
+LAST_DAYS = 30
+
+
+def _tab_stages(transformer):
+    args = dict(roles=transformer.get_roles_df(), metrics=transformer.get_summary_metrics(),
+                members=transformer.get_members_df(), teams=transformer.get_teams_df())
+    members_tab = MembersTab(**args)
+    roles_tab = RolesTab(**args, statements=transformer.get_policy_index().statements)
+    teams_tab = TeamsTab(**args)
+
+    return [
+        ("members_tab.role_utilization", lambda: members_tab._compute_role_utilization(LAST_DAYS)),
+        ("members_tab.role_count", lambda: members_tab._get_role_count(LAST_DAYS)),
+        ("members_tab.inactive_members", lambda: members_tab._get_inactive_members_with_combined_roles(LAST_DAYS)),
+        ("members_tab.members_table", lambda: members_tab._get_active_members_with_combined_roles()),
+        ("roles_tab.assigned_categories", roles_tab._assigned_categories_df),
+        ("roles_tab.top_assigned_roles", roles_tab._top_assigned_roles_df),
+        ("roles_tab.roles_table", roles_tab._roles_table_df),
+        ("teams_tab.top_team_roles", teams_tab._top_team_roles_df),
+    ]
+
+
+def _measure(func, with_memory):
+    if with_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if with_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def _record(results, name, elapsed, peak):
+    entry = results.setdefault(name, {"seconds": float("inf"), "peak_mb": 0.0})
+    entry["seconds"] = min(entry["seconds"], elapsed)
+    entry["peak_mb"] = max(entry["peak_mb"], peak / (1024 * 1024))
+
+
+def _run_once(ld_data, data_dir, results, with_memory):
+    elapsed, peak = _measure(lambda: fetch_local(_LocalConfig(data_dir)), with_memory)
+    _record(results, "fetch_local", elapsed, peak)
+
+    transformer = Transformer(ld_data=copy.deepcopy(ld_data))
+    for stage in TRANSFORMER_STAGES:
+        elapsed, peak = _measure(getattr(transformer, stage), with_memory)
+        _record(results, f"transformer.{stage}", elapsed, peak)
+
+    transformer.get_access_graph()
+    for stage in ANALYSIS_STAGES:
+        elapsed, peak = _measure(getattr(transformer, stage), with_memory)
+        _record(results, f"transformer.{stage}", elapsed, peak)
+
+    for name, func in _tab_stages(transformer):
+        elapsed, peak = _measure(func, with_memory)
+        _record(results, name, elapsed, peak)
+
+
+class _LocalConfig:
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+
+
+def run_size(size, repeat, seed):
+    ld_data = generate_org(SIZES[size], seed)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        save_org(ld_data, data_dir)
+        # peak memory is traced in a separate pass, tracemalloc slows down the timed runs
+        for _ in range(repeat):
+            _run_once(ld_data, data_dir, results, with_memory=False)
+        _run_once(ld_data, data_dir, results, with_memory=True)
+
+    return results
+
+
+def load_baselines(filename=BASELINE_FILE):
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+
+def save_baselines(results, filename=BASELINE_FILE):
+    baselines = load_baselines(filename)
+    baselines.update(results)
+    with open(filename, 'w') as f:
+        json.dump(baselines, f, indent=4, sort_keys=True)
+
+
+def find_regressions(results, baselines, threshold=DEFAULT_THRESHOLD):
+    regressions = []
+    for size, stages in results.items():
+        for stage, current in stages.items():
+            baseline = baselines.get(size, {}).get(stage)
+            if baseline is None:
+                continue
+
+            slower = current["seconds"] - baseline["seconds"]
+            if current["seconds"] > baseline["seconds"] * (1 + threshold) and slower > MIN_REGRESSION_SECONDS:
+                regressions.append(f"{size} {stage}: {current['seconds']:.3f}s vs baseline {baseline['seconds']:.3f}s")
+
+            # memory is deterministic enough to compare without an absolute slack
+            if baseline["peak_mb"] > 1 and current["peak_mb"] > baseline["peak_mb"] * (1 + threshold):
+                regressions.append(f"{size} {stage}: {current['peak_mb']:.1f}MB vs baseline {baseline['peak_mb']:.1f}MB")
+
+    return regressions
+
+
+def print_results(results, baselines):
+    print(f"{'size':<6} {'stage':<45} {'seconds':>10} {'baseline':>10} {'peak MB':>10}")
+    for size, stages in results.items():
+        for stage, current in stages.items():
+            baseline = baselines.get(size, {}).get(stage, {}).get("seconds")
+            baseline_text = f"{baseline:.4f}" if baseline is not None else "-"
+            print(f"{size:<6} {stage:<45} {current['seconds']:>10.4f} {baseline_text:>10} {current['peak_mb']:>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Transformer stages and tab data preparation.")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES.keys()), default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per size, the fastest is kept")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown relative to the baseline, 0.25 is 25%%")
+    parser.add_argument("--baseline-file", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = {size: run_size(size, args.repeat, args.seed) for size in args.sizes}
+    baselines = load_baselines(args.baseline_file)
+    print_results(results, baselines)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    if args.save_baseline:
+        save_baselines(results, args.baseline_file)
+        print(f"Baseline saved to {args.baseline_file}")
+        return 0
+
+    regressions = find_regressions(results, baselines, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
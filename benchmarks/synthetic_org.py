@@ -0,0 +1,240 @@
+import argparse
+import datetime
+import json
+import os
+import random
+
+from faker import Faker
+
+from custom_utils import Utils
+
+
+SIZES = {
+    "1k": 1_000,
+    "10k": 10_000,
+    "100k": 100_000,
+    "500k": 500_000,
+}
+
+MEMBER_ROLES = ["reader", "writer", "admin", "no_access"]
+MEMBER_ROLE_WEIGHTS = [50, 35, 5, 10]
+ENVIRONMENTS = ["production", "staging", "test", "development"]
+ACTIONS = ["updateOn", "updateRules", "updateTargets", "updateFallthrough", "createFlag", "deleteFlag",
+           "updateName", "updateTags", "cloneFlag", "updateExpiringTargets", "updateScheduledChanges",
+           "createApprovalRequest", "reviewApprovalRequest", "applyApprovalRequest", "updateFeatureWorkflows"]
+NAME_POOL = 2_000
+
+
+def _org_shape(member_count):
+    # roles and teams grow much slower than membership in real accounts
+    role_count = max(20, min(3_000, member_count // 150))
+    team_count = max(5, min(5_000, member_count // 40))
+    return role_count, team_count
+
+
+def _object_id(rng):
+    return "%024x" % rng.getrandbits(96)
+
+
+def _timestamp_ms(now, rng, max_days):
+    return int((now - datetime.timedelta(days=rng.uniform(0, max_days))).timestamp() * 1000)
+
+
+def _statement(rng, project):
+    effect = "deny" if rng.random() < 0.15 else "allow"
+    environment = rng.choice(ENVIRONMENTS + ["*"])
+    resource = rng.choice([
+        f"proj/{project}:env/{environment}:flag/*",
+        f"proj/{project}:env/{environment}:segment/*",
+        f"proj/{project}",
+        f"proj/*:env/{environment}:flag/*;{rng.choice(['beta', 'ops', 'release'])}",
+        "proj/*",
+    ])
+    actions = ["*"] if rng.random() < 0.2 else sorted(rng.sample(ACTIONS, rng.randint(1, 6)))
+
+    return {"effect": effect, "resources": [resource], "actions": actions}
+
+
+def generate_roles(rng, fake, role_count):
+    projects = [fake.unique.slug() for _ in range(max(3, role_count // 10))]
+    roles = []
+    for i in range(role_count):
+        project = rng.choice(projects)
+        key = f"{project}-{rng.choice(['viewer', 'editor', 'approver', 'admin', 'oncall'])}-{i}"
+        roles.append({
+            "_id": _object_id(rng),
+            "_links": {"self": {"href": f"/api/v2/roles/{key}", "type": "application/json"}},
+            "key": key,
+            "name": key.replace("-", " ").title(),
+            "description": fake.sentence(),
+            "policy": [_statement(rng, project) for _ in range(rng.randint(1, 12))],
+            "basePermissions": "no_access",
+        })
+    return roles
+
+
+def generate_teams(rng, fake, team_count, roles, now):
+    role_keys = [role["key"] for role in roles]
+    teams = []
+    for i in range(team_count):
+        key = f"{fake.word()}-{i}"
+        teams.append({
+            "_links": {"self": {"href": f"/api/v2/teams/{key}", "type": "application/json"}},
+            "key": key,
+            "name": key.replace("-", " ").title(),
+            "description": fake.sentence(),
+            "_creationDate": _timestamp_ms(now, rng, 900),
+            "_lastModified": _timestamp_ms(now, rng, 300),
+            "_version": rng.randint(1, 40),
+            "customRoleKeys": rng.sample(role_keys, min(len(role_keys), int(rng.paretovariate(1.5)))),
+        })
+    return teams
+
+
+def generate_members(rng, fake, member_count, roles, teams, now):
+    # a fixed pool of names keeps generation fast at 500k members
+    first_names = [fake.first_name() for _ in range(NAME_POOL)]
+    last_names = [fake.last_name() for _ in range(NAME_POOL)]
+    domain = fake.domain_name()
+    role_ids = [role["_id"] for role in roles]
+    # popular roles get most of the direct assignments
+    role_weights = [1.0 / (rank + 1) for rank in range(len(role_ids))]
+
+    members = []
+    for i in range(member_count):
+        first_name = rng.choice(first_names)
+        last_name = rng.choice(last_names)
+        creation_date = _timestamp_ms(now, rng, 1_000)
+        last_seen = None if rng.random() < 0.1 else max(creation_date, _timestamp_ms(now, rng, 200))
+        direct_roles = rng.choices(role_ids, weights=role_weights, k=rng.choice([0, 0, 1, 1, 1, 2, 3]))
+        member_teams = rng.sample(teams, rng.choice([0, 1, 1, 1, 2, 3]))
+        is_maintainer = rng.random() < 0.03
+
+        members.append({
+            "_links": {"self": {"href": f"/api/v2/members/{i}", "type": "application/json"}},
+            "_id": _object_id(rng),
+            "firstName": first_name,
+            "lastName": last_name,
+            "role": rng.choices(MEMBER_ROLES, weights=MEMBER_ROLE_WEIGHTS)[0],
+            "email": f"{first_name}.{last_name}.{i}@{domain}".lower(),
+            "_pendingInvite": rng.random() < 0.02,
+            "_verified": rng.random() < 0.97,
+            "customRoles": list(dict.fromkeys(direct_roles)),
+            "mfa": rng.choice(["enabled", "disabled"]),
+            "excludedDashboards": [],
+            "_lastSeen": last_seen,
+            "creationDate": creation_date,
+            "teams": [{"customRoleKeys": team["customRoleKeys"], "key": team["key"], "name": team["name"]}
+                      for team in member_teams],
+            "permissionGrants": [{"resource": f"team/{member_teams[0]['key']}", "actionSet": "maintainTeam"}]
+            if is_maintainer and member_teams else [],
+        })
+    return members
+
+
+def _concrete_resource(rng, specifier):
+    # a resource an audit log access could name for a statement resource specifier
+    segments = []
+    for segment in specifier.split(":"):
+        kind, _, name = segment.split(";")[0].partition("/")
+        if name == "*":
+            name = rng.choice(ENVIRONMENTS) if kind == "env" else f"{kind}-{rng.randint(0, 200)}"
+        segments.append(f"{kind}/{name}")
+    return ":".join(segments)
+
+
+def _audit_access(rng, member_policies):
+    # most accesses are allowed by one of the member's statements, the rest are arbitrary
+    statements = [statement for statement in member_policies if statement["effect"] == "allow"]
+    if statements and rng.random() < 0.8:
+        statement = rng.choice(statements)
+        action = rng.choice(ACTIONS) if statement["actions"] == ["*"] else rng.choice(statement["actions"])
+        return {"action": action, "resource": _concrete_resource(rng, rng.choice(statement["resources"]))}
+    return {"action": rng.choice(ACTIONS),
+            "resource": f"proj/project-{rng.randint(0, 20)}:env/{rng.choice(ENVIRONMENTS)}:flag/flag-{rng.randint(0, 200)}"}
+
+
+def generate_audit_log(ld_data, entry_count, filename, seed=42):
+    # JSON lines like a LaunchDarkly audit log export, written entry by entry
+    rng = random.Random(seed)
+    now = datetime.datetime.combine(datetime.date.today(), datetime.time())
+    policies = {role["_id"]: role["policy"] for role in ld_data["roles"]}
+    policies_by_key = {role["key"]: role["policy"] for role in ld_data["roles"]}
+
+    # a fifth of the members make most changes
+    members = ld_data["members"]
+    active = rng.sample(members, max(1, len(members) // 5))
+    member_policies = {}
+
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    with open(filename, "w") as f:
+        for i in range(entry_count):
+            member = rng.choice(active)
+            if member["_id"] not in member_policies:
+                member_policies[member["_id"]] = \
+                    [statement for _id in member["customRoles"] for statement in policies[_id]] \
+                    + [statement for team in member["teams"] for key in team["customRoleKeys"]
+                       for statement in policies_by_key[key]]
+            accesses = [_audit_access(rng, member_policies[member["_id"]]) for _ in range(rng.choice([1, 1, 1, 2]))]
+            entry = {
+                "_links": {"self": {"href": f"/api/v2/auditlog/{i}", "type": "application/json"}},
+                "_id": _object_id(rng),
+                "_accountId": "synthetic",
+                "date": _timestamp_ms(now, rng, 90),
+                "accesses": accesses,
+                "kind": "flag",
+                "name": accesses[0]["resource"].rsplit("/", 1)[-1],
+                "description": f"- Changed {accesses[0]['action']}",
+                "shortDescription": "",
+                "member": {
+                    "_links": {"self": {"href": f"/api/v2/members/{member['_id']}", "type": "application/json"}},
+                    "_id": member["_id"],
+                    "email": member["email"],
+                    "firstName": member["firstName"],
+                    "lastName": member["lastName"],
+                },
+                "titleVerb": "updated the flag",
+                "target": {"resources": [access["resource"] for access in accesses]},
+            }
+            f.write(json.dumps(entry))
+            f.write("\n")
+
+
+def generate_org(member_count, seed=42):
+    rng = random.Random(seed)
+    fake = Faker()
+    fake.seed_instance(seed)
+    # relative to today so days_since_last_seen has a realistic spread
+    now = datetime.datetime.combine(datetime.date.today(), datetime.time())
+
+    role_count, team_count = _org_shape(member_count)
+    roles = generate_roles(rng, fake, role_count)
+    teams = generate_teams(rng, fake, team_count, roles, now)
+    members = generate_members(rng, fake, member_count, roles, teams, now)
+
+    # same key order as the app's fetch functions, the Transformer unpacks by position
+    return {"teams": teams, "roles": roles, "members": members}
+
+
+def save_org(ld_data, output_dir):
+    for name, items in ld_data.items():
+        Utils.save_data_to_file(items, f"{output_dir}/{name}.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic LaunchDarkly account for benchmarks.")
+    parser.add_argument("--size", choices=list(SIZES.keys()), default="1k")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", default="output/synthetic")
+    parser.add_argument("--audit-entries", type=int, default=0,
+                        help="also write this many audit log entries to audit-log.jsonl")
+    args = parser.parse_args()
+
+    ld_data = generate_org(SIZES[args.size], args.seed)
+    save_org(ld_data, args.output_dir)
+    if args.audit_entries:
+        generate_audit_log(ld_data, args.audit_entries, f"{args.output_dir}/audit-log.jsonl", args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,421 @@
+import datetime
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from custom_utils import Utils
+from policy_index import with_statements
+from snapshot_store import INACTIVE_DAYS
+from transformer import Transformer, prep_member
+
+
+# decoded items take about 6x their JSON size, prepared ones a bit more
+MEMORY_FACTOR = 8
+# share of the budget for the chunk in flight, the rest is roles, teams, counters and buffers
+CHUNK_BUDGET_SHARE = 0.5
+MIN_CHUNK_SIZE = 100
+MAX_CHUNK_SIZE = 100_000
+# chunk size for parallel runs without a memory budget
+PARALLEL_CHUNK_SIZE = 10_000
+SAMPLE_SIZE = 200
+READ_SIZE = 1 << 20
+
+LAST_SEEN_BINS = [(30, "0-30"), (60, "31-60"), (90, "61-90"), (120, "91-120")]
+LAST_SEEN_OVER = ">120"
+
+_SEPARATOR = re.compile(r"[\s,]*")
+
+
+def iter_json_array(filename, read_size=READ_SIZE, raw=False):
+    # yields the items of a top-level JSON array without loading the whole file,
+    # with raw=True as their JSON text on a single line instead of decoded
+    decoder = json.JSONDecoder()
+    with open(filename) as f:
+        buffer = f.read(read_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{filename} does not contain a JSON array")
+        pos = 1
+        eof = False
+
+        while True:
+            pos = _SEPARATOR.match(buffer, pos).end()
+            if buffer.startswith("]", pos):
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                end = None
+
+            # an item that ends at the buffer boundary may be cut off
+            if end is None or (end == len(buffer) and not eof):
+                if eof:
+                    raise ValueError(f"{filename} ends in the middle of the array")
+                data = f.read(read_size)
+                eof = len(data) == 0
+                buffer = buffer[pos:] + data
+                pos = 0
+                continue
+
+            # \n and \r can only be whitespace between tokens, strings hold them escaped. Other
+            # characters splitlines() breaks at (\x85, U+2028, U+2029) are valid inside strings.
+            yield buffer[pos:end].replace("\r", "").replace("\n", "") if raw else item
+            pos = end
+
+
+def estimate_memory_mb(items):
+    return sum(len(json.dumps(item)) for item in items) * MEMORY_FACTOR / (1024 * 1024)
+
+
+def reserved_memory_mb(teams, roles):
+    # roles and teams stay in memory as prepared dicts and as DataFrames
+    return 2 * (estimate_memory_mb(teams) + estimate_memory_mb(roles))
+
+
+def chunk_size_for_budget(memory_budget_mb, sample, reserved_mb=0, workers=1):
+    # reserved_mb is what stays in memory regardless of the chunk size (roles, teams),
+    # with workers every process holds a chunk of its own
+    if len(sample) == 0:
+        return MAX_CHUNK_SIZE
+
+    member_mb = estimate_memory_mb(sample) / len(sample)
+    chunk_size = int(max(0, memory_budget_mb - reserved_mb) * CHUNK_BUDGET_SHARE / member_mb / workers)
+    return max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, chunk_size))
+
+
+class JsonArrayWriter:
+    # writes a JSON array item by item, same content as json.dump of the full list
+    def __init__(self, filename):
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        self.filename = filename
+        self.file = open(filename, "w")
+        self.file.write("[")
+        self.count = 0
+
+    def extend(self, items):
+        self.extend_encoded(json.dumps(item) for item in items)
+
+    def extend_encoded(self, lines):
+        # items that are already JSON encoded, one per line
+        for line in lines:
+            self.file.write(",\n" if self.count else "\n")
+            self.file.write(line.rstrip("\n"))
+            self.count += 1
+
+    def close(self):
+        self.file.write("\n]\n" if self.count else "]\n")
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MemberChunkStore:
+    # Members partitioned into JSON Lines files on disk. The chunk size is derived
+    # from the memory budget and the size of the first members added.
+
+    def __init__(self, memory_budget_mb, spill_dir=None, chunk_size=None, reserved_mb=0, workers=1):
+        self.memory_budget_mb = memory_budget_mb
+        self.reserved_mb = reserved_mb
+        self.workers = workers
+        if chunk_size is None and not memory_budget_mb:
+            chunk_size = PARALLEL_CHUNK_SIZE
+        self.chunk_size = chunk_size
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+        self.chunk_dir = tempfile.mkdtemp(prefix=".member-chunks-", dir=spill_dir)
+        self.paths = []
+        self.member_count = 0
+        self._buffer = []
+
+    def add(self, member):
+        self.add_encoded(json.dumps(member))
+
+    def add_encoded(self, line):
+        # the buffer holds encoded members, a fraction of their decoded size
+        self._buffer.append(line)
+        self.member_count += 1
+
+        if self.chunk_size is None and len(self._buffer) >= SAMPLE_SIZE:
+            sample = [json.loads(line) for line in self._buffer]
+            self.chunk_size = chunk_size_for_budget(self.memory_budget_mb, sample,
+                                                    self.reserved_mb, self.workers)
+        if self.chunk_size is not None and len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def extend(self, members):
+        for member in members:
+            self.add(member)
+
+    def flush(self):
+        if len(self._buffer) == 0:
+            return
+
+        path = f"{self.chunk_dir}/members-{len(self.paths):05d}.jsonl"
+        with open(path, "w") as f:
+            for line in self._buffer:
+                f.write(line)
+                f.write("\n")
+        self.paths.append(path)
+        self._buffer = []
+
+    def __iter__(self):
+        self.flush()
+        for path in self.paths:
+            yield read_chunk(path)
+
+    def cleanup(self):
+        shutil.rmtree(self.chunk_dir, ignore_errors=True)
+        self.paths = []
+
+
+def read_chunk(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def load_member_chunks(app_config, memory_budget_mb, spill_dir=None, reserved_mb=0, workers=1):
+    # streams members from members.json or the API pages into a chunk store
+    store = MemberChunkStore(memory_budget_mb, spill_dir=spill_dir or app_config.output_dir,
+                             reserved_mb=reserved_mb, workers=workers)
+
+    if app_config.read_local:
+        filename = f"{app_config.output_dir}/members.json"
+        if not os.path.exists(filename):
+            print(f"Error: File not found at '{filename}'")
+            store.cleanup()
+            return None
+        for line in iter_json_array(filename, raw=True):
+            store.add_encoded(line)
+    else:
+        from ldapiclient import LaunchDarklyAPIClient
+
+        client = LaunchDarklyAPIClient(app_config.access_token, app_config.debug)
+        raw_output = f"{app_config.output_dir}/members.json" if app_config.save_data else None
+        writer = JsonArrayWriter(raw_output) if raw_output else None
+        try:
+            for items in client.iter_pages("members", required=True):
+                store.extend(items)
+                if writer is not None:
+                    writer.extend(items)
+        except Exception as e:
+            # a partial member list would give wrong metrics, and a partial members.json
+            # would be read as the account later
+            print(f"Error listing members: {e}")
+            store.cleanup()
+            if writer is not None:
+                writer.close()
+                os.remove(raw_output)
+            return None
+        if writer is not None:
+            writer.close()
+
+    store.flush()
+    return store
+
+
+class MemberChunkStats:
+    # mergeable aggregates of one or more member chunks
+
+    def __init__(self):
+        self.member_count = 0
+        self.role_assignments = 0
+        self.role_counts = Counter()
+        self.inactive_members = 0
+        self.inactive_members_with_roles = 0
+        self.last_seen = Counter()
+
+    def add(self, member, teams_with_roles):
+        role_keys = member['customRoles']
+        self.member_count += 1
+        self.role_assignments += len(role_keys)
+        self.role_counts.update(dict.fromkeys(role_keys, 1))
+
+        days = member['days_since_last_seen']
+        for limit, label in LAST_SEEN_BINS:
+            if days < limit:
+                self.last_seen[label] += 1
+                break
+        else:
+            self.last_seen[LAST_SEEN_OVER] += 1
+
+        if days > INACTIVE_DAYS:
+            self.inactive_members += 1
+            if len(role_keys) > 0 or any(team in teams_with_roles for team in member['team_list']):
+                self.inactive_members_with_roles += 1
+
+    def merge(self, other):
+        self.member_count += other.member_count
+        self.role_assignments += other.role_assignments
+        self.role_counts.update(other.role_counts)
+        self.inactive_members += other.inactive_members
+        self.inactive_members_with_roles += other.inactive_members_with_roles
+        self.last_seen.update(other.last_seen)
+        return self
+
+    def activity_metrics(self):
+        return {
+            'total_members': self.member_count,
+            'inactive_members': self.inactive_members,
+            'inactive_members_with_roles': self.inactive_members_with_roles,
+            'last_seen_days': {label: self.last_seen.get(label, 0)
+                               for label in [label for _, label in LAST_SEEN_BINS] + [LAST_SEEN_OVER]},
+        }
+
+
+def aggregate_members(members, role_id_map, teams_with_roles, today=None):
+    # prepares the members in place, like Transformer._prep_members, and aggregates them
+    stats = MemberChunkStats()
+    for member in members:
+        prep_member(member, role_id_map, today)
+        stats.add(member, teams_with_roles)
+    return stats
+
+
+# read-only lookups of a worker process, set once by _init_worker
+_worker_lookups = None
+
+
+def _init_worker(role_id_map, teams_with_roles, today):
+    global _worker_lookups
+    _worker_lookups = (role_id_map, teams_with_roles, today)
+
+
+def _prep_chunk_file(path, output_path=None):
+    # runs in a worker: only the small aggregates travel back to the parent,
+    # prepared members go to output_path as one JSON document per line
+    members = read_chunk(path)
+    stats = aggregate_members(members, *_worker_lookups)
+    if output_path is not None:
+        with open(output_path, "w") as f:
+            for member in members:
+                f.write(json.dumps(member))
+                f.write("\n")
+    return stats
+
+
+class ChunkedTransformer:
+    # Same summary metrics and role counts as Transformer, but members are streamed
+    # chunk by chunk from a MemberChunkStore and only their aggregates are kept. Roles
+    # and teams are prepared by a Transformer without members. There is no members
+    # table, so what needs one (SQL, access graph, what-if, role mining, privileges,
+    # audit usage, history) is not offered; the CLI rejects those options up front.
+    # With workers > 1 the chunks are prepared and aggregated in a process pool.
+
+    def __init__(self, teams, roles, member_chunks, members_output=None, save=False, workers=1):
+        self.base = Transformer(ld_data={"teams": teams, "roles": roles, "members": []})
+        self.member_chunks = member_chunks
+        self.members_output = members_output
+        self.save = save
+        self.workers = workers
+        self.member_stats = MemberChunkStats()
+        self.roles_df = None
+        self.summary_metrics = {}
+
+    def process(self, output_dir=None):
+        if self.save and self.members_output is None:
+            self.members_output = f"{output_dir}/transformed-members.json"
+
+        self.base.process()
+        self._prep_members()
+
+        # member ids per role are not kept, only the counts
+        counter = self.base.get_role_counter()
+        self.roles_df = self.base.get_roles_df().drop(columns=["members"])
+        self.roles_df['members_count'] = [counter.member_role_counts.get(key, 0) for key in self.roles_df['key']]
+        self.summary_metrics = counter.summary_metrics()
+
+        if self.save:
+            self._save_data(output_dir=output_dir)
+
+    def _teams_with_roles(self):
+        return {team['key'] for team in self.base.teams_source if len(team['customRoleKeys']) > 0}
+
+    def _prep_members(self):
+        role_id_map = self.base._get_role_id_map()
+        teams_with_roles = self._teams_with_roles()
+        today = datetime.datetime.today()
+
+        writer = JsonArrayWriter(self.members_output) if self.members_output else None
+        try:
+            if self.workers > 1:
+                self._prep_members_parallel(writer, role_id_map, teams_with_roles, today)
+            else:
+                for members in self.member_chunks:
+                    self.member_stats.merge(aggregate_members(members, role_id_map, teams_with_roles, today))
+                    if writer is not None:
+                        writer.extend(members)
+                    # otherwise the previous chunk stays referenced while the next one is read
+                    del members
+        finally:
+            if writer is not None:
+                writer.close()
+
+        self.base.get_role_counter().add_member_counts(self.member_stats.role_counts,
+                                                       self.member_stats.role_assignments,
+                                                       self.member_stats.member_count)
+
+    def _prep_members_parallel(self, writer, role_id_map, teams_with_roles, today):
+        self.member_chunks.flush()
+        paths = self.member_chunks.paths
+        outputs = [f"{path}.out" if writer is not None else None for path in paths]
+
+        # spawn so workers do not inherit the threads of a running Streamlit server
+        mp_context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=mp_context,
+                                 initializer=_init_worker,
+                                 initargs=(role_id_map, teams_with_roles, today)) as executor:
+            # map yields in chunk order, so the merge and the members output match the serial run
+            for stats, output in zip(executor.map(_prep_chunk_file, paths, outputs), outputs):
+                self.member_stats.merge(stats)
+                if output is not None:
+                    with open(output) as f:
+                        writer.extend_encoded(f)
+                    os.remove(output)
+
+    def get_summary_metrics(self):
+        return self.summary_metrics
+
+    def get_member_stats(self):
+        return self.member_stats
+
+    def get_role_counter(self):
+        return self.base.get_role_counter()
+
+    def get_policy_index(self):
+        return self.base.get_policy_index()
+
+    def get_policies(self):
+        return self.base.get_policies()
+
+    def get_roles_df(self):
+        return self.roles_df
+
+    def get_teams_df(self):
+        return self.base.get_teams_df()
+
+    def get_members_df(self):
+        # members were streamed to members_output
+        return None
+
+    def _save_data(self, msg=None, output_dir='output'):
+        # members were already written while streaming
+        prefix = "transformed-"
+        policy_index = self.get_policy_index()
+        Utils.save_data_to_file(
+            with_statements(self.get_roles_df(), policy_index).to_dict(orient="records"),
+            f"{output_dir}/{prefix}roles.json")
+
+        Utils.save_data_to_file(
+            self.get_teams_df().to_dict(orient="records"), f"{output_dir}/{prefix}teams.json")
+
+        policies = {_id: policy_index.resolve(hashes) for _id, hashes in self.get_policies().items()}
+        Utils.save_data_to_file(policies, f"{output_dir}/{prefix}policies.json")
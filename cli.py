@@ -0,0 +1,352 @@
+import argparse
+import json
+import os
+import sys
+
+from app_config import AppConfig
+from custom_utils import Utils
+from data_source import fetch_data, is_complete
+from multi_account import analyze_accounts, compare_metrics, load_accounts
+from policy_index import with_statements
+from snapshot_store import SnapshotStore, history_db_path
+from transformer import Transformer
+
+
+TABLE_FORMATS = ["json", "parquet"]
+
+
+def _to_native(value):
+    # numpy scalars from the DataFrame aggregations are not JSON serializable
+    if hasattr(value, "item"):
+        return value.item()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def _is_nested(value):
+    if isinstance(value, dict):
+        return True
+    return isinstance(value, list) and any(isinstance(item, (dict, list)) for item in value)
+
+
+def _parquet_safe(df):
+    # nested policy/team payloads have heterogeneous shapes, store them as JSON text
+    df = df.copy()
+    for column in df.columns:
+        if df[column].dtype == object and df[column].map(_is_nested).any():
+            df[column] = df[column].map(lambda x: json.dumps(x, default=_to_native))
+    return df
+
+
+def save_metrics(metrics, filename):
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    with open(filename, "w") as f:
+        json.dump(metrics, f, indent=4, default=_to_native)
+
+
+def save_tables(transformer, output_dir, table_format="json"):
+    os.makedirs(output_dir, exist_ok=True)
+    tables = {
+        "roles": with_statements(transformer.get_roles_df(), transformer.get_policy_index()),
+        "members": transformer.get_members_df(),
+        "teams": transformer.get_teams_df(),
+    }
+    saved = []
+    for name, df in tables.items():
+        if df is None:
+            # the chunked mode streams members itself
+            continue
+        filename = f"{output_dir}/transformed-{name}.{table_format}"
+        if table_format == "parquet":
+            _parquet_safe(df).to_parquet(filename, index=False)
+        else:
+            df.to_json(filename, orient="records", indent=4)
+        saved.append(filename)
+
+    return saved
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Fetch, transform and summarize LaunchDarkly custom role policies without the Streamlit UI. "
+                    "The API key is read from LAUNCHDARKLY_API_KEY.")
+    parser.add_argument("--local", action="store_true", default=None,
+                        help="read raw teams/roles/members JSON from the output directory instead of the API")
+    parser.add_argument("--output-dir", help="directory for raw and transformed data (default: OUTPUT_DIR)")
+    parser.add_argument("--format", choices=TABLE_FORMATS, default="json", dest="table_format",
+                        help="file format for the transformed tables")
+    parser.add_argument("--metrics-only", action="store_true",
+                        help="only write the summary metrics, skip the transformed tables")
+    parser.add_argument("--save-raw", action="store_true", default=None,
+                        help="save the raw API payload to the output directory")
+    parser.add_argument("--accounts",
+                        help="JSON accounts file to analyze several accounts in parallel (default: ACCOUNTS_FILE)")
+    parser.add_argument("--workers", type=int, help="number of worker processes for --accounts")
+    parser.add_argument("--history", action="store_true", default=None,
+                        help="record a daily snapshot in OUTPUT_DIR/history.sqlite (default: SAVE_HISTORY)")
+    parser.add_argument("--sql", help="run a SQL query over the transformed tables and print the result as CSV")
+    parser.add_argument("--policy-diff", metavar="DIR",
+                        help="compare policies with the roles.json saved in DIR and write policy-diff.json")
+    parser.add_argument("--memory-budget", type=int, metavar="MB",
+                        help="process members in chunks on disk to stay within this memory budget (default: MEMORY_BUDGET_MB)")
+    parser.add_argument("--member-workers", type=int, metavar="N",
+                        help="prepare and count members in N worker processes (default: MEMBER_WORKERS)")
+    parser.add_argument("--preview", type=int, metavar="PAGES",
+                        help="estimate the metrics from this many random member pages instead of all members")
+    parser.add_argument("--audit-log", action="append", metavar="PATH",
+                        help="audit log JSON lines file or directory to report granted but unused permissions from, "
+                             "can be repeated (default: AUDIT_LOG_PATH)")
+    parser.add_argument("--audit-workers", type=int, metavar="N",
+                        help="read the audit logs in N worker processes (default: AUDIT_LOG_WORKERS)")
+    parser.add_argument("--quiet", action="store_true", help="do not print the summary metrics to stdout")
+    return parser
+
+
+def run_accounts(args, app_config):
+    try:
+        accounts = load_accounts(args.accounts or app_config.accounts_file)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    results = analyze_accounts(accounts,
+                               output_dir=app_config.output_dir,
+                               save_data=app_config.save_data,
+                               debug=app_config.debug,
+                               max_workers=args.workers or app_config.max_workers)
+
+    store = SnapshotStore(history_db_path(app_config.output_dir)) if app_config.save_history else None
+
+    exit_code = 0
+    for result in results:
+        if result.error is not None:
+            print(f"Error: {result.name}: {result.error}", file=sys.stderr)
+            exit_code = 1
+            continue
+
+        if store is not None:
+            store.save_snapshot(result, account=result.name)
+
+        account_dir = f"{app_config.output_dir}/{result.name}"
+        save_metrics(result.get_summary_metrics(), f"{account_dir}/transformed-metrics.json")
+        if not args.metrics_only:
+            save_tables(result, account_dir, args.table_format)
+
+    comparison = compare_metrics(results)
+    os.makedirs(app_config.output_dir, exist_ok=True)
+    comparison.to_json(f"{app_config.output_dir}/accounts-metrics.json", orient="index", indent=4)
+
+    if not args.quiet:
+        print(comparison.to_string())
+
+    return exit_code
+
+
+def save_policy_diff(transformer, previous_dir, output_dir):
+    from policy_index import diff_policies, diff_summary, index_roles
+
+    previous_roles = Utils.read_json_file(f"{previous_dir}/roles.json")
+    if previous_roles is None:
+        return None
+
+    diff = diff_policies(index_roles(previous_roles), transformer.get_policy_index())
+    save_metrics(diff, f"{output_dir}/policy-diff.json")
+    return diff_summary(diff)
+
+
+def save_audit_usage(transformer, paths, output_dir, table_format="json", workers=1):
+    import pandas as pd
+    from audit_log import audit_usage
+
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"Error: audit log not found at '{path}'", file=sys.stderr)
+            return None
+
+    usage = audit_usage(transformer, paths, workers)
+    tables = {
+        "role-usage": usage.role_rows(),
+        "member-usage": usage.member_rows(),
+        "statement-usage": usage.statement_rows(),
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    for name, rows in tables.items():
+        df = pd.DataFrame(rows)
+        filename = f"{output_dir}/audit-{name}.{table_format}"
+        if table_format == "parquet":
+            _parquet_safe(df).to_parquet(filename, index=False)
+        else:
+            df.to_json(filename, orient="records", indent=4)
+
+    return usage.summary()
+
+
+def run_preview(args, app_config):
+    from data_source import fetch_preview
+    from preview import estimate_preview
+
+    ld_data = fetch_preview(app_config, args.preview)
+    if not is_complete(ld_data):
+        print("Error: unable to load teams, roles and sampled members data.", file=sys.stderr)
+        return 1
+
+    if ld_data["failed_pages"]:
+        if not ld_data["member_pages"]:
+            print("Error: none of the sampled member pages could be fetched.", file=sys.stderr)
+            return 1
+        print(f"Warning: {ld_data['failed_pages']} sampled member pages could not be fetched, "
+              "the estimates are based on the others.", file=sys.stderr)
+
+    preview = estimate_preview(ld_data["teams"], ld_data["roles"], ld_data["member_pages"], ld_data["total_members"],
+                               failed_pages=ld_data["failed_pages"])
+    save_metrics(preview, f"{app_config.output_dir}/transformed-preview.json")
+
+    if not args.quiet:
+        print(json.dumps({key: preview[key] for key in ("sampled_members", "failed_pages", "total_members", "bounds",
+                                                         "overall_utilization", "inactive_members_with_roles")},
+                         indent=4, default=_to_native))
+    return 0
+
+
+def run_chunked(args, app_config):
+    from chunked_transformer import ChunkedTransformer, load_member_chunks, reserved_memory_mb
+
+    # ChunkedTransformer keeps no members table. Options that need one are rejected before
+    # anything is loaded, the same settings from the environment are skipped with a warning.
+    # --member-workers without a budget runs the default mode with a parallel Transformer.
+    unsupported = [option for option, given in (("--sql", args.sql), ("--audit-log", args.audit_log),
+                                                 ("--history", args.history)) if given]
+    if unsupported:
+        verb = "need" if len(unsupported) > 1 else "needs"
+        print(f"Error: {', '.join(unsupported)} {verb} the full members table, which --memory-budget does not keep.", file=sys.stderr)
+        return 2
+    for setting, given in (("SAVE_HISTORY", app_config.save_history), ("AUDIT_LOG_PATH", app_config.audit_log_path)):
+        if given:
+            print(f"Warning: {setting} needs the full members table, skipped with --memory-budget.", file=sys.stderr)
+    if args.table_format == "parquet" and not args.metrics_only:
+        print("Warning: members are streamed to transformed-members.json, --format parquet only applies to roles and teams.", file=sys.stderr)
+
+    ld_data = fetch_data(app_config, include_members=False)
+    if not is_complete(ld_data):
+        print("Error: unable to load teams and roles data.", file=sys.stderr)
+        return 1
+
+    reserved_mb = reserved_memory_mb(ld_data["teams"], ld_data["roles"])
+    if app_config.memory_budget_mb > 0 and reserved_mb >= app_config.memory_budget_mb:
+        print(f"Warning: roles and teams alone need about {reserved_mb:.0f} MB, "
+              f"the budget of {app_config.memory_budget_mb} MB cannot be met.", file=sys.stderr)
+
+    member_chunks = load_member_chunks(app_config, app_config.memory_budget_mb,
+                                       reserved_mb=reserved_mb, workers=app_config.member_workers)
+    if member_chunks is None:
+        print("Error: unable to load members data.", file=sys.stderr)
+        return 1
+
+    members_output = None if args.metrics_only else f"{app_config.output_dir}/transformed-members.json"
+    try:
+        transformer = ChunkedTransformer(ld_data["teams"], ld_data["roles"], member_chunks,
+                                         members_output=members_output, workers=app_config.member_workers)
+        transformer.process(output_dir=app_config.output_dir)
+    finally:
+        member_chunks.cleanup()
+
+    metrics = transformer.get_summary_metrics()
+    save_metrics(metrics, f"{app_config.output_dir}/transformed-metrics.json")
+    save_metrics(transformer.get_member_stats().activity_metrics(),
+                 f"{app_config.output_dir}/transformed-member-activity.json")
+
+    if not args.metrics_only:
+        save_tables(transformer, app_config.output_dir, args.table_format)
+
+    if args.policy_diff:
+        policy_changes = save_policy_diff(transformer, args.policy_diff, app_config.output_dir)
+        if policy_changes is None:
+            return 1
+        metrics = dict(metrics, policy_changes=policy_changes)
+
+    if not args.quiet:
+        print(json.dumps(metrics, indent=4, default=_to_native))
+
+    return 0
+
+
+def run(args, app_config=None):
+    app_config = app_config or AppConfig()
+
+    if args.local is not None:
+        app_config.read_local = args.local
+    if args.output_dir:
+        app_config.output_dir = args.output_dir
+    if args.save_raw is not None:
+        app_config.save_data = args.save_raw
+
+    if args.history is not None:
+        app_config.save_history = args.history
+    if args.memory_budget is not None:
+        app_config.memory_budget_mb = args.memory_budget
+    if args.member_workers is not None:
+        app_config.member_workers = args.member_workers
+    if args.audit_workers is not None:
+        app_config.audit_log_workers = args.audit_workers
+
+    if args.accounts or app_config.accounts_file:
+        return run_accounts(args, app_config)
+
+    if app_config.access_token is None and not app_config.read_local:
+        print("Error: LAUNCHDARKLY_API_KEY is not set, use --local to read saved data.", file=sys.stderr)
+        return 2
+
+    if args.preview:
+        return run_preview(args, app_config)
+
+    if app_config.memory_budget_mb > 0:
+        return run_chunked(args, app_config)
+
+    ld_data = fetch_data(app_config)
+    if not is_complete(ld_data):
+        print("Error: unable to load teams, roles and members data.", file=sys.stderr)
+        return 1
+
+    transformer = Transformer(ld_data=ld_data, workers=app_config.member_workers)
+    transformer.process(output_dir=app_config.output_dir)
+
+    if app_config.save_history:
+        SnapshotStore(history_db_path(app_config.output_dir)).save_snapshot(transformer)
+
+    metrics = transformer.get_summary_metrics()
+    save_metrics(metrics, f"{app_config.output_dir}/transformed-metrics.json")
+
+    if not args.metrics_only:
+        save_tables(transformer, app_config.output_dir, args.table_format)
+
+    if args.policy_diff:
+        policy_changes = save_policy_diff(transformer, args.policy_diff, app_config.output_dir)
+        if policy_changes is None:
+            return 1
+        metrics = dict(metrics, policy_changes=policy_changes)
+
+    audit_logs = args.audit_log or ([app_config.audit_log_path] if app_config.audit_log_path else [])
+    if audit_logs:
+        permission_usage = save_audit_usage(transformer, audit_logs, app_config.output_dir, args.table_format,
+                                            app_config.audit_log_workers)
+        if permission_usage is None:
+            return 1
+        metrics = dict(metrics, permission_usage=permission_usage)
+
+    if args.sql:
+        from sql_engine import PolicySQL
+        print(PolicySQL(transformer).query(args.sql).to_csv(index=False), end="")
+    elif not args.quiet:
+        print(json.dumps(metrics, indent=4, default=_to_native))
+
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
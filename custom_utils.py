@@ -1,7 +1,21 @@
+import functools
 import json
 import os
 
 
+def memoize(func):
+    # caches a method's result on the instance, keyed by its arguments
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        cache = self.__dict__.setdefault('_memo', {})
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        if key not in cache:
+            cache[key] = func(self, *args, **kwargs)
+        return cache[key]
+
+    return wrapper
+
+
 class Utils:
 
     def read_json_file(file_path: str):
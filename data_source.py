@@ -0,0 +1,80 @@
+from ldapiclient import LaunchDarklyAPIClient
+from custom_utils import Utils
+from member_records import read_members
+
+
+def fetch_remote(app_config, include_members=True):
+    client = LaunchDarklyAPIClient(app_config.access_token, app_config.debug)
+    output_dir = app_config.output_dir
+
+    ld_data = {
+        "teams": client.list_teams(),
+        "roles": client.list_custom_roles(),
+    }
+    if include_members:
+        ld_data["members"] = client.list_members()
+
+    if not app_config.save_data:
+        return ld_data
+
+    for name, items in ld_data.items():
+        if items is not None:
+            client.save_data_to_file(items, f"{output_dir}/{name}.json")
+
+    return ld_data
+
+
+def fetch_local(app_config, include_members=True):
+    output_dir = app_config.output_dir
+
+    ld_data = {
+        "teams": Utils.read_json_file(f"{output_dir}/teams.json"),
+        "roles": Utils.read_json_file(f"{output_dir}/roles.json"),
+    }
+    if include_members:
+        ld_data["members"] = read_members(f"{output_dir}/members.json")
+    return ld_data
+
+
+def fetch_data(app_config, include_members=True):
+    # include_members=False is used by the chunked mode, which streams members separately
+    if app_config.read_local:
+        return fetch_local(app_config, include_members)
+
+    return fetch_remote(app_config, include_members)
+
+
+def fetch_preview(app_config, page_count, seed=None):
+    # teams and roles in full, members as page_count random pages, the number of pages that
+    # could not be fetched and the total member count
+    from preview import sample_page_offsets
+
+    page_size = LaunchDarklyAPIClient.page_limit
+    if app_config.read_local:
+        ld_data = fetch_local(app_config)
+        members = ld_data.pop("members") or []
+        offsets = sample_page_offsets(len(members), page_size, page_count, seed)
+        ld_data["member_pages"] = [members[offset:offset + page_size] for offset in offsets]
+        ld_data["failed_pages"] = 0
+        ld_data["total_members"] = len(members)
+        return ld_data
+
+    client = LaunchDarklyAPIClient(app_config.access_token, app_config.debug)
+    ld_data = {
+        "teams": client.list_teams(),
+        "roles": client.list_custom_roles(),
+    }
+    total_members = client.count_members()
+    if total_members is None:
+        ld_data["member_pages"] = None
+        ld_data["total_members"] = None
+        return ld_data
+
+    offsets = sample_page_offsets(total_members, page_size, page_count, seed)
+    ld_data["member_pages"], ld_data["failed_pages"] = client.list_member_pages(offsets)
+    ld_data["total_members"] = total_members
+    return ld_data
+
+
+def is_complete(ld_data):
+    return ld_data is not None and all(value is not None for value in ld_data.values())
@@ -0,0 +1,101 @@
+import streamlit as st
+from streamlit_agraph import agraph, Node, Edge, Config
+
+from access_graph import MEMBER, TEAM, ROLE, node_id, split_node_id
+
+
+NODE_COLORS = {MEMBER: "#8DA0CB", TEAM: "#66C2A5", ROLE: "#FC8D62"}
+NODE_SIZES = {MEMBER: 12, TEAM: 18, ROLE: 22}
+MAX_SEARCH_RESULTS = 200
+MAX_NEIGHBORS = 40
+
+
+def _explore(kind, key, label=None):
+    # widget callbacks run before the rerun, so the selectors can be moved here
+    st.session_state["graph_kind"] = kind.capitalize()
+    if kind == MEMBER:
+        st.session_state["graph_member_search"] = label or key
+    st.session_state[f"graph_key_{kind}"] = label or key
+
+
+class GraphTab:
+    def __init__(self, transformer):
+        self.graph = transformer.get_access_graph()
+        members = transformer.get_members_df()
+        self.member_emails = dict(zip(members['email'], members['_id'])) if 'email' in members else {}
+
+    def _member_options(self):
+        search = st.text_input("Search member", key="graph_member_search", placeholder="email")
+        search = (search or "").lower()
+        return [email for email in self.member_emails if search in str(email).lower()][:MAX_SEARCH_RESULTS]
+
+    def _select_node(self):
+        kind = st.radio("Explore", ["Role", "Team", "Member"], horizontal=True, key="graph_kind").lower()
+
+        if kind == ROLE:
+            options = self.graph.role_reach_df()['role'].tolist()
+        elif kind == TEAM:
+            options = sorted(split_node_id(node)[1] for node, data in self.graph.graph.nodes(data=True)
+                             if data["kind"] == TEAM)
+        else:
+            options = self._member_options()
+
+        if len(options) == 0:
+            st.info(f"No {kind}s found.")
+            return None
+
+        selected = st.selectbox(kind.capitalize(), options, key=f"graph_key_{kind}")
+        if kind == MEMBER:
+            return node_id(MEMBER, self.member_emails.get(selected, selected))
+        return node_id(kind, selected)
+
+    def _render_paths(self, node):
+        kind, key = split_node_id(node)
+        if kind == MEMBER:
+            st.markdown("##### Access Paths")
+            st.dataframe(self.graph.member_paths(key), hide_index=True, use_container_width=True)
+        elif kind == ROLE:
+            reach = self.graph.role_reach.get(key, {})
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Members", reach.get("total", 0))
+            col2.metric("Direct", reach.get("direct", 0))
+            col3.metric("Via Teams", reach.get("via_team", 0))
+            st.markdown("##### Access Paths")
+            st.dataframe(self.graph.role_paths(key), hide_index=True, use_container_width=True)
+
+    def _render_graph(self, node):
+        nodes, edges = self.graph.neighborhood(node, max_neighbors=MAX_NEIGHBORS)
+        positions = self.graph.positions(nodes)
+
+        agraph_nodes = []
+        for item in nodes:
+            x, y = positions.get(item["id"], (0, 0))
+            agraph_nodes.append(Node(id=item["id"],
+                                     label=item["label"],
+                                     title=item["id"],
+                                     color=NODE_COLORS.get(item["kind"], "#B3B3B3"),
+                                     size=NODE_SIZES.get(item["kind"], 12) * (1.5 if item["center"] else 1),
+                                     shape="box" if item.get("aggregate") else "dot",
+                                     x=x, y=y))
+        agraph_edges = [Edge(source=source, target=target) for source, target in edges]
+
+        config = Config(width=900, height=650, directed=True, physics=False, hierarchical=False)
+        clicked = agraph(nodes=agraph_nodes, edges=agraph_edges, config=config)
+
+        if clicked and clicked != node and ":more:" not in clicked and clicked in self.graph.graph:
+            kind, key = split_node_id(clicked)
+            st.button(f"Explore {self.graph.label(clicked)}", key="graph_explore_button",
+                      on_click=_explore, args=(kind, key, self.graph.label(clicked)))
+
+    def render(self):
+        col1, col2 = st.columns([0.35, 0.65])
+        with col1:
+            node = self._select_node()
+            st.markdown("##### Degree Statistics")
+            st.dataframe(self.graph.degree_stats, hide_index=True, use_container_width=True)
+            if node is not None:
+                self._render_paths(node)
+
+        with col2:
+            if node is not None:
+                self._render_graph(node)
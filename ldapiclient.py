@@ -1,38 +1,58 @@
-import requests
 import json
 from dotenv import load_dotenv
 import os
 
+from member_records import decode_member_page, json_default, loads
+
 
 class LaunchDarklyAPIClient:
+    page_limit = 20
+
     def __init__(self, api_key, debug=False,  base_url="https://app.launchdarkly.com/api/v2"):
         self.api_key = api_key
         self.base_url = base_url
         self.headers = {"Authorization": self.api_key}
         self.debug = debug
 
-    def _fetch_data(self, endpoint):
-        all_data = []
-        offset = 0
-        limit = 20
+    def fetch_page(self, endpoint, offset=0, limit=None, decode=loads, required=False):
+        # deferred, requests is only needed once data is fetched
+        import requests
+
+        limit = limit or self.page_limit
         url = f"{self.base_url}/{endpoint}"
+        params = {"limit": limit, "offset": offset}
+
+        if self.debug:
+            print(f"Calling {endpoint} url={url}, offset={offset}")
+
+        response = requests.get(url, headers=self.headers, params=params)
+        if response.status_code != 200:
+            # a required page that is missing, e.g. rate limited, would end the listing early
+            if required:
+                raise requests.HTTPError(f"{endpoint} returned HTTP {response.status_code} at offset {offset}",
+                                         response=response)
+            return None
+        # decodes the body bytes, with orjson or msgspec when installed instead of response.json()
+        return decode(response.content)
+
+    def iter_pages(self, endpoint, decode=loads, required=False):
+        offset = 0
 
         while True:
-            params = {"limit": limit, "offset": offset}
-
-            if self.debug:
-                print(f"Calling {endpoint} url={url}, offset={offset}, data_len={len(all_data)}")
-
-            response = requests.get(url, headers=self.headers, params=params)
-            if response.status_code != 200:
-                break 
+            data = self.fetch_page(endpoint, offset, decode=decode, required=required)
+            if data is None:
+                break
 
-            data = response.json()
-            all_data.extend(data["items"])
+            yield data["items"]
 
-            if len(data["items"]) != limit:
+            if len(data["items"]) != self.page_limit:
                 break
-            offset += limit
+            offset += self.page_limit
+
+    def _fetch_data(self, endpoint, decode=loads, required=False):
+        all_data = []
+        for items in self.iter_pages(endpoint, decode, required):
+            all_data.extend(items)
 
         return all_data
 
@@ -41,14 +61,15 @@ class LaunchDarklyAPIClient:
             os.makedirs(os.path.dirname(filename), exist_ok=True)
 
             with open(filename, "w") as f:
-                json.dump(data, f, indent=4)
+                json.dump(data, f, indent=4, default=json_default)
             print(f"Data saved successfully to {filename}")
         except Exception as e:
             print(f"Error saving data to file: {e}")
 
     def list_and_save_members(self, filename="members.json"):
         members = self.list_members()
-        self.save_data_to_file(members, filename)
+        if members is not None:
+            self.save_data_to_file(members, filename)
         return members
 
     def list_and_save_custom_roles(self, filename="custom_roles.json"):
@@ -62,11 +83,36 @@ class LaunchDarklyAPIClient:
         return teams
 
     def list_members(self):
+        # None when any page fails, part of the members would be analyzed as the whole account
         try:
-            return self._fetch_data("members")
+            return self._fetch_data("members", decode=decode_member_page, required=True)
         except Exception as e:
             print(f"Error listing members: {e}")
-            return []
+            return None
+
+    def count_members(self):
+        try:
+            data = self.fetch_page("members", limit=1)
+            return None if data is None else data.get("totalCount")
+        except Exception as e:
+            print(f"Error counting members: {e}")
+            return None
+
+    def list_member_pages(self, offsets):
+        # the pages that could be fetched and the number of pages that failed
+        pages = []
+        failed = 0
+        for offset in offsets:
+            try:
+                data = self.fetch_page("members", offset, decode=decode_member_page)
+            except Exception as e:
+                print(f"Error listing member page at offset {offset}: {e}")
+                data = None
+            if data is None:
+                failed += 1
+            else:
+                pages.append(data["items"])
+        return pages, failed
 
     def list_custom_roles(self):
         try:
@@ -92,12 +138,13 @@ class LaunchDarklyAPIClient:
 def main():
     load_dotenv()
     API_KEY = os.getenv("LAUNCHDARKLY_API_KEY")
-    DEBUG = os.getenv("DEBUG") or False
+    DEBUG = os.getenv("DEBUG", 'False').lower() == 'true'
+    OUTPUT_DIR = os.getenv("OUTPUT_DIR", 'output')
 
     client = LaunchDarklyAPIClient(API_KEY, DEBUG)
-    client.list_and_save_teams("output/teams.json")
-    client.list_and_save_custom_roles("output/roles.json")
-    client.list_and_save_members("output/members.json")
+    client.list_and_save_teams(f"{OUTPUT_DIR}/teams.json")
+    client.list_and_save_custom_roles(f"{OUTPUT_DIR}/roles.json")
+    client.list_and_save_members(f"{OUTPUT_DIR}/members.json")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,308 @@
+import gc
+import json
+import operator
+from collections.abc import MutableMapping
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import msgspec
+except ImportError:
+    # optional, without it members stay the dicts the JSON decoder returns
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    # optional, the standard json module decodes the same data, only slower
+    orjson = None
+
+
+# member fields of the API the Transformer and the tabs read
+SOURCE_FIELDS = ("_id", "firstName", "lastName", "email", "role", "customRoles", "_lastSeen", "creationDate",
+                 "_pendingInvite", "_verified")
+# columns prep_member adds
+DERIVED_FIELDS = ("quickstartStatus", "hasPermissionGrants", "isTeamMaintainer", "customRoles_count",
+                  "hasCustomRoles", "isTeamMember", "team_list", "teams_count", "days_since_last_seen")
+# other member fields of the API, only needed for exports and kept as raw JSON bytes.
+# Fields not listed here or above are kept decoded in the record's other dict.
+RAW_FIELDS = ("permissionGrants", "_links", "_lastSeenMetadata", "_integrationMetadata", "mfa",
+              "excludedDashboards", "roleAttributes")
+
+_FIELDS = SOURCE_FIELDS + DERIVED_FIELDS
+_FIELD_SET = frozenset(_FIELDS)
+# teams are raw too, prep reads only their keys
+_RAW_KEYS = ("teams",) + RAW_FIELDS
+_RAW_KEY_SET = frozenset(_RAW_KEYS)
+_KNOWN_FIELDS = frozenset(_FIELDS + _RAW_KEYS)
+_NAN = float("nan")
+
+DECODE_ERRORS = (ValueError,) if msgspec is None else (ValueError, msgspec.DecodeError)
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(data):
+    # JSON bytes of records, dicts or lists of them, decode_members and loads read it back.
+    # Much faster than pickle to send members to worker processes.
+    if msgspec is not None:
+        return msgspec.json.encode(data)
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data).encode()
+
+
+class MemberRecord:
+    # Base of the member records msgspec decodes straight from the response bytes, instead
+    # of a dict per member with nested dicts for links, teams and grants. A record holds
+    # the fields in SOURCE_FIELDS and DERIVED_FIELDS (UNSET when the member does not have
+    # them), its teams and RAW_FIELDS as raw JSON and any other field in other. It reads
+    # and writes like the dict it replaces, so prep_member, pandas and the exports take either.
+
+    __slots__ = ()
+
+    def prep(self, role_id_map):
+        # the record version of prep_member, without days_since_last_seen
+        self.quickstartStatus = ""
+        grants = self.permissionGrants
+        # nearly every member has none, only a non-empty raw list is decoded
+        has_grants = grants is not msgspec.UNSET and grants != b"[]" and len(_raw_list_decoder.decode(grants) or ()) > 0
+        self.hasPermissionGrants = self.isTeamMaintainer = has_grants
+
+        custom_roles = [role_id_map[_id] for _id in self.customRoles or () if _id in role_id_map]
+        self.customRoles = custom_roles
+        self.customRoles_count = len(custom_roles)
+        self.hasCustomRoles = len(custom_roles) > 0
+
+        teams = self.teams
+        has_teams = teams is not msgspec.UNSET and teams != b"[]"
+        team_list = [team.key for team in _team_keys_decoder.decode(teams) or ()] if has_teams else []
+        self.team_list = team_list
+        self.teams_count = len(team_list)
+        self.isTeamMember = len(team_list) > 0
+
+        last_seen = self._lastSeen
+        if last_seen is None or last_seen is msgspec.UNSET or last_seen < self.creationDate:
+            self._lastSeen = self.creationDate
+
+    def to_dict(self):
+        # the full member for exports, raw fields decoded again as the API sent them
+        data = loads(msgspec.json.encode(self))
+        data.update(data.pop("other", None) or {})
+        return data
+
+    def __getitem__(self, key):
+        value = self.get(key, _NAN)
+        if value is _NAN:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        # raw fields are decoded on each read, changes to the returned value need a write back
+        if key in _KNOWN_FIELDS:
+            value = getattr(self, key)
+            if value is msgspec.UNSET:
+                return default
+            return _value_decoder.decode(value) if key in _RAW_KEY_SET else value
+        if self.other is None:
+            return default
+        return self.other.get(key, default)
+
+    def __setitem__(self, key, value):
+        if key in _KNOWN_FIELDS:
+            setattr(self, key, msgspec.Raw(msgspec.json.encode(value)) if key in _RAW_KEY_SET else value)
+            return
+        if self.other is None:
+            self.other = {}
+        self.other[key] = value
+
+    def __delitem__(self, key):
+        if key in _KNOWN_FIELDS:
+            if getattr(self, key) is msgspec.UNSET:
+                raise KeyError(key)
+            setattr(self, key, msgspec.UNSET)
+            return
+        if self.other is None:
+            raise KeyError(key)
+        del self.other[key]
+
+    def __contains__(self, key):
+        return self.get(key, _NAN) is not _NAN
+
+    def __iter__(self):
+        for key in _FIELDS + _RAW_KEYS:
+            if getattr(self, key) is not msgspec.UNSET:
+                yield key
+        if self.other is not None:
+            yield from self.other
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def __repr__(self):
+        return f"MemberRecord({dict(self)!r})"
+
+
+# pandas and the exports check for a Mapping, Structs can not subclass it directly
+MutableMapping.register(MemberRecord)
+
+
+if msgspec is not None:
+    class _TeamKey(msgspec.Struct, gc=False):
+        key: str
+
+    def _record_struct(name, forbid_unknown_fields):
+        return msgspec.defstruct(
+            name,
+            [(key, Any, msgspec.UNSET) for key in _FIELDS]
+            + [(key, Union[msgspec.Raw, msgspec.UnsetType], msgspec.UNSET) for key in _RAW_KEYS]
+            + [("other", Any, None)],
+            bases=(MemberRecord,), module=__name__, omit_defaults=True, gc=False,
+            forbid_unknown_fields=forbid_unknown_fields)
+
+    # Members with only the fields above decode in one pass. A member with another field
+    # fails it, then the members are decoded again and their other fields kept.
+    _MemberRecordStruct = _record_struct("_MemberRecordStruct", True)
+    _OpenMemberRecordStruct = _record_struct("_OpenMemberRecordStruct", False)
+    _MemberPage = msgspec.defstruct(
+        "_MemberPage", [("items", List[_MemberRecordStruct]), ("totalCount", Any, None)],
+        module=__name__, gc=False)
+    _OpenMemberPage = msgspec.defstruct(
+        "_OpenMemberPage", [("items", List[_OpenMemberRecordStruct]), ("totalCount", Any, None)],
+        module=__name__, gc=False)
+    _RawMemberPage = msgspec.defstruct(
+        "_RawMemberPage", [("items", List[Dict[str, msgspec.Raw]])], module=__name__, gc=False)
+
+    _members_decoder = msgspec.json.Decoder(List[_MemberRecordStruct])
+    _open_members_decoder = msgspec.json.Decoder(List[_OpenMemberRecordStruct])
+    _raw_members_decoder = msgspec.json.Decoder(List[Dict[str, msgspec.Raw]])
+    _page_decoder = msgspec.json.Decoder(_MemberPage)
+    _open_page_decoder = msgspec.json.Decoder(_OpenMemberPage)
+    _raw_page_decoder = msgspec.json.Decoder(_RawMemberPage)
+    _raw_list_decoder = msgspec.json.Decoder(Optional[List[msgspec.Raw]])
+    _team_keys_decoder = msgspec.json.Decoder(Optional[List[_TeamKey]])
+    _value_decoder = msgspec.json.Decoder()
+
+
+def _copy_raw(records):
+    # decoded Raw values are views that keep the whole response or file buffer alive
+    for record in records:
+        for key in _RAW_KEYS:
+            value = getattr(record, key)
+            if value is not msgspec.UNSET:
+                setattr(record, key, value.copy())
+    return records
+
+
+def _keep_other(records, raw_members):
+    # the fields of each member no record attribute holds, decoded like the dict path would
+    for record, member in zip(records, raw_members):
+        other = {key: _value_decoder.decode(value) for key, value in member.items() if key not in _KNOWN_FIELDS}
+        if other:
+            record.other = other
+    return records
+
+
+def decode_members(data):
+    # JSON array of members -> records, or dicts without msgspec
+    if msgspec is None:
+        return loads(data)
+    try:
+        return _copy_raw(_members_decoder.decode(data))
+    except msgspec.ValidationError:
+        records = _open_members_decoder.decode(data)
+        return _copy_raw(_keep_other(records, _raw_members_decoder.decode(data)))
+
+
+def decode_member_page(data):
+    # a page of the members API, its items decoded like decode_members
+    if msgspec is None:
+        return loads(data)
+    try:
+        page = _page_decoder.decode(data)
+    except msgspec.ValidationError:
+        page = _open_page_decoder.decode(data)
+        _keep_other(page.items, _raw_page_decoder.decode(data).items)
+    return {"items": _copy_raw(page.items), "totalCount": page.totalCount}
+
+
+def read_members(file_path):
+    try:
+        with open(file_path, 'rb') as f:
+            return decode_members(f.read())
+    except FileNotFoundError:
+        print(f"Error: File not found at '{file_path}'")
+        return None
+    except DECODE_ERRORS:
+        print(f"Error: Invalid JSON format in '{file_path}'")
+        return None
+
+
+def records_frame(records):
+    # Columns read in C by attrgetter, the DataFrame of a list of dicts would first turn
+    # every record into a dict. Like there, keys missing on some records are NaN and keys
+    # no record has are no column. The raw fields are decoded one JSON array per column.
+    import pandas as pd
+
+    def values_of(key):
+        values = list(map(operator.attrgetter(key), records))
+        missing = values.count(msgspec.UNSET)
+        if missing == len(values):
+            return None
+        if key in _RAW_KEYS:
+            decoded = iter(_value_decoder.decode(
+                b"[" + b",".join(value for value in values if value is not msgspec.UNSET) + b"]"))
+            return [_NAN if value is msgspec.UNSET else next(decoded) for value in values]
+        if missing:
+            return [_NAN if value is msgspec.UNSET else value for value in values]
+        return values
+
+    columns = {}
+    # the decoded raw fields are many small containers, each batch would start collections
+    # scanning every record again
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for key in SOURCE_FIELDS + _RAW_KEYS:
+            values = values_of(key)
+            if values is not None:
+                columns[key] = values
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    other_keys = {}
+    for record in records:
+        if record.other is not None:
+            other_keys.update(dict.fromkeys(record.other))
+    for key in other_keys:
+        columns[key] = [_NAN if record.other is None else record.other.get(key, _NAN) for record in records]
+
+    for key in DERIVED_FIELDS:
+        values = values_of(key)
+        if values is not None:
+            columns[key] = values
+    return pd.DataFrame(columns)
+
+
+def export_member(member):
+    return member.to_dict() if isinstance(member, MemberRecord) else member
+
+
+def json_default(value):
+    # default= for json.dump(s) of data that may hold member records
+    if isinstance(value, MemberRecord):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+from custom_utils import memoize
+
 
 class MembersTab:
     def __init__(self, roles, metrics, members, teams):
@@ -30,6 +32,7 @@ class MembersTab:
                 all_roles.update(matching_team['customRoleKeys'].iloc[0])
         return list(all_roles)
 
+    @memoize
     def _get_active_members_with_combined_roles(self, last_days_ago=0):
 
         if last_days_ago == 0:
@@ -42,6 +45,7 @@ class MembersTab:
 
         return active_members_with_roles
 
+    @memoize
     def _get_inactive_members_with_combined_roles(self, older_than=30):
         inactive_members_with_roles = self.members[self.members['days_since_last_seen']
                                                    > older_than].copy()
@@ -52,6 +56,7 @@ class MembersTab:
 
         return inactive_members_with_roles
 
+    @memoize
     def _compute_role_utilization(self, last_days_ago):
 
         members_df = self._get_active_members_with_combined_roles(
@@ -71,6 +76,7 @@ class MembersTab:
             2)
         return utilization_rates
 
+    @memoize
     def _get_role_count(self, last_days_ago):
         # todo: there got to be a better way to do this
 
@@ -178,25 +184,33 @@ class MembersTab:
             st.metric(
                 "Inactive Users w/ Roles", f"{inactive_count}",  f"older than {older_30_days} days", delta_color="inverse",)
 
+    @memoize
+    def _assigned_roles_figures(self, last_days_ago):
+        role_counts = self._get_role_count(last_days_ago)
+
+        fig = self._create_active_role_heatmap(
+            role_counts=role_counts, last_days_ago=last_days_ago)
+
+        # print(role_counts)
+        aggregate_df = role_counts.groupby("unique_roles")[
+            "count"].sum().reset_index()
+
+        fig2 = self._create_top_roles_since(
+            role_counts=aggregate_df,  top_limit=5)
+        return fig, fig2
+
     def _assigned_roles_chart(self, last_days_ago=30):
 
-        role_counts = self._get_role_count(last_days_ago)
+        fig, fig2 = self._assigned_roles_figures(last_days_ago)
 
         col1, col2 = st.columns(2)
         with col1:
-            fig = self._create_active_role_heatmap(
-                role_counts=role_counts, last_days_ago=last_days_ago)
             st.plotly_chart(fig, theme="streamlit")
         with col2:
-            # print(role_counts)
-            aggregate_df = role_counts.groupby("unique_roles")[
-                "count"].sum().reset_index()
-
-            fig2 = self._create_top_roles_since(
-                role_counts=aggregate_df,  top_limit=5)
             st.plotly_chart(fig2, theme="streamlit")
 
-    def _render_lastseen(self):
+    @memoize
+    def _lastseen_figure(self):
         df = pd.DataFrame(self.members, columns=[
             "_lastSeen", "days_since_last_seen", ])
 
@@ -210,8 +224,10 @@ class MembersTab:
                            color="dayLastSeenBinned",
                            color_discrete_sequence=px.colors.qualitative.Set2,
                            category_orders={"dayLastSeenBinned": labels})
+        return fig
 
-        st.plotly_chart(fig, theme="streamlit")
+    def _render_lastseen(self):
+        st.plotly_chart(self._lastseen_figure(), theme="streamlit")
 
     def _render_members_table(self):
         column_config = {
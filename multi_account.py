@@ -0,0 +1,198 @@
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from app_config import AppConfig
+from data_source import fetch_data, is_complete
+from transformer import Transformer
+
+
+COMPARISON_METRICS = ['total_custom_role', 'orphaned_roles', 'total_assigned_roles',
+                      'distict_user_assigned_custom_roles', 'distict_team_assigned_custom_roles',
+                      'role_to_user_ratio', 'role_to_team_ratio', 'permission_to_role_ratio']
+
+# names become directories under the output dir, so no separators and no leading dot ("..")
+ACCOUNT_NAME = re.compile(r"[A-Za-z0-9_][A-Za-z0-9_.-]*")
+
+
+class AccountSpec:
+    def __init__(self, name, access_token=None, snapshot_dir=None):
+        self.name = name
+        self.access_token = access_token
+        self.snapshot_dir = snapshot_dir
+
+    def __str__(self) -> str:
+        source = f"snapshot_dir={self.snapshot_dir}" if self.snapshot_dir else "access_token=***"
+        return f"name={self.name}, {source}"
+
+
+class AccountResult:
+    def __init__(self, name, roles_df=None, members_df=None, teams_df=None, summary_metrics=None, policies=None,
+                 policy_index=None, error=None):
+        self.name = name
+        self.roles_df = roles_df
+        self.members_df = members_df
+        self.teams_df = teams_df
+        self.summary_metrics = summary_metrics or {}
+        self.policies = policies or {}
+        self.policy_index = policy_index
+        self.error = error
+        self._access_graph = None
+        self._role_counter = None
+        self._what_if = None
+        self._role_bitsets = None
+        self._privilege_scores = None
+
+    # same accessors as Transformer so the result can back a DetailsTab
+    def get_summary_metrics(self):
+        return self.summary_metrics
+
+    def get_members_df(self):
+        return self.members_df
+
+    def get_roles_df(self):
+        return self.roles_df
+
+    def get_teams_df(self):
+        return self.teams_df
+
+    def get_policies(self) -> dict:
+        return self.policies
+
+    def get_policy_index(self):
+        return self.policy_index
+
+    def get_access_graph(self):
+        if self._access_graph is None:
+            from access_graph import AccessGraph
+            self._access_graph = AccessGraph(self.members_df, self.teams_df, self.roles_df)
+        return self._access_graph
+
+    def get_role_counter(self):
+        # the worker only sends the tables back, the counters are rebuilt from them
+        if self._role_counter is None:
+            from role_metrics import RoleAssignmentCounter
+            self._role_counter = RoleAssignmentCounter.from_tables(self.members_df, self.teams_df, self.roles_df)
+        return self._role_counter
+
+    def get_what_if(self):
+        if self._what_if is None:
+            from what_if import WhatIfSimulator
+            self._what_if = WhatIfSimulator(self)
+        return self._what_if
+
+    def get_role_bitsets(self):
+        if self._role_bitsets is None:
+            from role_mining import RoleBitsets
+            self._role_bitsets = RoleBitsets(self.get_access_graph().member_access, self.get_policy_index(),
+                                             self.get_roles_df()['key'])
+        return self._role_bitsets
+
+    def get_privilege_scores(self):
+        if self._privilege_scores is None:
+            from privilege import score_members
+            self._privilege_scores = score_members(self)
+        return self._privilege_scores
+
+
+def load_accounts(filename):
+    # JSON list of {"name", "access_token" | "access_token_env" | "snapshot_dir"} entries
+    with open(filename, 'r') as f:
+        entries = json.load(f)
+
+    accounts = []
+    names = set()
+    for entry in entries:
+        # results are written to output_dir/<name> and compared by name
+        if entry['name'] in names:
+            raise ValueError(f"duplicate account name '{entry['name']}' in {filename}")
+        names.add(entry['name'])
+        access_token = entry.get('access_token')
+        if entry.get('access_token_env'):
+            access_token = os.getenv(entry['access_token_env'])
+
+        accounts.append(AccountSpec(name=entry['name'],
+                                    access_token=access_token,
+                                    snapshot_dir=entry.get('snapshot_dir')))
+    return accounts
+
+
+def _account_config(spec, output_dir, save_data, debug):
+    app_config = AppConfig()
+    app_config.debug = debug
+    app_config.access_token = spec.access_token
+
+    if spec.snapshot_dir:
+        app_config.read_local = True
+        app_config.save_data = False
+        app_config.output_dir = spec.snapshot_dir
+    else:
+        app_config.read_local = False
+        app_config.save_data = save_data
+        app_config.output_dir = f"{output_dir}/{spec.name}"
+
+    return app_config
+
+
+def analyze_account(spec, output_dir='output', save_data=False, debug=False):
+    if not isinstance(spec.name, str) or not ACCOUNT_NAME.fullmatch(spec.name):
+        return AccountResult(spec.name, error="invalid account name, use letters, digits, '.', '_' and '-'")
+
+    try:
+        app_config = _account_config(spec, output_dir, save_data, debug)
+
+        if app_config.access_token is None and not app_config.read_local:
+            return AccountResult(spec.name, error="missing access token")
+
+        ld_data = fetch_data(app_config)
+        if not is_complete(ld_data):
+            return AccountResult(spec.name, error="unable to load teams, roles and members data")
+
+        # snapshot accounts are never saved, their output dir is the input snapshot
+        transformer = Transformer(save=app_config.save_data, ld_data=ld_data)
+        transformer.process(output_dir=app_config.output_dir)
+
+        return AccountResult(spec.name,
+                             roles_df=transformer.get_roles_df(),
+                             members_df=transformer.get_members_df(),
+                             teams_df=transformer.get_teams_df(),
+                             summary_metrics=transformer.get_summary_metrics(),
+                             policies=transformer.get_policies(),
+                             policy_index=transformer.get_policy_index())
+    except Exception as e:
+        return AccountResult(spec.name, error=str(e))
+
+
+def analyze_accounts(accounts, output_dir='output', save_data=False, debug=False, max_workers=None):
+    if len(accounts) == 0:
+        return []
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(accounts))
+
+    if max_workers == 1:
+        return [analyze_account(spec, output_dir, save_data, debug) for spec in accounts]
+
+    # spawn so workers do not inherit the threads of a running Streamlit server
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as executor:
+        futures = [executor.submit(analyze_account, spec, output_dir, save_data, debug)
+                   for spec in accounts]
+        return [future.result() for future in futures]
+
+
+def compare_metrics(results):
+    rows = []
+    for result in results:
+        row = {'account': result.name, 'error': result.error}
+        for metric in COMPARISON_METRICS:
+            value = result.summary_metrics.get(metric)
+            row[metric] = value.item() if hasattr(value, 'item') else value
+        row['members'] = len(result.members_df) if result.members_df is not None else None
+        row['teams'] = len(result.teams_df) if result.teams_df is not None else None
+        rows.append(row)
+
+    return pd.DataFrame(rows).set_index('account')
@@ -0,0 +1,59 @@
+import os
+import time
+
+import streamlit as st
+import pandas as pd
+
+
+class PermissionUsageTab:
+    def __init__(self, transformer, audit_log_path, workers=1):
+        self.transformer = transformer
+        self.audit_log_path = audit_log_path
+        self.workers = workers
+        # the log is read once per transformer, the tab is kept across reruns
+        self._usage = None
+        self._elapsed = None
+
+    def _get_usage(self):
+        if self._usage is None:
+            from audit_log import audit_usage
+
+            start = time.perf_counter()
+            self._usage = audit_usage(self.transformer, [self.audit_log_path], self.workers)
+            self._elapsed = time.perf_counter() - start
+        return self._usage
+
+    def render(self):
+        if not os.path.exists(self.audit_log_path):
+            st.warning(f"Audit log not found at '{self.audit_log_path}'.")
+            return
+
+        with st.spinner("Reading the audit log..."):
+            usage = self._get_usage()
+        summary = usage.summary()
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Accesses", summary['accesses'])
+        col2.metric("Unused Roles", summary['unused_roles'])
+        col3.metric("Unused Statements", summary['unused_statements'])
+        col4.metric("Members w/ Unused Roles", summary['members_with_unused_roles'])
+        st.caption(f"{summary['entries']} entries ({usage.stats['bytes'] / 2**20:.0f} MB) read in {self._elapsed:.1f} s, "
+                   f"{summary['invalid_lines']} invalid lines skipped. Accesses allowed by a base role: "
+                   f"{summary['base_role_accesses']}, denied by a custom role: {summary['denied_accesses']}.")
+
+        st.markdown("##### Roles")
+        roles = pd.DataFrame(usage.role_rows())
+        if len(roles) > 0:
+            roles = roles.sort_values(["unused_members", "unused_statements"], ascending=False)
+        st.dataframe(roles, hide_index=True, use_container_width=True)
+
+        st.markdown("##### Members With Unused Roles")
+        members = pd.DataFrame([row for row in usage.member_rows() if row['unused_roles']])
+        if len(members) > 0:
+            members['unused_roles'] = members['unused_roles'].map(", ".join)
+            members = members.sort_values(["used_roles", "roles"], ascending=[True, False]).drop(columns=["_id"])
+        st.dataframe(members, hide_index=True, use_container_width=True)
+
+        st.markdown("##### Unused Statements")
+        statements = pd.DataFrame([row for row in usage.statement_rows() if row['accesses'] == 0])
+        st.dataframe(statements, hide_index=True, use_container_width=True)
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import re
+
+
+# statement fields whose order carries no meaning
+LIST_FIELDS = ("resources", "notResources", "actions", "notActions")
+
+_TAGS = re.compile(r";[^:]*")
+
+
+def strip_tags(specifier):
+    # "proj/*;mobile" -> "proj/*". Tags are not part of logged or listed resources, so a
+    # tagged pattern is matched like the pattern covering every resource it names.
+    return _TAGS.sub("", specifier) if ";" in specifier else specifier
+
+
+def pattern_regex(patterns):
+    # * is the only wildcard and stays within a segment, "proj/*" does not match the flags of a project
+    return re.compile("|".join(re.escape(strip_tags(pattern)).replace(r"\*", "[^:]*") for pattern in patterns))
+
+
+def canonical_statement(statement):
+    canonical = {}
+    for field, value in statement.items():
+        if field in LIST_FIELDS and isinstance(value, list):
+            value = sorted(set(value))
+        canonical[field] = value
+    return dict(sorted(canonical.items()))
+
+
+def statement_hash(canonical):
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()[:16]
+
+
+def _role_hash(statement_hashes):
+    # statement order does not change what a policy allows
+    return hashlib.sha256(",".join(sorted(statement_hashes)).encode()).hexdigest()[:16]
+
+
+class PolicyIndex:
+    # Policies as content-hashed statements. Identical statements are stored once
+    # across roles, and every role has a hash over its statements so unchanged
+    # roles can be skipped with a single comparison.
+
+    def __init__(self):
+        self.statements = {}
+        self.role_statements = {}
+        self.role_hashes = {}
+        self._refs = {}
+
+    def copy(self):
+        other = PolicyIndex()
+        other.statements = dict(self.statements)
+        other.role_statements = dict(self.role_statements)
+        other.role_hashes = dict(self.role_hashes)
+        other._refs = dict(self._refs)
+        return other
+
+    def set_role(self, role_key, policy):
+        # returns True when the role is new or its policy changed
+        hashes = []
+        for statement in policy or []:
+            canonical = canonical_statement(statement)
+            digest = statement_hash(canonical)
+            self.statements.setdefault(digest, canonical)
+            hashes.append(digest)
+
+        role_hash = _role_hash(hashes)
+        if self.role_hashes.get(role_key) == role_hash:
+            return False
+
+        self._replace(role_key, hashes, role_hash)
+        return True
+
+    def set_role_hashes(self, role_key, hashes, statements):
+        # rebuilds a role from stored statement hashes, see SnapshotStore.policy_index_on
+        for digest in hashes:
+            self.statements.setdefault(digest, statements[digest])
+        self._replace(role_key, hashes, _role_hash(hashes))
+
+    def _replace(self, role_key, hashes, role_hash):
+        # new references first, so statements shared with the old policy are not dropped
+        for digest in hashes:
+            self._refs[digest] = self._refs.get(digest, 0) + 1
+        self._release(self.role_statements.get(role_key, ()))
+
+        self.role_statements[role_key] = tuple(hashes)
+        self.role_hashes[role_key] = role_hash
+
+    def _release(self, hashes):
+        for digest in hashes:
+            self._refs[digest] -= 1
+            if self._refs[digest] == 0:
+                # no role uses the statement anymore
+                del self._refs[digest]
+                self.statements.pop(digest, None)
+
+    def remove_role(self, role_key):
+        self.role_hashes.pop(role_key, None)
+        self._release(self.role_statements.pop(role_key, ()))
+
+    def role_keys(self):
+        return list(self.role_hashes.keys())
+
+    def role_hash(self, role_key):
+        return self.role_hashes.get(role_key)
+
+    def statements_for(self, role_key):
+        return self.resolve(self.role_statements.get(role_key, ()))
+
+    def resolve(self, hashes):
+        return [self.statements[digest] for digest in hashes]
+
+    def statement_rows(self):
+        # (role_key, statement_hash) pairs, one per distinct statement of a role
+        return sorted({(role_key, digest) for role_key, hashes in self.role_statements.items() for digest in hashes})
+
+
+def with_statements(roles_df, policy_index):
+    # the policy column holds statement hashes, this copy has the statements, e.g. to save it
+    roles_df = roles_df.copy()
+    roles_df['policy'] = [policy_index.resolve(hashes) for hashes in roles_df['policy']]
+    return roles_df
+
+
+def _pair_modified(removed, added, statements):
+    # a removed and an added statement with the same effect and the same resources
+    # (or the same actions) are reported as one modified statement
+    modified = []
+    added = list(added)
+    remaining_removed = []
+    for old in removed:
+        old_statement = statements[0][old]
+        match = None
+        for new in added:
+            new_statement = statements[1][new]
+            if old_statement.get("effect") != new_statement.get("effect"):
+                continue
+            same_resources = all(old_statement.get(f) == new_statement.get(f) for f in ("resources", "notResources"))
+            same_actions = all(old_statement.get(f) == new_statement.get(f) for f in ("actions", "notActions"))
+            if same_resources or same_actions:
+                match = new
+                break
+
+        if match is None:
+            remaining_removed.append(old)
+        else:
+            added.remove(match)
+            modified.append((old, match))
+
+    return remaining_removed, added, modified
+
+
+def diff_policies(old, new):
+    # Compares two PolicyIndex objects. Roles with equal hashes are skipped, only
+    # changed roles are diffed statement by statement.
+    old_keys = set(old.role_hashes)
+    new_keys = set(new.role_hashes)
+
+    changed = {}
+    for role_key in sorted(old_keys & new_keys):
+        if old.role_hashes[role_key] == new.role_hashes[role_key]:
+            continue
+
+        old_hashes = set(old.role_statements[role_key])
+        new_hashes = set(new.role_statements[role_key])
+        removed, added, modified = _pair_modified(sorted(old_hashes - new_hashes), sorted(new_hashes - old_hashes),
+                                                  (old.statements, new.statements))
+        changed[role_key] = {
+            "added": [new.statements[digest] for digest in added],
+            "removed": [old.statements[digest] for digest in removed],
+            "modified": [{"before": old.statements[before], "after": new.statements[after]}
+                         for before, after in modified],
+        }
+
+    return {
+        "added_roles": sorted(new_keys - old_keys),
+        "removed_roles": sorted(old_keys - new_keys),
+        "changed_roles": changed,
+        "unchanged_roles": len(old_keys & new_keys) - len(changed),
+    }
+
+
+def _describe(statement):
+    resources = statement.get("resources", statement.get("notResources", []))
+    actions = statement.get("actions", statement.get("notActions", []))
+    return statement.get("effect"), ", ".join(resources), ", ".join(actions)
+
+
+def diff_rows(diff):
+    # flattens diff_policies() for a table, one row per role or statement change
+    rows = []
+    for role_key in diff["added_roles"]:
+        rows.append({"role": role_key, "change": "role added", "effect": None, "resources": None, "actions": None})
+    for role_key in diff["removed_roles"]:
+        rows.append({"role": role_key, "change": "role removed", "effect": None, "resources": None, "actions": None})
+
+    for role_key, changes in diff["changed_roles"].items():
+        for change in ("added", "removed"):
+            for statement in changes[change]:
+                effect, resources, actions = _describe(statement)
+                rows.append({"role": role_key, "change": f"statement {change}", "effect": effect,
+                             "resources": resources, "actions": actions})
+        for pair in changes["modified"]:
+            before, after = _describe(pair["before"]), _describe(pair["after"])
+            rows.append({"role": role_key, "change": "statement modified", "effect": after[0],
+                         "resources": after[1] if before[1] == after[1] else f"{before[1]} -> {after[1]}",
+                         "actions": after[2] if before[2] == after[2] else f"{before[2]} -> {after[2]}"})
+    return rows
+
+
+def diff_summary(diff):
+    return {
+        "added_roles": len(diff["added_roles"]),
+        "removed_roles": len(diff["removed_roles"]),
+        "changed_roles": len(diff["changed_roles"]),
+        "unchanged_roles": diff["unchanged_roles"],
+        "added_statements": sum(len(c["added"]) for c in diff["changed_roles"].values()),
+        "removed_statements": sum(len(c["removed"]) for c in diff["changed_roles"].values()),
+        "modified_statements": sum(len(c["modified"]) for c in diff["changed_roles"].values()),
+    }
+
+
+def index_roles(roles):
+    # PolicyIndex of raw API roles, e.g. a previously saved roles.json
+    index = PolicyIndex()
+    for role in roles or []:
+        index.set_role(role["key"], role.get("policy"))
+    return index
@@ -0,0 +1,258 @@
+import hashlib
+import math
+import random
+import threading
+
+from role_metrics import RoleAssignmentCounter
+from snapshot_store import INACTIVE_DAYS
+from transformer import prep_member
+
+
+# two-sided 95% bounds
+Z_95 = 1.96
+HLL_PRECISION = 12
+TOP_ROLES = 5
+
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(65)]
+
+
+class HyperLogLog:
+    # Distinct count sketch: a fixed 2**precision registers whatever the number of
+    # values added, mergeable across pages. Relative standard error 1.04 / sqrt(2**precision).
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        hashed = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+        index = hashed >> (64 - self.precision)
+        rest = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        zeros = self.registers.count(0)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(map(_INVERSE_POWERS.__getitem__, self.registers))
+        if zeros and estimate <= 2.5 * m:
+            # linear counting is more accurate while registers are still empty
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+
+def sample_page_offsets(total, page_size, page_count, seed=None):
+    # offsets of page_count random pages, spread over the whole account
+    pages = math.ceil(total / page_size) if total else 0
+    if page_count >= pages:
+        return [page * page_size for page in range(pages)]
+    return sorted(page * page_size for page in random.Random(seed).sample(range(pages), page_count))
+
+
+def _wilson_bounds(successes, n, population, z=Z_95, sketch_error=0.0):
+    # proportion bounds of a sample of n out of population, shrunk by the finite population
+    # correction and widened by the relative error of the sketched counts
+    if n == 0:
+        return 0.0, 0.0, 1.0
+    p = min(successes / n, 1.0)
+    fpc = math.sqrt(max(population - n, 0) / (population - 1)) if population > 1 else 0.0
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    low = p - (p - (center - half)) * fpc - p * sketch_error
+    high = p + (center + half - p) * fpc + p * sketch_error
+    return p, max(low, 0.0), min(high, 1.0)
+
+
+def _chao1_bounds(seen, once, twice, cap, z=Z_95):
+    # Chao1 estimate of the number of distinct roles from the roles seen once and twice, with
+    # Chao's log-normal interval for the unseen ones, all within [seen, cap]
+    if twice:
+        unseen = once * once / (2 * twice)
+        ratio = once / twice
+        variance = twice * (ratio ** 2 / 2 + ratio ** 3 + ratio ** 4 / 4)
+    else:
+        unseen = once * (once - 1) / 2
+        variance = unseen + once * (2 * once - 1) ** 2 / 4 - once ** 4 / (4 * (seen + unseen)) if unseen else 0.0
+    if unseen == 0:
+        return seen, seen, seen
+    k = math.exp(z * math.sqrt(math.log(1 + max(variance, 0.0) / (unseen * unseen))))
+    return min(seen + unseen, cap), min(seen + unseen / k, cap), min(seen + unseen * k, cap)
+
+
+def _estimate(value, low, high):
+    return {'value': value, 'low': low, 'high': high}
+
+
+class PreviewSample:
+    # Sketches of a sample of member pages. Members are counted once even when
+    # pages overlap, e.g. when the account changes between page requests.
+
+    def __init__(self, teams, roles, today=None):
+        self.role_id_map = {role['_id']: role['key'] for role in roles}
+        self.team_roles = {team['key']: team['customRoleKeys'] for team in teams}
+        self.today = today
+
+        self.pages = 0
+        self.members = HyperLogLog()
+        self.active_with_roles = HyperLogLog()
+        self.inactive_with_roles = HyperLogLog()
+        # role key -> active members holding it, directly or through a team
+        self.role_members = {}
+        # roles assigned to a sampled member directly
+        self.direct_roles = set()
+
+        self.direct_assignments = 0
+        self.direct_assignments_sq = 0
+        self.member_rows = 0
+
+    def add_page(self, members):
+        self.pages += 1
+        for member in members:
+            prep_member(member, self.role_id_map, self.today)
+            member_id = member['_id']
+            direct = member['customRoles']
+
+            self.members.add(member_id)
+            self.member_rows += 1
+            self.direct_assignments += len(direct)
+            self.direct_assignments_sq += len(direct) ** 2
+            self.direct_roles.update(direct)
+
+            roles = set(direct)
+            for team in member['team_list']:
+                roles.update(self.team_roles.get(team, ()))
+            if len(roles) == 0:
+                continue
+
+            if member['days_since_last_seen'] > INACTIVE_DAYS:
+                self.inactive_with_roles.add(member_id)
+                continue
+
+            self.active_with_roles.add(member_id)
+            for role_key in roles:
+                sketch = self.role_members.get(role_key)
+                if sketch is None:
+                    sketch = self.role_members[role_key] = HyperLogLog()
+                sketch.add(member_id)
+
+
+def estimate_preview(teams, roles, member_pages, total_members, today=None, z=Z_95, failed_pages=0):
+    # Approximate summary metrics, role utilization and top roles from sampled member
+    # pages. Teams and roles are small and complete, so everything derived from them
+    # alone is exact. Member derived values come with low/high bounds.
+    sample = PreviewSample(teams, roles, today)
+    for page in member_pages:
+        sample.add_page(page)
+
+    counter = RoleAssignmentCounter()
+    for team in teams:
+        counter.set_team(team['key'], team['customRoleKeys'])
+    for role in roles:
+        counter.set_role(role['key'], len(role['policy']))
+    metrics = counter.summary_metrics()
+
+    n = min(sample.members.count(), sample.member_rows)
+    total_members = max(total_members, n)
+    sketch_error = sample.members.relative_error()
+    fpc = math.sqrt(max(total_members - n, 0) / (total_members - 1)) if total_members > 1 else 0.0
+
+    rows = max(sample.member_rows, 1)
+    mean = sample.direct_assignments / rows
+    variance = max(sample.direct_assignments_sq / rows - mean * mean, 0.0)
+    half = z * math.sqrt(variance / rows) * fpc
+    metrics['role_to_user_ratio'] = mean
+
+    # roles no sampled member holds may still be assigned outside the sample
+    total_custom_role = metrics['total_custom_role']
+    assigned = len(sample.direct_roles | set(counter.team_role_counts))
+    metrics['distict_user_assigned_custom_roles'] = len(sample.direct_roles)
+    metrics['total_assigned_roles'] = assigned
+    metrics['orphaned_roles'] = total_custom_role - assigned
+
+    bounds = {
+        'role_to_user_ratio': _estimate(mean, max(mean - half, 0.0), mean + half),
+        'distict_user_assigned_custom_roles': _estimate(len(sample.direct_roles), len(sample.direct_roles),
+                                                        total_custom_role),
+        'total_assigned_roles': _estimate(assigned, assigned, total_custom_role),
+        'orphaned_roles': _estimate(total_custom_role - assigned, 0, total_custom_role - assigned),
+    }
+
+    active_with_roles = sample.active_with_roles.count()
+    active_population = total_members * active_with_roles / n if n else 0
+    utilization = []
+    role_counts = []
+    for role_key, sketch in sample.role_members.items():
+        holders = min(sketch.count(), active_with_roles)
+        rate, low, high = _wilson_bounds(holders, active_with_roles, active_population, z, sketch_error)
+        utilization.append({'role': role_key, 'utilization_rate': round(rate * 100, 2),
+                            'low': round(low * 100, 2), 'high': round(high * 100, 2)})
+
+        share, low, high = _wilson_bounds(holders, n, total_members, z, sketch_error)
+        role_counts.append({'role': role_key, 'holders': holders, 'count': round(share * total_members),
+                            'low': round(low * total_members), 'high': round(high * total_members)})
+    utilization.sort(key=lambda row: row['role'])
+
+    overall = None
+    if utilization:
+        # Rarely held roles are likely missing from the sample and would pull the exact mean
+        # down, their number is estimated from the roles seen once and twice (Chao1). The most
+        # roles go with the low rates and the fewest with the high ones.
+        seen = len(utilization)
+        once = sum(1 for row in role_counts if row['holders'] == 1)
+        twice = sum(1 for row in role_counts if row['holders'] == 2)
+        roles_estimate, roles_low, roles_high = _chao1_bounds(seen, once, twice, max(total_custom_role, seen), z)
+        overall = _estimate(sum(row['utilization_rate'] for row in utilization) / roles_estimate,
+                            sum(row['low'] for row in utilization) / roles_high,
+                            sum(row['high'] for row in utilization) / roles_low)
+
+    share, low, high = _wilson_bounds(sample.inactive_with_roles.count(), n, total_members, z, sketch_error)
+    inactive = _estimate(round(share * total_members), round(low * total_members), round(high * total_members))
+
+    return {
+        'sampled_members': n,
+        'sampled_pages': sample.pages,
+        'failed_pages': failed_pages,
+        'total_members': total_members,
+        'summary_metrics': metrics,
+        'bounds': bounds,
+        'utilization': utilization,
+        'overall_utilization': overall,
+        'inactive_members_with_roles': inactive,
+        'top_roles': [{key: row[key] for key in ('role', 'count', 'low', 'high')}
+                      for row in sorted(role_counts, key=lambda row: (-row['count'], row['role']))[:TOP_ROLES]],
+    }
+
+
+class BackgroundPass:
+    # runs the exact analysis in a worker thread while the preview is shown
+
+    def __init__(self, compute):
+        self.result = None
+        self.error = None
+        self._compute = compute
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ld-exact-pass", daemon=True)
+
+    def _run(self):
+        try:
+            self.result = self._compute()
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self._done.set()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def done(self):
+        return self._done.is_set()
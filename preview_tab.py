@@ -0,0 +1,94 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+
+from custom_utils import memoize
+
+
+def _format_range(estimate, fmt="{:,.0f}"):
+    return f"{fmt.format(estimate['low'])} – {fmt.format(estimate['high'])}"
+
+
+class PreviewTab:
+    # approximate results from estimate_preview(), shown until the exact pass finishes
+    def __init__(self, preview):
+        self.preview = preview
+
+    def _render_summary(self):
+        metrics = self.preview['summary_metrics']
+        bounds = self.preview['bounds']
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Custom Roles", metrics['total_custom_role'])
+        col2.metric("Role to User Ratio", f"{metrics['role_to_user_ratio']:.2f}",
+                    f"± {(bounds['role_to_user_ratio']['high'] - bounds['role_to_user_ratio']['low']) / 2:.2f}",
+                    delta_color="off",
+                    help=f"95% range {_format_range(bounds['role_to_user_ratio'], '{:.2f}')}")
+        col3.metric("Assigned Roles", f"≥ {metrics['total_assigned_roles']}",
+                    help="Roles held by sampled members or teams. Roles only held outside the sample are "
+                         f"missing, range {_format_range(bounds['total_assigned_roles'])}")
+        col4.metric("Orphaned Roles", f"≤ {metrics['orphaned_roles']}",
+                    help=f"range {_format_range(bounds['orphaned_roles'])}")
+
+    def _render_utilization(self):
+        overall = self.preview['overall_utilization']
+        inactive = self.preview['inactive_members_with_roles']
+        utilization = self.preview['utilization']
+
+        col1, col2, col3, col4 = st.columns(4)
+        if overall is not None:
+            col1.metric("Utilization Rate", f"{overall['value']:.2f}%",
+                        f"{overall['low']:.2f}% – {overall['high']:.2f}%", delta_color="off",
+                        help="Mean of the per-role rates. Rarely held roles may be missing from the sample.")
+
+            highest = max(utilization, key=lambda row: row['utilization_rate'])
+            lowest = min(utilization, key=lambda row: row['utilization_rate'])
+            col2.metric("Max", f"{highest['utilization_rate']}", highest['role'],
+                        help=f"95% range {highest['low']} – {highest['high']}")
+            col3.metric("Min", f"{lowest['utilization_rate']}", lowest['role'], delta_color="inverse",
+                        help=f"95% range {lowest['low']} – {lowest['high']}")
+
+        col4.metric("Inactive Users w/ Roles", f"~{inactive['value']:,}", _format_range(inactive),
+                    delta_color="off")
+
+    @memoize
+    def _top_roles_figure(self):
+        df = pd.DataFrame(self.preview['top_roles'])
+        if df.empty:
+            return None
+
+        df['above'] = df['high'] - df['count']
+        df['below'] = df['count'] - df['low']
+        fig = px.bar(df.iloc[::-1], x='count', y='role', orientation='h',
+                     error_x='above', error_x_minus='below',
+                     labels={"role": "Roles", "count": "estimated count"},
+                     title=f"Top {len(df)} Roles (estimated)",
+                     color="count")
+        return fig
+
+    def _render_utilization_table(self):
+        df = pd.DataFrame(self.preview['utilization'], columns=['role', 'utilization_rate', 'low', 'high'])
+        st.dataframe(df, hide_index=True, use_container_width=True,
+                     column_config={'low': st.column_config.NumberColumn("95% low"),
+                                    'high': st.column_config.NumberColumn("95% high")})
+
+    def render(self):
+        preview = self.preview
+        st.info(f"Preview from {preview['sampled_members']:,} of {preview['total_members']:,} members "
+                f"({preview['sampled_pages']} sampled pages). Ranges are 95% bounds, the exact results "
+                "replace them once the full analysis finishes.")
+        if preview['failed_pages']:
+            st.warning(f"{preview['failed_pages']} of {preview['sampled_pages'] + preview['failed_pages']} sampled "
+                       "pages could not be fetched, the estimates are based on the others.")
+
+        self._render_summary()
+        st.markdown("### Utilization Rate last 30 days (estimated)")
+        self._render_utilization()
+
+        col1, col2 = st.columns([0.5, 0.5])
+        with col1:
+            fig = self._top_roles_figure()
+            if fig is not None:
+                st.plotly_chart(fig, theme="streamlit")
+        with col2:
+            self._render_utilization_table()
@@ -0,0 +1,220 @@
+import numpy as np
+import pandas as pd
+
+from access_graph import DIRECT
+from policy_index import pattern_regex, strip_tags
+
+
+# role sets scored per step, a step holds the cell class bits of their roles
+SET_BLOCK = 4096
+
+SCORE_COLUMNS = ["member", "_id", "base_role", "roles", "direct_roles", "team_roles", "breadth", "denied",
+                 "risk_score", "broadest_role"]
+
+
+def _covers(patterns):
+    # covers[i, j]: pattern i matches pattern j as written, "proj/*" covers "proj/x" and itself
+    regexes = [pattern_regex([pattern]) for pattern in patterns]
+    covers = [[regex.fullmatch(other) is not None for other in patterns] for regex in regexes]
+    return np.array(covers, dtype=bool).reshape(len(patterns), len(patterns))
+
+
+def _statement_rows(statement, field, index, covers):
+    # the patterns of the universe a statement's resources (or actions) cover, inverted for notResources
+    negated = f"not{field[0].upper()}{field[1:]}"
+    names = statement.get(negated) if negated in statement else statement.get(field)
+    row = np.zeros(len(index), dtype=bool)
+    for name in names or []:
+        row |= covers[index[strip_tags(name)]]
+    return ~row if negated in statement else row
+
+
+def _pack(rows):
+    # bool rows -> uint64 words, and a zero row for members without roles
+    packed = np.packbits(rows, axis=1, bitorder="little")
+    words = -(-packed.shape[1] // 8)
+    padded = np.zeros((len(rows) + 1, words * 8), dtype=np.uint8)
+    padded[:len(rows), :packed.shape[1]] = packed
+    return padded.view(np.uint64)
+
+
+class PrivilegeScores:
+    # Effective privilege breadth of every member. The resource and action patterns of all
+    # policies span a universe of (resource, action) cells, a wildcard pattern covering the
+    # patterns it matches. Each role allows and denies a set of cells, and cells no role tells
+    # apart are merged into classes. The class bits of the direct and team roles of every
+    # distinct member role set (sets x roles x classes) are then or-reduced, deny wins over allow.
+
+    def __init__(self, member_access, policy_index, role_keys, member_labels=None, base_roles=None):
+        self.role_keys = list(role_keys)
+        role_index = {key: index for index, key in enumerate(self.role_keys)}
+        statements = policy_index.statements
+
+        resources = sorted({strip_tags(name) for statement in statements.values()
+                            for field in ("resources", "notResources") for name in statement.get(field) or []})
+        actions = sorted({name for statement in statements.values()
+                          for field in ("actions", "notActions") for name in statement.get(field) or []})
+        self.cell_count = len(resources) * len(actions)
+
+        # a cell weighs the patterns its resource and action span, "proj/*:env/*:flag/*" x "*" the most
+        resource_covers = _covers(resources)
+        action_covers = _covers(actions)
+        weights = np.outer(resource_covers.sum(axis=1), action_covers.sum(axis=1)).ravel().astype(np.float64)
+        self.total_weight = weights.sum()
+
+        resource_index = {name: index for index, name in enumerate(resources)}
+        action_index = {name: index for index, name in enumerate(actions)}
+        cells = {}
+        for digest, statement in statements.items():
+            resource_row = _statement_rows(statement, "resources", resource_index, resource_covers)
+            action_row = _statement_rows(statement, "actions", action_index, action_covers)
+            cells[digest] = np.outer(resource_row, action_row).ravel()
+
+        # roles x cells, allowed and denied
+        allow = np.zeros((len(self.role_keys), self.cell_count), dtype=bool)
+        deny = np.zeros_like(allow)
+        for role_key, role in role_index.items():
+            for digest in policy_index.role_statements.get(role_key, ()):
+                target = deny if statements[digest].get("effect") == "deny" else allow
+                target[role] |= cells[digest]
+
+        # cells with the same allow and deny roles are one class, weighed by their cells
+        if len(self.role_keys) and self.cell_count:
+            packed = np.packbits(np.vstack([allow, deny]), axis=0)
+            classes = np.unique(packed.T, axis=0, return_inverse=True)[1].ravel()
+        else:
+            classes = np.zeros(self.cell_count, dtype=np.int64)
+        class_count = int(classes.max()) + 1 if len(classes) else 0
+        self._class_cells = np.bincount(classes, minlength=class_count).astype(np.float64)
+        self._class_weights = np.bincount(classes, weights=weights, minlength=class_count)
+        first = np.unique(classes, return_index=True)[1]
+        self._class_count = class_count
+        self._allow = _pack(allow[:, first])
+        self._deny = _pack(deny[:, first])
+        # the weight each role allows on its own, without the denies of other roles
+        self.role_weights = (allow & ~deny) @ weights
+
+        # Members are scored by their distinct role sets, which members share through teams
+        self.member_ids = list(member_access)
+        member_keys = []
+        direct_roles = []
+        team_roles = []
+        for access in member_access.values():
+            member_keys.append(frozenset(access))
+            direct = team = 0
+            for paths in access.values():
+                is_direct = DIRECT in paths
+                direct += is_direct
+                team += len(paths) > is_direct
+            direct_roles.append(direct)
+            team_roles.append(team)
+        self.roles = np.fromiter(map(len, member_keys), dtype=np.int64, count=len(member_keys))
+        self.direct_roles = np.array(direct_roles, dtype=np.int64)
+        self.team_roles = np.array(team_roles, dtype=np.int64)
+
+        # Sets with the most roles first, a set without roles has the zero row (len(role_keys)).
+        # The k-th roles of all sets with more than k roles are then _slots[k], a prefix of the sets.
+        role_sets = sorted(set(member_keys), key=len, reverse=True)
+        position = {roles: index for index, roles in enumerate(role_sets)}
+        self._member_sets = np.fromiter(map(position.__getitem__, member_keys), dtype=np.int64,
+                                        count=len(member_keys))
+        no_role = len(self.role_keys)
+        role_sets = [[role_index.get(role_key, no_role) for role_key in roles] or [no_role] for roles in role_sets]
+        sizes = np.fromiter(map(len, role_sets), dtype=np.int64, count=len(role_sets))
+        self._slots = []
+        for slot in range(int(sizes[0]) if len(sizes) else 0):
+            count = int(np.count_nonzero(sizes > slot))
+            self._slots.append(np.array([roles[slot] for roles in role_sets[:count]], dtype=np.int64))
+        self.member_labels = member_labels or {}
+        self.base_roles = base_roles or {}
+
+        breadth, denied, weight = self._score()
+        self.breadth = breadth[self._member_sets]
+        self.denied = denied[self._member_sets]
+        self.weight = weight[self._member_sets]
+
+    def _or_roles(self, rows, start, end):
+        # the or of the rows of each set's roles, one gather per role slot
+        result = rows[self._slots[0][start:end]]
+        for slot in self._slots[1:]:
+            if len(slot) <= start:
+                break
+            roles = slot[start:end]
+            result[:len(roles)] |= rows[roles]
+        return result
+
+    def _score(self):
+        # Per byte of the class bits, the cells and the weight of each of its 256 values, so a
+        # set's sums are one lookup per byte. Cells are exact as int32, weights only feed a percentage.
+        byte_count = self._allow.shape[1] * 8
+        bit_values = (np.arange(256)[:, None] >> np.arange(8)) & 1
+        cell_table = np.zeros(byte_count * 8)
+        cell_table[:self._class_count] = self._class_cells
+        weight_table = np.zeros(byte_count * 8)
+        weight_table[:self._class_count] = self._class_weights
+        cell_table = (cell_table.reshape(byte_count, 8) @ bit_values.T).astype(np.int32).ravel()
+        weight_table = (weight_table.reshape(byte_count, 8) @ bit_values.T).astype(np.float32).ravel()
+        byte_offsets = np.arange(byte_count, dtype=np.intp) * 256
+
+        set_count = len(self._slots[0]) if self._slots else 0
+        breadth = np.zeros(set_count, dtype=np.int64)
+        denied = np.zeros(set_count, dtype=np.int64)
+        weight = np.zeros(set_count)
+        for start in range(0, set_count, SET_BLOCK):
+            end = min(start + SET_BLOCK, set_count)
+            allow = self._or_roles(self._allow, start, end)
+            deny = self._or_roles(self._deny, start, end)
+            allowed = (allow & ~deny).view(np.uint8) + byte_offsets
+            blocked = (allow & deny).view(np.uint8) + byte_offsets
+            breadth[start:end] = cell_table.take(allowed).sum(axis=1)
+            denied[start:end] = cell_table.take(blocked).sum(axis=1)
+            weight[start:end] = weight_table.take(allowed).sum(axis=1, dtype=np.float64)
+        return breadth, denied, weight
+
+    def risk_scores(self):
+        # weighted share of all cells in percent
+        if self.total_weight == 0:
+            return np.zeros(len(self.member_ids))
+        return np.round(100 * self.weight / self.total_weight, 1)
+
+    def broadest_roles(self):
+        # the member's role allowing the most weight on its own, its first one on ties
+        if not self._slots:
+            return np.array([], dtype=object)
+        role_weights = np.append(self.role_weights, -1)
+        best = self._slots[0].copy()
+        for slot in self._slots[1:]:
+            better = role_weights[slot] > role_weights[best[:len(slot)]]
+            best[:len(slot)][better] = slot[better]
+        role_keys = np.array(self.role_keys + [""], dtype=object)
+        return role_keys[best][self._member_sets]
+
+    def to_df(self):
+        return pd.DataFrame({
+            "member": [self.member_labels.get(member_id, member_id) for member_id in self.member_ids],
+            "_id": self.member_ids,
+            "base_role": [self.base_roles.get(member_id, "") for member_id in self.member_ids],
+            "roles": self.roles,
+            "direct_roles": self.direct_roles,
+            "team_roles": self.team_roles,
+            "breadth": self.breadth,
+            "denied": self.denied,
+            "risk_score": self.risk_scores(),
+            "broadest_role": self.broadest_roles(),
+        }, columns=SCORE_COLUMNS)
+
+
+def score_members(source):
+    # PrivilegeScores of a Transformer or an AccountResult
+    members_df = source.get_members_df()
+    graph = source.get_access_graph()
+    base_roles = dict(zip(members_df['_id'], members_df['role'])) if 'role' in members_df else {}
+    return PrivilegeScores(graph.member_access, source.get_policy_index(), source.get_roles_df()['key'],
+                           graph.member_labels, base_roles)
+
+
+def most_privileged(scores_df, sort_by="risk_score", limit=100, base_roles=None):
+    # top members by a score column, ties by breadth; nlargest avoids sorting every member
+    df = scores_df if not base_roles else scores_df[scores_df["base_role"].isin(base_roles)]
+    columns = [sort_by] + [column for column in ("risk_score", "breadth") if column != sort_by]
+    return df.nlargest(limit, columns)
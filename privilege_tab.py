@@ -0,0 +1,52 @@
+import time
+
+import streamlit as st
+
+from privilege import most_privileged
+
+
+SORT_COLUMNS = {
+    "Risk score": "risk_score",
+    "Breadth": "breadth",
+    "Denied": "denied",
+    "Roles": "roles",
+}
+
+
+class PrivilegeTab:
+    def __init__(self, transformer):
+        self.transformer = transformer
+        # the scores stay the same for the transformer, only the selection changes on reruns
+        self._scores_df = None
+        self._elapsed_ms = None
+
+    def _get_scores_df(self):
+        if self._scores_df is None:
+            start = time.perf_counter()
+            self._scores_df = self.transformer.get_privilege_scores().to_df()
+            self._elapsed_ms = (time.perf_counter() - start) * 1000
+        return self._scores_df
+
+    def render(self):
+        with st.spinner("Scoring member privileges..."):
+            df = self._get_scores_df()
+        scores = self.transformer.get_privilege_scores()
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Members", len(df))
+        col2.metric("With Custom Privileges", int((df['breadth'] > 0).sum()))
+        col3.metric("Median Risk Score", f"{df['risk_score'].median():.1f}" if len(df) > 0 else "0")
+        col4.metric("Permission Cells", scores.cell_count)
+        st.caption(f"Scored in {self._elapsed_ms:.0f} ms. Breadth counts the (resource, action) pairs of all "
+                   "policies a member's direct and team roles allow after denies; the risk score weighs them by "
+                   "how many patterns they span, in percent of all pairs. Base roles are not scored.")
+
+        col1, col2, col3 = st.columns([2, 1, 1])
+        base_roles = col1.multiselect("Base role", sorted(df['base_role'].dropna().unique()),
+                                      key="privilege_base_roles")
+        sort_by = col2.selectbox("Sort by", list(SORT_COLUMNS), key="privilege_sort_by")
+        limit = col3.number_input("Members", 10, 10000, 100, 10, key="privilege_limit")
+
+        st.markdown("##### Most Privileged Members")
+        top = most_privileged(df, SORT_COLUMNS[sort_by], int(limit), base_roles)
+        st.dataframe(top.drop(columns=["_id"]), hide_index=True, use_container_width=True)
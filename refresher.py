@@ -0,0 +1,189 @@
+import copy
+import datetime
+import hashlib
+import os
+import threading
+
+from custom_utils import Utils
+from data_source import fetch_local, fetch_remote, is_complete
+from transformer import Transformer, source_digests
+
+
+SNAPSHOT_META = "snapshot-meta.json"
+
+
+def token_fingerprint(access_token):
+    return hashlib.sha256((access_token or "").encode()).hexdigest()[:16]
+
+
+class Snapshot:
+    def __init__(self, ld_data, transformer, loaded_at, source, policy_changes=None, digests=None):
+        self.ld_data = ld_data
+        self.transformer = transformer
+        self.loaded_at = loaded_at
+        self.source = source
+        # diff_summary() against the previous snapshot, None for the first one
+        self.policy_changes = policy_changes
+        # source_digests() of the fetched data, the next refresh applies what changed since
+        self.digests = digests
+
+    def age(self):
+        return datetime.datetime.now() - self.loaded_at
+
+
+class BackgroundRefresher:
+    def __init__(self, app_config, interval=300, on_snapshot=None, shared_cache=None):
+        # private copy, the UI rebinds access_token on the shared config object
+        self.app_config = copy.copy(app_config)
+        self.app_config.read_local = False
+        self.interval = interval
+        self.fingerprint = token_fingerprint(app_config.access_token)
+        self.on_snapshot = on_snapshot
+        # with a SharedCache, worker processes of a deployment share one fetch per interval
+        self.shared_cache = shared_cache
+
+        self.last_error = None
+        self.refreshing = False
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def _meta_file(self):
+        return f"{self.app_config.output_dir}/{SNAPSHOT_META}"
+
+    def _transform(self, ld_data):
+        # the raw items are hashed before process() prepares them in place
+        digests = source_digests(ld_data)
+        previous = self.current()
+        if previous is None or previous.digests is None:
+            transformer = Transformer(ld_data=ld_data, workers=self.app_config.member_workers)
+            transformer.process(output_dir=self.app_config.output_dir)
+            return ld_data, transformer, digests
+
+        # only what changed since the previous snapshot is prepared, on a copy its readers do not see
+        delta = previous.transformer.source_delta(ld_data, digests, previous.digests,
+                                                  self._changed_policies(previous, ld_data['roles']))
+        if not any(delta.values()):
+            return previous.ld_data, previous.transformer, digests
+        transformer = previous.transformer.copy()
+        transformer.apply_delta(**delta)
+        return transformer.get_sources(), transformer, digests
+
+    def _changed_policies(self, previous, roles):
+        # keys of the roles added or with another policy, unchanged roles are skipped by their policy hash
+        from policy_index import diff_policies, index_roles
+
+        diff = diff_policies(previous.transformer.get_policy_index(), index_roles(roles))
+        return diff["added_roles"] + list(diff["changed_roles"])
+
+    def _policy_changes(self, transformer):
+        # unchanged roles are skipped by their policy hash, so this is cheap on every refresh
+        from policy_index import diff_policies, diff_summary
+
+        previous = self.current()
+        if previous is None:
+            return None
+        return diff_summary(diff_policies(previous.transformer.get_policy_index(), transformer.get_policy_index()))
+
+    def _swap(self, snapshot):
+        with self._lock:
+            self._snapshot = snapshot
+
+    def warm_start(self):
+        # the payload the last refresh saved, only there with SAVE_DATA
+        meta_file = self._meta_file()
+        if not os.path.exists(meta_file):
+            return False
+
+        meta = Utils.read_json_file(meta_file)
+        if meta is None or meta.get('fingerprint') != self.fingerprint:
+            return False
+
+        ld_data = fetch_local(self.app_config)
+        if not is_complete(ld_data) or len(ld_data['members']) == 0:
+            return False
+
+        loaded_at = datetime.datetime.fromtimestamp(meta['loaded_at'])
+        ld_data, transformer, digests = self._transform(ld_data)
+        self._swap(Snapshot(ld_data, transformer, loaded_at, "local", digests=digests))
+        return True
+
+    def _fetch(self):
+        ld_data = fetch_remote(self.app_config)
+        if not is_complete(ld_data) or len(ld_data['members']) == 0:
+            return None
+        return *self._transform(ld_data), datetime.datetime.now()
+
+    def _fetch_shared(self):
+        from shared_cache import cache_key, remote_data_version
+
+        key = cache_key("refresh", self.fingerprint, remote_data_version(self.interval))
+        return self.shared_cache.get_or_compute(key, self._fetch, cacheable=lambda value: value is not None)
+
+    def refresh(self):
+        self.refreshing = True
+        try:
+            fetched = self._fetch() if self.shared_cache is None else self._fetch_shared()
+            if fetched is None:
+                # keep serving the previous snapshot rather than an empty account
+                self.last_error = "unable to fetch members from LaunchDarkly"
+                return False
+
+            ld_data, transformer, digests, loaded_at = fetched
+            snapshot = Snapshot(ld_data, transformer, loaded_at, "remote",
+                                policy_changes=self._policy_changes(transformer), digests=digests)
+            self._swap(snapshot)
+
+            if self.app_config.save_data:
+                Utils.save_data_to_file({'fingerprint': self.fingerprint, 'loaded_at': loaded_at.timestamp()},
+                                        self._meta_file())
+            self.last_error = None
+
+            if self.on_snapshot is not None:
+                self.on_snapshot(snapshot.transformer)
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            return False
+        finally:
+            self.refreshing = False
+
+    def _run(self):
+        # loading the persisted snapshot only reads local files, but the first page load
+        # does not wait on it either
+        if self.current() is None:
+            try:
+                self.warm_start()
+            except Exception as e:
+                self.last_error = str(e)
+
+        snapshot = self.current()
+        if snapshot is None or snapshot.age().total_seconds() >= self.interval:
+            self.refresh()
+
+        while not self._stop.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            self.refresh()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._thread = threading.Thread(target=self._run, name="ld-refresher", daemon=True)
+        self._thread.start()
+
+    def request_refresh(self):
+        self._wakeup.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def current(self):
+        with self._lock:
+            return self._snapshot
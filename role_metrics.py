@@ -0,0 +1,269 @@
+from collections import Counter
+
+
+class RoleAssignmentCounter:
+    # Aggregates behind summary_metrics. Each set_/remove_ call adjusts the
+    # counters by the difference to the previous state, so a delta costs
+    # O(changed assignments) instead of a pass over the whole account.
+
+    def __init__(self):
+        self.member_roles = {}
+        self.team_roles = {}
+        self.role_permissions = {}
+
+        self.member_role_counts = Counter()
+        self.team_role_counts = Counter()
+        self.assigned_role_counts = Counter()
+
+        # role key -> ordered member ids / team keys holding it
+        self.role_members = {}
+        self.role_teams = {}
+
+        self.total_member_role_assignments = 0
+        self.total_team_role_assignments = 0
+        self.total_permissions = 0
+
+        # members merged as pre-aggregated counts (chunked mode), they are not indexed
+        self.aggregated_members = 0
+
+    def _add(self, counter, index, role_keys, holder):
+        for role_key in role_keys:
+            counter[role_key] += 1
+            self.assigned_role_counts[role_key] += 1
+            index.setdefault(role_key, {})[holder] = None
+
+    def _subtract(self, counter, index, role_keys, holder):
+        for role_key in role_keys:
+            counter[role_key] -= 1
+            if counter[role_key] <= 0:
+                del counter[role_key]
+
+            self.assigned_role_counts[role_key] -= 1
+            if self.assigned_role_counts[role_key] <= 0:
+                del self.assigned_role_counts[role_key]
+
+            holders = index.get(role_key)
+            if holders is not None:
+                holders.pop(holder, None)
+                if len(holders) == 0:
+                    del index[role_key]
+
+    def set_member(self, member_id, role_keys):
+        self.remove_member(member_id)
+        role_keys = list(role_keys)
+        self.member_roles[member_id] = role_keys
+        self.total_member_role_assignments += len(role_keys)
+        self._add(self.member_role_counts, self.role_members, dict.fromkeys(role_keys), member_id)
+
+    def remove_member(self, member_id):
+        role_keys = self.member_roles.pop(member_id, None)
+        if role_keys is None:
+            return
+        self.total_member_role_assignments -= len(role_keys)
+        self._subtract(self.member_role_counts, self.role_members, dict.fromkeys(role_keys), member_id)
+
+    def copy(self):
+        # independent counters, e.g. for a Transformer.copy() a delta is applied to
+        other = RoleAssignmentCounter()
+        other.member_roles = dict(self.member_roles)
+        other.team_roles = dict(self.team_roles)
+        other.role_permissions = dict(self.role_permissions)
+        other.member_role_counts = self.member_role_counts.copy()
+        other.team_role_counts = self.team_role_counts.copy()
+        other.assigned_role_counts = self.assigned_role_counts.copy()
+        other.role_members = {role_key: dict(holders) for role_key, holders in self.role_members.items()}
+        other.role_teams = {role_key: dict(holders) for role_key, holders in self.role_teams.items()}
+        other.total_member_role_assignments = self.total_member_role_assignments
+        other.total_team_role_assignments = self.total_team_role_assignments
+        other.total_permissions = self.total_permissions
+        other.aggregated_members = self.aggregated_members
+        return other
+
+    def merge_members(self, other):
+        # Adds the members of another counter, e.g. of a shard prepared in a worker. Merged in
+        # shard order, the counts and holder order are those of set_member calls in that order.
+        if not self.member_roles.keys().isdisjoint(other.member_roles):
+            # a member id in two shards replaces the earlier entry like set_member does
+            for member_id, role_keys in other.member_roles.items():
+                self.set_member(member_id, role_keys)
+            return
+        self.member_roles.update(other.member_roles)
+        self.total_member_role_assignments += other.total_member_role_assignments
+        self.member_role_counts.update(other.member_role_counts)
+        self.assigned_role_counts.update(other.member_role_counts)
+        for role_key, holders in other.role_members.items():
+            self.role_members.setdefault(role_key, {}).update(holders)
+
+    def add_member_counts(self, role_counts, assignment_count, member_count):
+        for role_key, count in role_counts.items():
+            self.member_role_counts[role_key] += count
+            self.assigned_role_counts[role_key] += count
+        self.total_member_role_assignments += assignment_count
+        self.aggregated_members += member_count
+
+    def set_team(self, team_key, role_keys):
+        self.remove_team(team_key)
+        role_keys = list(role_keys)
+        self.team_roles[team_key] = role_keys
+        self.total_team_role_assignments += len(role_keys)
+        self._add(self.team_role_counts, self.role_teams, dict.fromkeys(role_keys), team_key)
+
+    def remove_team(self, team_key):
+        role_keys = self.team_roles.pop(team_key, None)
+        if role_keys is None:
+            return
+        self.total_team_role_assignments -= len(role_keys)
+        self._subtract(self.team_role_counts, self.role_teams, dict.fromkeys(role_keys), team_key)
+
+    def set_role(self, role_key, permission_count):
+        self.remove_role(role_key)
+        self.role_permissions[role_key] = permission_count
+        self.total_permissions += permission_count
+
+    def remove_role(self, role_key):
+        permission_count = self.role_permissions.pop(role_key, None)
+        if permission_count is not None:
+            self.total_permissions -= permission_count
+
+    def members_with_role(self, role_key):
+        return list(self.role_members.get(role_key, {}).keys())
+
+    def teams_with_role(self, role_key):
+        return list(self.role_teams.get(role_key, {}).keys())
+
+    def role_counts(self, role_key):
+        return self.member_role_counts.get(role_key, 0), self.team_role_counts.get(role_key, 0)
+
+    def summary_metrics(self):
+        return _summary_metrics(
+            total_users=len(self.member_roles) + self.aggregated_members,
+            total_teams=len(self.team_roles),
+            total_custom_role=len(self.role_permissions),
+            total_permissions=self.total_permissions,
+            member_assignments=self.total_member_role_assignments,
+            team_assignments=self.total_team_role_assignments,
+            assigned_roles=len(self.assigned_role_counts),
+            member_assigned_roles=len(self.member_role_counts),
+            team_assigned_roles=len(self.team_role_counts),
+        )
+
+    @classmethod
+    def from_tables(cls, members_df, teams_df, roles_df):
+        # rebuilds the counters from transformed tables, e.g. of an AccountResult
+        counter = cls()
+        for member_id, role_keys in zip(members_df['_id'], members_df['customRoles']):
+            counter.set_member(member_id, role_keys)
+        for team_key, role_keys in zip(teams_df['key'], teams_df['customRoleKeys']):
+            counter.set_team(team_key, role_keys)
+        for role_key, permission_count in zip(roles_df['key'], roles_df['permission_count']):
+            counter.set_role(role_key, int(permission_count))
+        return counter
+
+
+def _summary_metrics(total_users, total_teams, total_custom_role, total_permissions, member_assignments,
+                     team_assignments, assigned_roles, member_assigned_roles, team_assigned_roles):
+    return {
+        'role_to_user_ratio': member_assignments / total_users if total_users else 0,
+        'role_to_team_ratio': team_assignments / total_teams if total_teams else 0,
+        'total_custom_role': total_custom_role,
+
+        'orphaned_roles': total_custom_role - assigned_roles,
+
+        'permission_to_role_ratio': total_permissions / total_custom_role if total_custom_role else 0,
+
+        'total_assigned_roles': assigned_roles,
+        'distict_user_assigned_custom_roles': member_assigned_roles,
+        'distict_team_assigned_custom_roles': team_assigned_roles,
+    }
+
+
+class RoleAssignmentOverlay:
+    # Hypothetical set_/remove_ calls on top of a RoleAssignmentCounter, which is not
+    # modified. Only changed members, teams and roles and the count differences are
+    # kept, so summary_metrics() costs O(changed roles) whatever the account size.
+
+    def __init__(self, base):
+        self.base = base
+        # changed entries, None once removed
+        self.member_roles = {}
+        self.team_roles = {}
+        self.role_permissions = {}
+
+        self.member_role_deltas = Counter()
+        self.team_role_deltas = Counter()
+        self.member_assignments_delta = 0
+        self.team_assignments_delta = 0
+
+    @staticmethod
+    def _current(changed, base, key):
+        return changed[key] if key in changed else base.get(key)
+
+    def _shift(self, deltas, previous, role_keys):
+        deltas.subtract(dict.fromkeys(previous or [], 1))
+        deltas.update(dict.fromkeys(role_keys or [], 1))
+        return len(role_keys or []) - len(previous or [])
+
+    def member_role_keys(self, member_id):
+        return self._current(self.member_roles, self.base.member_roles, member_id)
+
+    def team_role_keys(self, team_key):
+        return self._current(self.team_roles, self.base.team_roles, team_key)
+
+    def set_member(self, member_id, role_keys):
+        role_keys = list(role_keys)
+        self.member_assignments_delta += self._shift(self.member_role_deltas, self.member_role_keys(member_id), role_keys)
+        self.member_roles[member_id] = role_keys
+
+    def remove_member(self, member_id):
+        self.member_assignments_delta += self._shift(self.member_role_deltas, self.member_role_keys(member_id), None)
+        self.member_roles[member_id] = None
+
+    def set_team(self, team_key, role_keys):
+        role_keys = list(role_keys)
+        self.team_assignments_delta += self._shift(self.team_role_deltas, self.team_role_keys(team_key), role_keys)
+        self.team_roles[team_key] = role_keys
+
+    def remove_team(self, team_key):
+        self.team_assignments_delta += self._shift(self.team_role_deltas, self.team_role_keys(team_key), None)
+        self.team_roles[team_key] = None
+
+    def set_role(self, role_key, permission_count):
+        self.role_permissions[role_key] = permission_count
+
+    def remove_role(self, role_key):
+        self.role_permissions[role_key] = None
+
+    def role_counts(self, role_key):
+        member_count, team_count = self.base.role_counts(role_key)
+        return member_count + self.member_role_deltas[role_key], team_count + self.team_role_deltas[role_key]
+
+    def _entry_delta(self, changed, base):
+        # difference in the number of existing entries
+        return sum((value is not None) - (key in base) for key, value in changed.items())
+
+    def summary_metrics(self):
+        base = self.base
+
+        total_permissions = base.total_permissions + sum(
+            (count or 0) - base.role_permissions.get(key, 0) for key, count in self.role_permissions.items())
+
+        member_assigned = len(base.member_role_counts)
+        team_assigned = len(base.team_role_counts)
+        assigned = len(base.assigned_role_counts)
+        for role_key in set(self.member_role_deltas) | set(self.team_role_deltas):
+            member_count, team_count = self.role_counts(role_key)
+            member_assigned += (member_count > 0) - (role_key in base.member_role_counts)
+            team_assigned += (team_count > 0) - (role_key in base.team_role_counts)
+            assigned += (member_count + team_count > 0) - (role_key in base.assigned_role_counts)
+
+        return _summary_metrics(
+            total_users=len(base.member_roles) + base.aggregated_members + self._entry_delta(self.member_roles, base.member_roles),
+            total_teams=len(base.team_roles) + self._entry_delta(self.team_roles, base.team_roles),
+            total_custom_role=len(base.role_permissions) + self._entry_delta(self.role_permissions, base.role_permissions),
+            total_permissions=total_permissions,
+            member_assignments=base.total_member_role_assignments + self.member_assignments_delta,
+            team_assignments=base.total_team_role_assignments + self.team_assignments_delta,
+            assigned_roles=assigned,
+            member_assigned_roles=member_assigned,
+            team_assigned_roles=team_assigned,
+        )
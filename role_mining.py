@@ -0,0 +1,213 @@
+from collections import Counter
+
+
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_MIN_MEMBERS = 5
+
+IDENTICAL = "identical policies"
+REDUNDANT = "redundant"
+CO_ASSIGNED = "co-assigned"
+
+
+def _bitset(indexes, size):
+    # Python ints as bitsets; built from a bytearray instead of or-ing single bits into a big int
+    buffer = bytearray((size + 7) // 8)
+    for index in indexes:
+        buffer[index >> 3] |= 1 << (index & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def _bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class RoleBitsets:
+    # Each member's effective role set as a bitset over role indexes, and per role the
+    # members holding it (bitset over member indexes) and its policy statements (bitset
+    # over statement hashes of the PolicyIndex). Overlaps between roles then cost an
+    # and/or and a bit_count on machine words instead of set operations on keys.
+
+    def __init__(self, member_access, policy_index, role_keys):
+        self.role_keys = list(role_keys)
+        self.role_index = {key: index for index, key in enumerate(self.role_keys)}
+
+        statement_index = {digest: index for index, digest in enumerate(sorted(policy_index.statements))}
+        self.statement_masks = [_bitset((statement_index[digest] for digest in policy_index.role_statements.get(key, ())
+                                         if digest in statement_index), len(statement_index))
+                                for key in self.role_keys]
+
+        # distinct member role sets and how many members have each
+        self.role_set_counts = Counter()
+        holders = [[] for _ in self.role_keys]
+        self.member_count = 0
+        for member_index, access in enumerate(member_access.values()):
+            mask = 0
+            for role_key in access:
+                role = self.role_index.get(role_key)
+                if role is not None:
+                    mask |= 1 << role
+                    holders[role].append(member_index)
+            self.role_set_counts[mask] += 1
+            self.member_count += 1
+
+        self.member_masks = [_bitset(indexes, self.member_count) for indexes in holders]
+        self.member_counts = [len(indexes) for indexes in holders]
+
+    def roles(self, mask):
+        return [self.role_keys[index] for index in _bits(mask)]
+
+    def statement_count(self, role):
+        return self.statement_masks[role].bit_count()
+
+
+def identical_policies(bitsets):
+    # roles with the same non-empty statement set, merging them changes nobody's access
+    groups = {}
+    for role, mask in enumerate(bitsets.statement_masks):
+        if mask:
+            groups.setdefault(mask, []).append(role)
+    return [roles for roles in groups.values() if len(roles) > 1]
+
+
+def redundant_roles(bitsets):
+    # (role, covering role) pairs: every holder of role also holds the covering role, and
+    # the covering role's statements include all of role's, so role can go without access changes.
+    # Candidates share role's first statement, found through a statement -> roles index.
+    by_statement = {}
+    for role, mask in enumerate(bitsets.statement_masks):
+        for statement in _bits(mask):
+            by_statement.setdefault(statement, []).append(role)
+
+    pairs = []
+    for role, mask in enumerate(bitsets.statement_masks):
+        if not mask or bitsets.member_counts[role] == 0:
+            continue
+        first = (mask & -mask).bit_length() - 1
+        for other in by_statement[first]:
+            if other == role or bitsets.statement_masks[other] == mask:
+                # identical policies are proposed as a merge instead
+                continue
+            if mask & ~bitsets.statement_masks[other] == 0 \
+                    and bitsets.member_masks[role] & ~bitsets.member_masks[other] == 0:
+                pairs.append((role, other))
+                break
+    return pairs
+
+
+def _candidate_pairs(bitsets, threshold, min_members):
+    # Jaccard similarity of two member sets is at most min/max of their sizes, so after
+    # sorting by size each role is only compared with roles at most 1/threshold larger
+    roles = sorted((role for role, count in enumerate(bitsets.member_counts) if count >= min_members),
+                   key=lambda role: bitsets.member_counts[role])
+    for position, role in enumerate(roles):
+        size = bitsets.member_counts[role]
+        mask = bitsets.member_masks[role]
+        for other_position in range(position + 1, len(roles)):
+            other = roles[other_position]
+            other_size = bitsets.member_counts[other]
+            if size < threshold * other_size:
+                break
+            shared = (mask & bitsets.member_masks[other]).bit_count()
+            similarity = shared / (size + other_size - shared)
+            if similarity >= threshold:
+                yield similarity, role, other
+
+
+def co_assigned_groups(bitsets, threshold=DEFAULT_THRESHOLD, min_members=DEFAULT_MIN_MEMBERS):
+    # Groups of roles held by nearly the same members: pairs are merged most similar first,
+    # as long as members holding all roles of the group stay >= threshold of those holding any.
+    masks = bitsets.member_masks
+    # group id (its first role) -> roles and the members holding all / any of them
+    groups = {}
+    group_of = {}
+    for _, role, other in sorted(_candidate_pairs(bitsets, threshold, min_members), reverse=True):
+        for item in (role, other):
+            if item not in group_of:
+                group_of[item] = item
+                groups[item] = {"roles": [item], "all": masks[item], "any": masks[item]}
+
+        first, second = group_of[role], group_of[other]
+        if first == second:
+            continue
+
+        holders_all = groups[first]["all"] & groups[second]["all"]
+        holders_any = groups[first]["any"] | groups[second]["any"]
+        if holders_all.bit_count() < threshold * holders_any.bit_count():
+            continue
+
+        groups[first] = {"roles": groups[first]["roles"] + groups[second]["roles"],
+                         "all": holders_all, "any": holders_any}
+        for item in groups.pop(second)["roles"]:
+            group_of[item] = first
+
+    return [group["roles"] for group in groups.values() if len(group["roles"]) > 1]
+
+
+def frequent_role_sets(bitsets, min_roles=2, limit=20):
+    # the most common effective role combinations of members
+    rows = []
+    for mask, count in bitsets.role_set_counts.most_common():
+        if mask.bit_count() >= min_roles:
+            rows.append({"roles": ", ".join(bitsets.roles(mask)), "role_count": mask.bit_count(), "members": count})
+            if len(rows) == limit:
+                break
+    return rows
+
+
+def _proposal(bitsets, kind, roles):
+    holders_all = holders_any = bitsets.member_masks[roles[0]]
+    statements = 0
+    for role in roles:
+        holders_all &= bitsets.member_masks[role]
+        holders_any |= bitsets.member_masks[role]
+        statements |= bitsets.statement_masks[role]
+
+    members = holders_any.bit_count()
+    return {
+        "kind": kind,
+        "roles": [bitsets.role_keys[role] for role in roles],
+        "roles_saved": len(roles) - 1,
+        "members": members,
+        # members holding only part of the group would get the rest with the merged role
+        "members_gaining_access": 0 if kind != CO_ASSIGNED else members - holders_all.bit_count(),
+        "statements": sum(bitsets.statement_count(role) for role in roles),
+        "merged_statements": statements.bit_count(),
+    }
+
+
+def propose_merges(bitsets, threshold=DEFAULT_THRESHOLD, min_members=DEFAULT_MIN_MEMBERS):
+    # Disjoint proposals, access preserving ones first: identical policies, then roles
+    # covered by another role, then co-assigned groups. A role is used by one proposal at most.
+    used = set()
+    proposals = []
+
+    def take(kind, roles):
+        if any(role in used for role in roles):
+            return
+        used.update(roles)
+        proposals.append(_proposal(bitsets, kind, roles))
+
+    for roles in identical_policies(bitsets):
+        take(IDENTICAL, roles)
+    for role, other in redundant_roles(bitsets):
+        # the covering role stays, it may cover more than one redundant role
+        if role not in used:
+            used.add(role)
+            proposals.append(_proposal(bitsets, REDUNDANT, [role, other]))
+    for roles in co_assigned_groups(bitsets, threshold, min_members):
+        take(CO_ASSIGNED, roles)
+
+    return proposals
+
+
+def mining_summary(bitsets, proposals):
+    saved = sum(proposal["roles_saved"] for proposal in proposals)
+    return {
+        "roles": len(bitsets.role_keys),
+        "proposed_roles": len(bitsets.role_keys) - saved,
+        "roles_saved": saved,
+        "members_gaining_access": sum(proposal["members_gaining_access"] for proposal in proposals),
+    }
@@ -0,0 +1,54 @@
+import time
+
+import streamlit as st
+import pandas as pd
+
+from role_mining import DEFAULT_THRESHOLD, DEFAULT_MIN_MEMBERS, frequent_role_sets, mining_summary, propose_merges
+
+
+PROPOSAL_COLUMNS = ["kind", "roles", "roles_saved", "members", "members_gaining_access",
+                    "statements", "merged_statements"]
+
+
+class RoleMiningTab:
+    def __init__(self, transformer):
+        self.transformer = transformer
+        # (threshold, min_members) -> proposals, the bitsets stay the same for the transformer
+        self._proposals = {}
+
+    def _get_proposals(self, bitsets, threshold, min_members):
+        key = (threshold, min_members)
+        if key not in self._proposals:
+            self._proposals[key] = propose_merges(bitsets, threshold, min_members)
+        return self._proposals[key]
+
+    def render(self):
+        col1, col2 = st.columns(2)
+        threshold = col1.slider("Similarity threshold", 0.1, 1.0, DEFAULT_THRESHOLD, 0.05, key="role_mining_threshold",
+                                help="Share of the members holding any role of a group that must hold all of them")
+        min_members = col2.number_input("Minimum members per role", 1, value=DEFAULT_MIN_MEMBERS,
+                                        key="role_mining_min_members")
+
+        start = time.perf_counter()
+        bitsets = self.transformer.get_role_bitsets()
+        proposals = self._get_proposals(bitsets, threshold, int(min_members))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        summary = mining_summary(bitsets, proposals)
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Custom Roles", summary['roles'])
+        col2.metric("Proposed Roles", summary['proposed_roles'])
+        col3.metric("Roles Saved", summary['roles_saved'])
+        col4.metric("Members Gaining Access", summary['members_gaining_access'])
+        st.caption(f"Computed in {elapsed_ms:.1f} ms. Nothing is changed in LaunchDarkly.")
+
+        st.markdown("##### Proposed Merges")
+        if len(proposals) == 0:
+            st.info("No merges found, try a lower similarity threshold.")
+        else:
+            rows = [dict(proposal, roles=", ".join(proposal['roles'])) for proposal in proposals]
+            st.dataframe(pd.DataFrame(rows, columns=PROPOSAL_COLUMNS), hide_index=True, use_container_width=True)
+
+        st.markdown("##### Most Common Role Combinations")
+        st.dataframe(pd.DataFrame(frequent_role_sets(bitsets), columns=["roles", "role_count", "members"]),
+                     hide_index=True, use_container_width=True)
@@ -3,35 +3,39 @@ import pandas as pd
 import plotly.express as px
 import json
 
+from custom_utils import memoize
+
 
 class RolesTab:
-    def __init__(self, roles, metrics, members, teams):
+    def __init__(self, roles, metrics, members, teams, statements):
         self.roles = roles
+        # statements by hash, the policy column holds the hashes
+        self.statements = statements
         self.metrics = metrics
         self.members = members
         self.teams = teams
 
-    def _roles_assigned_categories(self):
-
-        metrics_df = pd.DataFrame.from_dict(self.metrics, orient='index', columns=[
-            'count'])
-
-        # Make the labels a column
-        metrics_df['metric'] = metrics_df.index
-
-        filter_metrics = ['distict_user_assigned_custom_roles',
-                          'distict_team_assigned_custom_roles', 'orphaned_roles']
+    @memoize
+    def _assigned_categories_df(self):
         label_mapping = {
             'distict_user_assigned_custom_roles': 'User-Assigned Roles',
             'distict_team_assigned_custom_roles': 'Team-Assigned Roles',
             'orphaned_roles': 'Orphaned Roles'
         }
 
-        metrics_df_filtered = metrics_df.loc[metrics_df["metric"].isin(
-            filter_metrics)].copy()
+        metrics_df_filtered = pd.DataFrame({
+            'metric': list(label_mapping.keys()),
+            'count': [self.metrics.get(metric) for metric in label_mapping.keys()],
+        })
+        metrics_df_filtered.index = metrics_df_filtered['metric']
 
         metrics_df_filtered.loc[:, 'label'] = metrics_df_filtered['metric'].map(
             label_mapping)
+
+        return metrics_df_filtered, label_mapping
+
+    def _roles_assigned_categories(self):
+        metrics_df_filtered, label_mapping = self._assigned_categories_df()
         # print(metrics_df_filtered)
         fig = px.pie(metrics_df_filtered, values='count', names='label',
                      title='Custom Roles: Assigned v Orphaned',
@@ -41,7 +45,8 @@ class RolesTab:
 
         st.plotly_chart(fig, theme="streamlit")
 
-    def _most_assigned_roles_chart(self):
+    @memoize
+    def _top_assigned_roles_df(self):
         metrics_df = pd.DataFrame(self.roles,
                                   columns=['permission_count', 'members_count', 'teams_count'], )
 
@@ -53,6 +58,11 @@ class RolesTab:
         top_5_df.sort_index(ascending=False, inplace=True)
         del top_5_df['total']
 
+        return top_5_df
+
+    def _most_assigned_roles_chart(self):
+        top_5_df = self._top_assigned_roles_df()
+
         fig = px.imshow(top_5_df, text_auto=False,
                         title='Top 5 Assigned Custom Roles',
                         y=top_5_df.index,
@@ -135,6 +145,21 @@ class RolesTab:
                       delta_color="normal",
                       )
 
+    @memoize
+    def _roles_table_df(self):
+        roles_table_df = self.roles[[
+            'key', 'members_count', 'teams_count', 'policy']].copy()
+
+        roles_table_df['orphan'] = (roles_table_df['members_count'] == 0) & (
+            roles_table_df['teams_count'] == 0)
+
+        roles_table_df["permission_count"] = self.roles["policy"].apply(
+            lambda x: len(x))
+        roles_table_df["policy"] = roles_table_df["policy"].apply(
+            lambda x: json.dumps([self.statements[digest] for digest in x], indent=2))
+
+        return roles_table_df
+
     def render_roles_table(self):
         column_config = {
             'key': st.column_config.Column(
@@ -164,16 +189,7 @@ class RolesTab:
             )
         }
 
-        roles_table_df = self.roles[[
-            'key', 'members_count', 'teams_count', 'policy']].copy()
-
-        roles_table_df['orphan'] = (roles_table_df['members_count'] == 0) & (
-            roles_table_df['teams_count'] == 0)
-
-        roles_table_df["permission_count"] = self.roles["policy"].apply(
-            lambda x: len(x))
-        roles_table_df["policy"] = roles_table_df["policy"].apply(
-            lambda x: json.dumps(x, indent=2))
+        roles_table_df = self._roles_table_df()
 
         st.markdown('##### Custom Roles')
         st.dataframe(roles_table_df.style.background_gradient(
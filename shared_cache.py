@@ -0,0 +1,174 @@
+import contextlib
+import hashlib
+import hmac
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # no flock on Windows, concurrent computes are then only serialized within a process
+    fcntl = None
+
+
+CACHE_SUFFIX = ".pkl"
+LOCK_SUFFIX = ".lock"
+# lock files of entries nobody asked for in this long are removed during eviction
+STALE_LOCK_SECONDS = 24 * 60 * 60
+# an entry starts with the HMAC-SHA256 of its key and pickle
+DIGEST_SIZE = hashlib.sha256().digest_size
+
+_MISSING = object()
+
+
+def cache_key(*parts):
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()[:32]
+
+
+def local_data_version(output_dir, names=("teams", "roles", "members")):
+    # saved raw data changes whenever one of the files is rewritten
+    version = []
+    for name in names:
+        filename = f"{output_dir}/{name}.json"
+        if os.path.exists(filename):
+            stat = os.stat(filename)
+            version.append((name, stat.st_mtime_ns, stat.st_size))
+    return version
+
+
+def remote_data_version(ttl):
+    # the API has no cheap version check, entries expire with the time bucket
+    return int(time.time() // ttl)
+
+
+class SharedCache:
+    # Pickled values in a directory shared by every session and worker process of a
+    # deployment. A per-key file lock makes sure only one process computes a missing
+    # entry while the others wait for it. Least recently used entries are evicted
+    # once the directory grows over max_mb. Unpickling runs code, so entries are signed
+    # with the deployment's secret and only verified ones are loaded.
+
+    def __init__(self, cache_dir, secret, max_mb=2048):
+        if not secret:
+            raise ValueError("the shared cache needs a secret to sign its entries")
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self._secret = secret.encode() if isinstance(secret, str) else secret
+        self.max_bytes = max_mb * 1024 * 1024
+        self._thread_lock = threading.Lock()
+
+    def _path(self, key, suffix=CACHE_SUFFIX):
+        return f"{self.cache_dir}/{key}{suffix}"
+
+    def _digest(self, key, payload):
+        # the key is signed too, an entry can not be passed off as another account's
+        digest = hmac.new(self._secret, key.encode() + b"\0", hashlib.sha256)
+        digest.update(payload)
+        return digest.digest()
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            payload = memoryview(data)[DIGEST_SIZE:]
+            if not hmac.compare_digest(data[:DIGEST_SIZE], self._digest(key, payload)):
+                print(f"Error reading cache entry {path}: invalid signature")
+                return default
+            value = pickle.loads(payload)
+        except FileNotFoundError:
+            return default
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError) as e:
+            print(f"Error reading cache entry {path}: {e}")
+            return default
+
+        # the modification time doubles as last access time for eviction
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        return value
+
+    def put(self, key, value):
+        # written to a temporary file first, readers never see a partial entry
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self._digest(key, payload))
+                f.write(payload)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+
+        self.evict(keep=key)
+
+    @contextlib.contextmanager
+    def _lock(self, key):
+        if fcntl is None:
+            with self._thread_lock:
+                yield
+            return
+
+        with open(self._path(key, LOCK_SUFFIX), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def get_or_compute(self, key, compute, cacheable=None):
+        # cacheable(value) can reject results that should not be shared, e.g. a failed fetch
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock(key):
+            # another process may have finished it while this one waited for the lock
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+            value = compute()
+            if cacheable is None or cacheable(value):
+                self.put(key, value)
+            return value
+
+    def _entries(self, suffix=CACHE_SUFFIX):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(suffix):
+                continue
+            path = f"{self.cache_dir}/{name}"
+            with contextlib.suppress(OSError):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def evict(self, keep=None):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        keep_path = self._path(keep) if keep is not None else None
+
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep_path:
+                continue
+            with contextlib.suppress(OSError):
+                os.remove(path)
+                total -= size
+
+        stale = time.time() - STALE_LOCK_SECONDS
+        for mtime, _, path in self._entries(LOCK_SUFFIX):
+            if mtime < stale:
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+
+    def stats(self):
+        entries = self._entries()
+        return {"entries": len(entries), "bytes": sum(size for _, size, _ in entries)}
@@ -0,0 +1,311 @@
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+
+import pandas as pd
+
+
+INACTIVE_DAYS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    account TEXT NOT NULL,
+    snapshot_date TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    PRIMARY KEY (account, snapshot_date)
+);
+
+CREATE TABLE IF NOT EXISTS metrics (
+    account TEXT NOT NULL,
+    snapshot_date TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (account, metric, snapshot_date)
+);
+
+CREATE TABLE IF NOT EXISTS roles (
+    account TEXT NOT NULL,
+    snapshot_date TEXT NOT NULL,
+    role_key TEXT NOT NULL,
+    permission_count INTEGER,
+    members_count INTEGER,
+    teams_count INTEGER,
+    PRIMARY KEY (account, role_key, snapshot_date)
+);
+
+CREATE TABLE IF NOT EXISTS teams (
+    account TEXT NOT NULL,
+    snapshot_date TEXT NOT NULL,
+    team_key TEXT NOT NULL,
+    custom_role_count INTEGER,
+    PRIMARY KEY (account, team_key, snapshot_date)
+);
+
+-- assignments are stored as [first_seen, last_seen] intervals so unchanged
+-- rows are extended instead of copied every day
+CREATE TABLE IF NOT EXISTS assignments (
+    account TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    target TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL
+);
+
+-- policy statements by content hash, shared by all roles, dates and accounts;
+-- which role has which statement is tracked as 'role_statement' assignments
+CREATE TABLE IF NOT EXISTS statements (
+    statement_hash TEXT PRIMARY KEY,
+    statement TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_snapshots_date ON snapshots (account, snapshot_date);
+CREATE INDEX IF NOT EXISTS idx_metrics_date ON metrics (account, snapshot_date);
+CREATE INDEX IF NOT EXISTS idx_roles_date ON roles (account, snapshot_date);
+CREATE INDEX IF NOT EXISTS idx_teams_date ON teams (account, snapshot_date);
+CREATE INDEX IF NOT EXISTS idx_assignments_open ON assignments (account, kind, last_seen, subject, target);
+CREATE INDEX IF NOT EXISTS idx_assignments_range ON assignments (account, kind, first_seen, last_seen);
+"""
+
+
+def history_db_path(output_dir):
+    return f"{output_dir}/history.sqlite"
+
+
+def _to_float(value):
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return None
+
+
+def history_metrics(transformer):
+    metrics = {}
+    for name, value in transformer.get_summary_metrics().items():
+        value = _to_float(value)
+        if value is not None:
+            metrics[name] = value
+
+    members = transformer.get_members_df()
+    teams = transformer.get_teams_df()
+
+    teams_with_roles = set(teams.loc[teams['customRoleKeys_count'] > 0, 'key'])
+    inherits_roles = members['team_list'].map(
+        lambda team_list: any(team in teams_with_roles for team in team_list))
+    has_roles = (members['customRoles_count'] > 0) | inherits_roles
+    inactive = members['days_since_last_seen'] > INACTIVE_DAYS
+
+    metrics['total_members'] = float(len(members))
+    metrics['total_teams'] = float(len(teams))
+    metrics['inactive_members'] = float(inactive.sum())
+    metrics['inactive_members_with_roles'] = float((inactive & has_roles).sum())
+
+    return metrics
+
+
+def _assignment_rows(transformer, policy_index=None):
+    members = transformer.get_members_df()
+    teams = transformer.get_teams_df()
+
+    rows = set()
+    for member_id, custom_roles, team_list in zip(members['_id'], members['customRoles'], members['team_list']):
+        rows.update(('member_role', member_id, role) for role in custom_roles)
+        rows.update(('member_team', member_id, team) for team in team_list)
+
+    for team_key, role_keys in zip(teams['key'], teams['customRoleKeys']):
+        rows.update(('team_role', team_key, role) for role in role_keys)
+
+    if policy_index is not None:
+        rows.update(('role_statement', role_key, digest) for role_key, digest in policy_index.statement_rows())
+
+    return sorted(rows)
+
+
+class SnapshotStore:
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _latest_date_before(self, account, snapshot_date):
+        row = self.conn.execute(
+            "SELECT MAX(snapshot_date) FROM snapshots WHERE account = ? AND snapshot_date < ?",
+            (account, snapshot_date)).fetchone()
+        return row[0]
+
+    def _latest_date(self, account):
+        row = self.conn.execute(
+            "SELECT MAX(snapshot_date) FROM snapshots WHERE account = ?", (account,)).fetchone()
+        return row[0]
+
+    def _save_assignments(self, account, snapshot_date, previous_date, rows):
+        conn = self.conn
+        # re-running on the same day replaces that day's view of the assignments
+        conn.execute("DELETE FROM assignments WHERE account = ? AND first_seen = ?",
+                     (account, snapshot_date))
+        if previous_date is not None:
+            conn.execute("UPDATE assignments SET last_seen = ? WHERE account = ? AND last_seen = ?",
+                         (previous_date, account, snapshot_date))
+
+        conn.execute("DROP TABLE IF EXISTS temp.current_assignments")
+        conn.execute(
+            "CREATE TEMP TABLE current_assignments (kind TEXT, subject TEXT, target TEXT, PRIMARY KEY (kind, subject, target))")
+        conn.executemany("INSERT INTO current_assignments VALUES (?, ?, ?)", rows)
+
+        if previous_date is not None:
+            conn.execute("""
+                UPDATE assignments SET last_seen = :today
+                WHERE account = :account AND last_seen = :previous
+                  AND EXISTS (SELECT 1 FROM current_assignments c
+                              WHERE c.kind = assignments.kind AND c.subject = assignments.subject
+                                AND c.target = assignments.target)
+            """, {"today": snapshot_date, "account": account, "previous": previous_date})
+
+        conn.execute("""
+            INSERT INTO assignments (account, kind, subject, target, first_seen, last_seen)
+            SELECT :account, c.kind, c.subject, c.target, :today, :today
+            FROM current_assignments c
+            WHERE NOT EXISTS (SELECT 1 FROM assignments a
+                              WHERE a.account = :account AND a.kind = c.kind AND a.last_seen = :today
+                                AND a.subject = c.subject AND a.target = c.target)
+        """, {"today": snapshot_date, "account": account})
+
+        conn.execute("DROP TABLE temp.current_assignments")
+
+    def save_snapshot(self, transformer, account='default', snapshot_date=None):
+        snapshot_date = snapshot_date or datetime.date.today().isoformat()
+
+        latest_date = self._latest_date(account)
+        if latest_date is not None and snapshot_date < latest_date:
+            print(f"Error: snapshot for {account} on {snapshot_date} is older than {latest_date}, skipping")
+            return False
+
+        policy_index = transformer.get_policy_index()
+        rows = _assignment_rows(transformer, policy_index)
+        roles = transformer.get_roles_df()
+        teams = transformer.get_teams_df()
+        metrics = history_metrics(transformer)
+
+        role_rows = [(account, snapshot_date, key, int(permissions), int(members), int(team_count))
+                     for key, permissions, members, team_count in zip(
+                         roles['key'], roles['permission_count'], roles['members_count'], roles['teams_count'])]
+        team_rows = [(account, snapshot_date, key, int(count))
+                     for key, count in zip(teams['key'], teams['customRoleKeys_count'])]
+        for kind in ('member_role', 'member_team', 'team_role'):
+            metrics[f'{kind}_assignments'] = float(sum(1 for row in rows if row[0] == kind))
+        metric_rows = [(account, snapshot_date, name, value) for name, value in metrics.items()]
+
+        content_hash = hashlib.sha256(json.dumps(
+            [rows, role_rows, team_rows, metric_rows], default=str).encode()).hexdigest()
+
+        existing = self.conn.execute(
+            "SELECT content_hash FROM snapshots WHERE account = ? AND snapshot_date = ?",
+            (account, snapshot_date)).fetchone()
+        if existing is not None and existing[0] == content_hash:
+            return True
+
+        previous_date = self._latest_date_before(account, snapshot_date)
+        with self.conn:
+            for table in ('snapshots', 'metrics', 'roles', 'teams'):
+                self.conn.execute(f"DELETE FROM {table} WHERE account = ? AND snapshot_date = ?",
+                                  (account, snapshot_date))
+
+            self.conn.execute("INSERT INTO snapshots VALUES (?, ?, ?, ?)",
+                              (account, snapshot_date, int(datetime.datetime.now().timestamp()), content_hash))
+            self.conn.executemany("INSERT INTO metrics VALUES (?, ?, ?, ?)", metric_rows)
+            self.conn.executemany("INSERT INTO roles VALUES (?, ?, ?, ?, ?, ?)", role_rows)
+            self.conn.executemany("INSERT INTO teams VALUES (?, ?, ?, ?)", team_rows)
+            if policy_index is not None:
+                self.conn.executemany("INSERT OR IGNORE INTO statements VALUES (?, ?)",
+                                      [(digest, json.dumps(statement, sort_keys=True))
+                                       for digest, statement in policy_index.statements.items()])
+            self._save_assignments(account, snapshot_date, previous_date, rows)
+
+        return True
+
+    def accounts(self):
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT account FROM snapshots ORDER BY account")]
+
+    def metric_names(self, account='default'):
+        return [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT metric FROM metrics WHERE account = ? ORDER BY metric", (account,))]
+
+    def date_range(self, account='default'):
+        return self.conn.execute(
+            "SELECT MIN(snapshot_date), MAX(snapshot_date) FROM snapshots WHERE account = ?", (account,)).fetchone()
+
+    def metric_trends(self, account='default', start=None, end=None, metrics=None):
+        query = "SELECT snapshot_date, metric, value FROM metrics WHERE account = ? AND snapshot_date BETWEEN ? AND ?"
+        params = [account, start or '0000-00-00', end or '9999-99-99']
+        if metrics:
+            query += f" AND metric IN ({','.join('?' * len(metrics))})"
+            params += list(metrics)
+
+        df = pd.read_sql_query(query, self.conn, params=params)
+        if df.empty:
+            return df
+        return df.pivot(index='snapshot_date', columns='metric', values='value')
+
+    def role_trends(self, account='default', role_key=None, start=None, end=None):
+        query = """SELECT snapshot_date, role_key, permission_count, members_count, teams_count
+                   FROM roles WHERE account = ? AND snapshot_date BETWEEN ? AND ?"""
+        params = [account, start or '0000-00-00', end or '9999-99-99']
+        if role_key is not None:
+            query += " AND role_key = ?"
+            params.append(role_key)
+
+        return pd.read_sql_query(query, self.conn, params=params)
+
+    def assignments_on(self, account='default', snapshot_date=None, kind='member_role'):
+        return pd.read_sql_query(
+            """SELECT subject, target FROM assignments
+               WHERE account = ? AND kind = ? AND first_seen <= ? AND last_seen >= ?""",
+            self.conn, params=[account, kind, snapshot_date, snapshot_date])
+
+    def _snapshot_date_on(self, account, snapshot_date):
+        # the latest snapshot taken on or before snapshot_date
+        row = self.conn.execute(
+            "SELECT MAX(snapshot_date) FROM snapshots WHERE account = ? AND snapshot_date <= ?",
+            (account, snapshot_date or '9999-99-99')).fetchone()
+        return row[0]
+
+    def policy_index_on(self, account='default', snapshot_date=None):
+        from policy_index import PolicyIndex
+
+        snapshot_date = self._snapshot_date_on(account, snapshot_date)
+        rows = self.conn.execute(
+            """SELECT a.subject, a.target, s.statement FROM assignments a
+               JOIN statements s ON s.statement_hash = a.target
+               WHERE a.account = ? AND a.kind = 'role_statement' AND a.first_seen <= ? AND a.last_seen >= ?
+               ORDER BY a.subject, a.target""",
+            (account, snapshot_date, snapshot_date)).fetchall()
+
+        role_hashes = {}
+        statements = {}
+        for role_key, digest, statement in rows:
+            role_hashes.setdefault(role_key, []).append(digest)
+            statements[digest] = json.loads(statement)
+
+        # roles without statements still exist on that date
+        for (role_key,) in self.conn.execute(
+                "SELECT role_key FROM roles WHERE account = ? AND snapshot_date = ?", (account, snapshot_date)):
+            role_hashes.setdefault(role_key, [])
+
+        index = PolicyIndex()
+        for role_key, hashes in role_hashes.items():
+            index.set_role_hashes(role_key, hashes, statements)
+        return index
+
+    def policy_diff(self, account='default', start=None, end=None):
+        from policy_index import diff_policies
+
+        return diff_policies(self.policy_index_on(account, start), self.policy_index_on(account, end))
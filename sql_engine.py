@@ -0,0 +1,121 @@
+import duckdb
+import pandas as pd
+
+
+ROLE_COLUMNS = ['key', '_id', 'name', 'description', 'permission_count', 'members_count', 'teams_count']
+MEMBER_COLUMNS = ['_id', 'email', 'firstName', 'lastName', 'role', 'customRoles_count', 'hasCustomRoles',
+                  'teams_count', 'isTeamMember', 'isTeamMaintainer', '_pendingInvite', '_verified',
+                  '_lastSeen', 'creationDate', 'days_since_last_seen']
+TEAM_COLUMNS = ['key', 'name', 'description', 'customRoleKeys_count', '_lastModified']
+
+EXAMPLE_QUERY = """SELECT r.key, COUNT(DISTINCT e.member_id) AS members
+FROM roles r
+LEFT JOIN member_effective_roles e ON e.role_key = r.key
+GROUP BY r.key
+ORDER BY members DESC
+LIMIT 20"""
+
+
+def _scalar_columns(df, columns):
+    return df[[column for column in columns if column in df.columns]].copy()
+
+
+def _pairs(df, id_column, list_column, names):
+    # one row per (id, item) of a list column
+    pairs = df[[id_column, list_column]].explode(list_column).dropna(subset=[list_column])
+    pairs.columns = names
+    return pairs.reset_index(drop=True)
+
+
+def _policy_tables(roles_df, policy_index):
+    # the policy column holds statement hashes, the statements are in the policy index
+    statements = roles_df[['key', 'policy']].explode('policy').dropna(subset=['policy'])
+    statements['statement_index'] = statements.groupby(level=0).cumcount()
+    statements = statements.reset_index(drop=True)
+
+    policy = pd.json_normalize(policy_index.resolve(statements['policy']))
+    policy_statements = pd.DataFrame({
+        'role_key': statements['key'],
+        'statement_index': statements['statement_index'],
+        'effect': policy['effect'] if 'effect' in policy else None,
+    })
+
+    resources = []
+    actions = []
+    for column, negated in (('resources', False), ('notResources', True)):
+        if column in policy:
+            resources.append(_statement_items(policy_statements, policy[column], 'resource', negated))
+    for column, negated in (('actions', False), ('notActions', True)):
+        if column in policy:
+            actions.append(_statement_items(policy_statements, policy[column], 'action', negated))
+
+    statement_resources = pd.concat(resources, ignore_index=True) if resources else pd.DataFrame(
+        columns=['role_key', 'statement_index', 'resource', 'negated'])
+    statement_actions = pd.concat(actions, ignore_index=True) if actions else pd.DataFrame(
+        columns=['role_key', 'statement_index', 'action', 'negated'])
+
+    return policy_statements, statement_resources, statement_actions
+
+
+def _statement_items(policy_statements, items, name, negated):
+    df = policy_statements[['role_key', 'statement_index']].copy()
+    df[name] = items.values
+    df = df.explode(name).dropna(subset=[name])
+    df['negated'] = negated
+    return df.reset_index(drop=True)
+
+
+def build_tables(transformer):
+    roles_df = transformer.get_roles_df()
+    members_df = transformer.get_members_df()
+    teams_df = transformer.get_teams_df()
+
+    policy_statements, statement_resources, statement_actions = _policy_tables(roles_df, transformer.get_policy_index())
+
+    return {
+        'roles': _scalar_columns(roles_df, ROLE_COLUMNS),
+        'members': _scalar_columns(members_df, MEMBER_COLUMNS),
+        'teams': _scalar_columns(teams_df, TEAM_COLUMNS),
+        'policy_statements': policy_statements,
+        'statement_resources': statement_resources,
+        'statement_actions': statement_actions,
+        'member_roles': _pairs(members_df, '_id', 'customRoles', ['member_id', 'role_key']),
+        'member_teams': _pairs(members_df, '_id', 'team_list', ['member_id', 'team_key']),
+        'team_roles': _pairs(teams_df, 'key', 'customRoleKeys', ['team_key', 'role_key']),
+    }
+
+
+class PolicySQL:
+    def __init__(self, transformer):
+        self.conn = duckdb.connect(database=":memory:")
+        self.tables = build_tables(transformer)
+
+        for name, df in self.tables.items():
+            self.conn.register(f"{name}_df", df)
+            self.conn.execute(f"CREATE TABLE {name} AS SELECT * FROM {name}_df")
+            self.conn.unregister(f"{name}_df")
+
+        self.conn.execute("""
+            CREATE VIEW member_effective_roles AS
+            SELECT member_id, role_key, 'direct' AS source, NULL AS team_key FROM member_roles
+            UNION ALL
+            SELECT mt.member_id, tr.role_key, 'team' AS source, mt.team_key
+            FROM member_teams mt JOIN team_roles tr ON tr.team_key = mt.team_key
+        """)
+
+        # Queries come from the UI and only see the tables above: no files, extensions, attached
+        # databases or Python variables, and a locked configuration so a query can not undo it
+        self.conn.execute("SET enable_external_access = false")
+        self.conn.execute("SET lock_configuration = true")
+
+    def query(self, sql):
+        return self.conn.execute(sql).df()
+
+    def table_names(self):
+        return list(self.tables.keys()) + ['member_effective_roles']
+
+    def describe(self, table):
+        return self.conn.execute(f"DESCRIBE {table}").df()[['column_name', 'column_type']]
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,35 @@
+import streamlit as st
+
+from sql_engine import EXAMPLE_QUERY, PolicySQL
+
+
+class SQLTab:
+    def __init__(self, transformer):
+        self.engine = PolicySQL(transformer)
+
+    def _render_schema(self):
+        with st.expander("Tables"):
+            for table in self.engine.table_names():
+                st.markdown(f"**{table}**")
+                st.dataframe(self.engine.describe(table), hide_index=True, use_container_width=True)
+
+    def _render_query(self):
+        sql = st.text_area("SQL", value=EXAMPLE_QUERY, height=200, key="sql_query")
+        if not st.button("Run", key="sql_run_button"):
+            return
+
+        try:
+            result = self.engine.query(sql)
+        except Exception as e:
+            st.error(f"{e}")
+            return
+
+        st.markdown(f'##### Rows:{len(result)}')
+        st.dataframe(result, hide_index=True, use_container_width=True)
+
+    def render(self):
+        col1, col2 = st.columns([0.7, 0.3])
+        with col1:
+            self._render_query()
+        with col2:
+            self._render_schema()
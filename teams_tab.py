@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+from custom_utils import memoize
+
 
 class TeamsTab:
     def __init__(self, roles, metrics, members, teams):
@@ -18,13 +20,18 @@ class TeamsTab:
         with col2:
             self._assigned_team_roles_chart()
 
-    def _most_assigned_roles_chart(self):
+    @memoize
+    def _top_team_roles_df(self, top_limit=5):
         df = pd.DataFrame(self.roles)
-        top_5 = 5
-        top_df = df.nlargest(top_5, "teams_count")
+        top_df = df.nlargest(top_limit, "teams_count")
         top_df.index = top_df['teams_count']
 
         top_df.sort_index(ascending=True, inplace=True)
+        return top_df
+
+    def _most_assigned_roles_chart(self):
+        top_5 = 5
+        top_df = self._top_team_roles_df(top_5)
 
         fig = px.bar(top_df, x='teams_count', y='key', orientation='h',
                      labels={"key": "Custom Roles", "teams_count": "Teams"},
@@ -1,10 +1,121 @@
 import pandas as pd
 from custom_utils import Utils
+from member_records import MemberRecord, decode_members, dumps, export_member, loads, records_frame
+from role_metrics import RoleAssignmentCounter
+from policy_index import PolicyIndex, with_statements
+import copy
 import datetime
+import hashlib
+
+
+def days_from_today(unix_time_ms, today=None):
+    today = today or datetime.datetime.today()
+    input_dte = datetime.datetime.fromtimestamp(unix_time_ms / 1000)
+    return (today - input_dte).days
+
+
+def prep_member(iter, role_id_map, today=None):
+    # adds the derived member columns in place; shared with the chunked mode
+    if isinstance(iter, MemberRecord):
+        iter.prep(role_id_map)
+        iter.days_since_last_seen = days_from_today(iter._lastSeen, today)
+        return
+
+    iter['quickstartStatus'] = ""
+    iter['hasPermissionGrants'] = False
+    iter['isTeamMaintainer'] = False
+    iter['customRoles_count'] = 0
+    iter['hasCustomRoles'] = False
+    iter['isTeamMember'] = False
+    iter['team_list'] = []
+    iter['teams_count'] = 0
+
+    if iter.get('permissionGrants') is not None and len(iter.get('permissionGrants')) > 0:
+        iter['isTeamMaintainer'] = True
+        iter['hasPermissionGrants'] = True
+
+    iter['customRoles'] = [role_id_map[_id] for _id in iter['customRoles'] if _id in role_id_map]
+    iter['customRoles_count'] = len(iter['customRoles'])
+    iter['hasCustomRoles'] = iter['customRoles_count'] > 0
+
+    if iter.get('teams') is not None and len(iter.get('teams')) > 0:
+        iter['isTeamMember'] = True
+        teams = iter['teams']
+        iter['teams_count'] = len(teams)
+        for team in teams:
+            iter['team_list'].append(team['key'])
+
+    if iter['_lastSeen'] is None or iter['_lastSeen'] < iter['creationDate']:
+        iter['_lastSeen'] = iter['creationDate']
+
+    iter['days_since_last_seen'] = days_from_today(iter['_lastSeen'], today)
+
+
+# members per worker task, shards of a few per worker keep the workers busy until the end
+MIN_SHARD_SIZE = 5_000
+SHARDS_PER_WORKER = 4
+
+# read-only lookups of a member worker process, set once by _init_member_worker
+_worker_lookups = None
+
+
+def _init_member_worker(role_id_map, team_roles, role_keys, today):
+    global _worker_lookups
+    _worker_lookups = (role_id_map, team_roles, role_keys, today)
+
+
+def _decode_shard(data, records):
+    # records stay records and dicts dicts, like the members of the serial loop
+    return decode_members(data) if records else loads(data)
+
+
+def _prep_member_shard(data, records):
+    # runs in a worker: the prepared members as JSON, their role counts and effective access
+    from access_graph import effective_access
+
+    role_id_map, team_roles, role_keys, today = _worker_lookups
+    members = _decode_shard(data, records)
+    counter = RoleAssignmentCounter()
+    member_access = {}
+    for member in members:
+        prep_member(member, role_id_map, today)
+        counter.set_member(member['_id'], member['customRoles'])
+        member_access[member['_id']] = effective_access(member['customRoles'], member['team_list'], team_roles, role_keys)
+    return dumps(members), counter, member_access
+
+
+def member_shards(members, workers):
+    # contiguous shards, encoded as JSON for the workers
+    shard_size = max(MIN_SHARD_SIZE, -(-len(members) // (workers * SHARDS_PER_WORKER)))
+    return [dumps(members[start:start + shard_size]) for start in range(0, len(members), shard_size)]
+
+
+# id field of each source list, the key a delta refers to its items by
+SOURCE_KEYS = {"teams": "key", "roles": "key", "members": "_id"}
+
+
+def _digest(item):
+    return hashlib.blake2b(dumps(item), digest_size=16).digest()
+
+
+def source_digests(ld_data):
+    # Content digest per raw item, taken before process() prepares the items in place. Role
+    # policies are left out, diff_policies tells which of them changed by their policy hash.
+    digests = {name: {item[key]: _digest(item) for item in ld_data[name]}
+               for name, key in SOURCE_KEYS.items() if name != "roles"}
+    digests["roles"] = {role["key"]: _digest({field: value for field, value in role.items() if field != "policy"})
+                        for role in ld_data["roles"]}
+    return digests
+
+
+def members_frame(members):
+    if len(members) > 0 and all(isinstance(member, MemberRecord) for member in members):
+        return records_frame(members)
+    return pd.DataFrame(members)
 
 
 class Transformer():
-    def __init__(self, ld_data=None, save=False):
+    def __init__(self, ld_data=None, save=False, workers=1):
         self.teams_source, self.roles_source, self.members_source = ld_data.values()
         self.roles_df = None
         self.policies = {}
@@ -12,6 +123,40 @@ class Transformer():
         self.members_df = None
         self.summary_metrics = {}
         self.save = save
+        # with workers > 1, members are prepared and counted in a process pool
+        self.workers = workers
+
+        self.role_counter = RoleAssignmentCounter()
+        self.policy_index = PolicyIndex()
+        self._role_id_map = None
+        # prepared source dicts by id, a delta replaces entries and the
+        # DataFrames are rebuilt from them on the next get_*_df()
+        self._roles_by_key = {}
+        self._members_by_id = {}
+        self._teams_by_key = {}
+        self._dirty = set()
+        self._access_graph = None
+        # effective access resolved by the member workers, handed to the access graph
+        self._member_access = None
+        self._what_if = None
+        self._role_bitsets = None
+        self._privilege_scores = None
+
+    def copy(self):
+        # A transformer to apply a delta to while readers keep using this one. The lookups
+        # and counters are copied, prepared items and DataFrames are shared until replaced.
+        other = copy.copy(self)
+        other.policies = dict(self.policies)
+        other.summary_metrics = dict(self.summary_metrics)
+        other.role_counter = self.role_counter.copy()
+        other.policy_index = self.policy_index.copy()
+        other._roles_by_key = dict(self._roles_by_key)
+        other._members_by_id = dict(self._members_by_id)
+        other._teams_by_key = dict(self._teams_by_key)
+        other._dirty = set(self._dirty)
+        # the what-if base reads the role counter of this transformer
+        other._what_if = None
+        return other
 
     def process(self, output_dir=None):
 
@@ -25,215 +170,339 @@ class Transformer():
         self._generate_summary_metrics()
 
         if self.save == True:
-            self._save_data(output_dir)
-
-    def convert_role_id_to_key(self, arr_lookup):
+            self._save_data(output_dir=output_dir)
 
-        role_id_map = {item["_id"]: item["key"] for item in self.roles_source}
-        result = [role_id_map.get(_id, None)
-                  for _id in arr_lookup if _id in role_id_map]
+    def _get_role_id_map(self):
+        if self._role_id_map is None:
+            self._role_id_map = {item["_id"]: item["key"] for item in self.roles_source}
+        return self._role_id_map
 
-        return [key for key in result if key is not None]
+    def convert_role_id_to_key(self, arr_lookup):
+        role_id_map = self._get_role_id_map()
+        return [role_id_map[_id] for _id in arr_lookup if _id in role_id_map]
 
     def _generate_summary_metrics(self):
-        user_assigned_custom_roles = [role for sublist in self.members_df['customRoles']
-                                      for role in sublist]
-
-        team_assigned_custom_roles = [role for sublist in self.teams_df['customRoleKeys']
-                                      for role in sublist]
-        total_custom_role = len(self.roles_df)
-
-        distict_user_assigned_custom_roles = len(
-            set(user_assigned_custom_roles))
-        distict_team_assigned_custom_roles = len(
-            set(team_assigned_custom_roles))
-
-        distinct_combined_roles = set(
-            user_assigned_custom_roles + team_assigned_custom_roles)
-
-        total_assigned_distinct_role = len(distinct_combined_roles)
-
-        orphaned_roles = total_custom_role - len(distinct_combined_roles)
-
-        total_users = len(self.members_df)
-        total_custom_role = len(self.roles_df)
-        total_teams = len(self.teams_df)
-        total_members_custom_roles_count = self.members_df['customRoles_count'].sum(
-        )
-        total_users_custom_roles_count = self.teams_df['customRoleKeys_count'].sum(
-        )
-        total_permissions_count = self.roles_df['permission_count'].sum()
-        self.summary_metrics = {
-            'role_to_user_ratio': total_members_custom_roles_count / total_users,
-            'role_to_team_ratio': total_users_custom_roles_count / total_teams,
-            'total_custom_role': total_custom_role,
-
-            'orphaned_roles': orphaned_roles,
-
-            'permission_to_role_ratio':  total_permissions_count / total_custom_role,
-
-            'user_assigned_custom_roles': user_assigned_custom_roles,
-            'team_assigned_custom_roles': team_assigned_custom_roles,
-            'total_assigned_roles': total_assigned_distinct_role,
-            'distict_user_assigned_custom_roles': distict_user_assigned_custom_roles,
-            'distict_team_assigned_custom_roles': distict_team_assigned_custom_roles,
-
-        }
+        self.summary_metrics = self.role_counter.summary_metrics()
 
         return self.summary_metrics
 
     def _update_members_assigned_roles(self):
-
-        member_lookup = {m["_id"]: m["customRoles"]
-                         for m in self.members_df.to_dict(orient="records")}
-        role_lookup = {
-            r["key"]: r for r in self.roles_df.to_dict(orient="records")}
-
-        for role_key, role_data in role_lookup.items():
-            for member_id, member_roles in member_lookup.items():
-                if "members" not in role_data:
-                    role_data['members'] = []
-                    role_data['members_count'] = 0
-
-                if role_key in member_roles:
-                    role_data["members"].append(member_id)
-                    role_data['members_count'] += 1
-
-        self.roles_df = pd.DataFrame(role_lookup.values())
+        counter = self.role_counter
+        self.roles_df['members'] = [counter.members_with_role(key) for key in self.roles_df['key']]
+        self.roles_df['members_count'] = [counter.member_role_counts.get(key, 0) for key in self.roles_df['key']]
 
     def _update_teams_assigned_roles(self):
-
-        team_lookup = {t["key"]: t["customRoleKeys"]
-                       for t in self.teams_df.to_dict(orient="records")}
-        role_lookup = {
-            r["key"]: r for r in self.roles_df.to_dict(orient="records")}
-        for role_key, role_data in role_lookup.items():
-            for team_key, team_data in team_lookup.items():
-                if "teams" not in role_data:
-                    role_data['teams'] = []
-                    role_data['teams_count'] = 0
-
-                if role_key in team_data:
-                    role_data["teams"].append(team_key)
-                    role_data['teams_count'] += 1
-
-        self.roles_df = pd.DataFrame(role_lookup.values())
+        counter = self.role_counter
+        self.roles_df['teams'] = [counter.teams_with_role(key) for key in self.roles_df['key']]
+        self.roles_df['teams_count'] = [counter.team_role_counts.get(key, 0) for key in self.roles_df['key']]
+
+    def _prep_roles_item(self, iter):
+        # True when the role is new or its policy changed
+        changed = self.policy_index.set_role(iter['key'], iter['policy'])
+        # statement hashes, each statement is stored once in the policy index
+        self.policies[iter.get('_id')] = list(self.policy_index.role_statements[iter['key']])
+        # count numbe rof permission statements in the policy
+        iter['permission_count'] = len(iter['policy'])
+
+        self._roles_by_key[iter['key']] = iter
+        self.role_counter.set_role(iter['key'], iter['permission_count'])
+        return changed
 
     def _prep_roles(self):
         roles = []
         for iter in self.roles_source:
+            self._prep_roles_item(iter)
+            roles.append(iter)
 
-            _id = iter.get('_id')
-
-            policy = iter['policy']
-            self.policies[_id] = policy
-            # count numbe rof permission statements in the policy
-            iter['permission_count'] = len(policy)
+        self.roles_df = self._roles_frame(roles)
 
-            roles.append(iter)
+    def _roles_frame(self, roles):
+        # the policy column holds statement hashes like policies, see with_statements
+        role_statements = self.policy_index.role_statements
+        return pd.DataFrame([dict(role, policy=list(role_statements[role['key']])) for role in roles])
 
-        self.roles_df = pd.DataFrame(roles)
+    def _prep_members_item(self, iter, today=None):
+        prep_member(iter, self._get_role_id_map(), today)
 
-    def _days_from_today(self, unix_time_ms):
+    def _prep_members(self):
+        # one reference time for the run, the serial and parallel paths give the same days
         today = datetime.datetime.today()
-        input_dte = datetime.datetime.fromtimestamp(unix_time_ms / 1000)
-        return (today - input_dte).days
-
-    def _prep_members_item(self, iter):
-        iter['quickstartStatus'] = ""
-        iter['hasPermissionGrants'] = False
-        iter['isTeamMaintainer'] = False
-        iter['customRoles_count'] = 0
-        iter['hasCustomRoles'] = False
-        iter['isTeamMember'] = False
-        iter['team_list'] = []
-        iter['teams_count'] = 0
-
-        if iter.get('permissionGrants') is not None and len(iter.get('permissionGrants')) > 0:
-            iter['isTeamMaintainer'] = True
-            iter['hasPermissionGrants'] = True
-
-        iter['customRoles'] = self.convert_role_id_to_key(iter['customRoles'])
-        iter['customRoles_count'] = len(iter['customRoles'])
-        iter['hasCustomRoles'] = iter['customRoles_count'] > 0
-
-        if iter.get('teams') is not None and len(iter.get('teams')) > 0:
-            iter['isTeamMember'] = True
-            teams = iter['teams']
-            iter['teams_count'] = len(teams)
-            for team in teams:
-                iter['team_list'].append(team['key'])
-
-        if iter['_lastSeen'] is None or iter['_lastSeen'] < iter['creationDate']:
-            iter['_lastSeen'] = iter['creationDate']
-
-        iter['days_since_last_seen'] = self._days_from_today(iter['_lastSeen'])
+        if self.workers > 1 and len(self.members_source) > MIN_SHARD_SIZE:
+            kinds = {isinstance(member, MemberRecord) for member in self.members_source}
+            if len(kinds) == 1:
+                self._prep_members_parallel(kinds.pop(), today)
+                return
 
-    def _prep_members(self):
         members = []
         for iter in self.members_source:
-            self._prep_members_item(iter)
+            self._prep_members_item(iter, today)
+            self._members_by_id[iter['_id']] = iter
+            self.role_counter.set_member(iter['_id'], iter['customRoles'])
             members.append(iter)
 
-        self.members_df = pd.DataFrame(members)
+        self.members_df = members_frame(members)
+
+    def _prep_members_parallel(self, records, today):
+        # Contiguous shards are prepared in worker processes with the role and team lookups,
+        # and merged in shard order: the members, role counts and member order per role are
+        # those of the serial loop. Members travel as JSON, decoded as records or as dicts
+        # like they came in, so a mix of both stays serial. Teams are only read here.
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        from access_graph import valid_team_roles
+
+        role_keys = {role['key'] for role in self.roles_source}
+        team_roles = valid_team_roles([team['key'] for team in self.teams_source],
+                                      [team['customRoleKeys'] for team in self.teams_source], role_keys)
+        lookups = (self._get_role_id_map(), team_roles, role_keys, today)
+        shards = member_shards(self.members_source, self.workers)
+
+        members = []
+        self._member_access = {}
+        # spawn so workers do not inherit the threads of a running Streamlit server
+        mp_context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=mp_context,
+                                 initializer=_init_member_worker, initargs=lookups) as executor:
+            for shard, counter, member_access in executor.map(_prep_member_shard, shards,
+                                                              [records] * len(shards)):
+                members.extend(_decode_shard(shard, records))
+                self.role_counter.merge_members(counter)
+                self._member_access.update(member_access)
+
+        # the prepared copies replace the source members, in place like the serial loop prepares them
+        self.members_source[:] = members
+        self._members_by_id.update((member['_id'], member) for member in members)
+        self.members_df = members_frame(members)
+
+    def _prep_teams_item(self, iter):
+        iter['customRoleKeys_count'] = len(iter['customRoleKeys'])
+
+        self._teams_by_key[iter['key']] = iter
+        self.role_counter.set_team(iter['key'], iter['customRoleKeys'])
 
     def _prep_teams(self):
         teams = []
         for iter in self.teams_source:
-            _id = iter.get('_id')
-            iter['customRoleKeys_count'] = len(iter['customRoleKeys'])
+            self._prep_teams_item(iter)
             teams.append(iter)
 
         self.teams_df = pd.DataFrame(teams)
 
+    def _drop_role_from_members(self, role_key):
+        for member_id in self.role_counter.members_with_role(role_key):
+            # a copy, the item may be shared with the transformer this one was copied from
+            member = copy.copy(self._members_by_id[member_id])
+            self._members_by_id[member_id] = member
+            member['customRoles'] = [key for key in member['customRoles'] if key != role_key]
+            member['customRoles_count'] = len(member['customRoles'])
+            member['hasCustomRoles'] = member['customRoles_count'] > 0
+            self.role_counter.set_member(member_id, member['customRoles'])
+
+    def _drop_role_from_teams(self, role_key):
+        for team_key in self.role_counter.teams_with_role(role_key):
+            team = copy.copy(self._teams_by_key[team_key])
+            self._teams_by_key[team_key] = team
+            team['customRoleKeys'] = [key for key in team['customRoleKeys'] if key != role_key]
+            team['customRoleKeys_count'] = len(team['customRoleKeys'])
+            self.role_counter.set_team(team_key, team['customRoleKeys'])
+
+    def apply_delta(self, roles=None, removed_roles=None, members=None, removed_members=None,
+                    teams=None, removed_teams=None):
+        # Changed items are raw API dicts, removals are role keys, member ids and team keys.
+        # Metrics and per-role counts are updated in O(change); the DataFrames are rebuilt lazily.
+        # Derived views are only dropped when their inputs changed: the access graph and what-if
+        # base on the role keys, members and teams, role mining and privileges also on policies.
+        access_changed = False
+        policy_changed = False
+        for role in roles or []:
+            access_changed |= role['key'] not in self._roles_by_key
+            policy_changed |= self._prep_roles_item(role)
+            self._role_id_map = None
+        for role_key in removed_roles or []:
+            role = self._roles_by_key.pop(role_key, None)
+            if role is None:
+                continue
+            self.policies.pop(role.get('_id'), None)
+            self.role_counter.remove_role(role_key)
+            self.policy_index.remove_role(role_key)
+            # the API drops assignments of a deleted role
+            self._drop_role_from_members(role_key)
+            self._drop_role_from_teams(role_key)
+            self._role_id_map = None
+            access_changed = True
+            self._dirty.update(['members', 'teams'])
+
+        if roles or removed_roles:
+            self.roles_source = list(self._roles_by_key.values())
+            self._dirty.add('roles')
+
+        for member in members or []:
+            self._prep_members_item(member)
+            self._members_by_id[member['_id']] = member
+            self.role_counter.set_member(member['_id'], member['customRoles'])
+        for member_id in removed_members or []:
+            if self._members_by_id.pop(member_id, None) is not None:
+                self.role_counter.remove_member(member_id)
+
+        if members or removed_members:
+            self._dirty.update(['roles', 'members'])
+            access_changed = True
+
+        for team in teams or []:
+            self._prep_teams_item(team)
+        for team_key in removed_teams or []:
+            if self._teams_by_key.pop(team_key, None) is not None:
+                self.role_counter.remove_team(team_key)
+
+        if teams or removed_teams:
+            self._dirty.update(['roles', 'teams'])
+            access_changed = True
+
+        if access_changed:
+            self._access_graph = None
+            self._member_access = None
+            self._what_if = None
+        if access_changed or policy_changed:
+            self._role_bitsets = None
+            self._privilege_scores = None
+        return self._generate_summary_metrics()
+
+    def source_delta(self, ld_data, digests, previous_digests, changed_policies=()):
+        # apply_delta arguments that bring this transformer from the fetch of previous_digests
+        # to ld_data, see source_digests, with changed_policies the keys of the roles whose
+        # policy changed. Unchanged members are prepared again when their days since last
+        # seen moved on, a full process() would count them from today.
+        delta = {}
+        for name, key in SOURCE_KEYS.items():
+            current, previous = digests[name], previous_digests[name]
+            delta[name] = [item for item in ld_data[name] if previous.get(item[key]) != current[item[key]]]
+            delta[f"removed_{name}"] = [item_key for item_key in previous if item_key not in current]
+
+        changed_policies = set(changed_policies).difference(role['key'] for role in delta["roles"])
+        delta["roles"] += [role for role in ld_data["roles"] if role["key"] in changed_policies]
+
+        today = datetime.datetime.today()
+        current, previous = digests["members"], previous_digests["members"]
+        delta["members"] += [member for member in ld_data["members"]
+                             if previous.get(member["_id"]) == current[member["_id"]]
+                             and self._seen_days_changed(member["_id"], today)]
+        return delta
+
+    def _seen_days_changed(self, member_id, today):
+        member = self._members_by_id.get(member_id)
+        return member is not None and days_from_today(member['_lastSeen'], today) != member['days_since_last_seen']
+
+    def _rebuild_dataframes(self):
+        if 'members' in self._dirty:
+            self.members_source = list(self._members_by_id.values())
+            self.members_df = members_frame(self.members_source)
+        if 'teams' in self._dirty:
+            self.teams_source = list(self._teams_by_key.values())
+            self.teams_df = pd.DataFrame(self.teams_source)
+        if 'roles' in self._dirty:
+            self.roles_df = self._roles_frame(self.roles_source)
+            self._update_members_assigned_roles()
+            self._update_teams_assigned_roles()
+
+        self._dirty.clear()
+
+    def get_access_graph(self):
+        # built on first use and kept until a delta changes the data
+        if self._access_graph is None:
+            from access_graph import AccessGraph
+            self._access_graph = AccessGraph(self.get_members_df(), self.get_teams_df(), self.get_roles_df(),
+                                             self._member_access)
+            self._member_access = None
+        return self._access_graph
+
+    def get_what_if(self):
+        # base state of what-if scenarios, built on first use like the access graph
+        if self._what_if is None:
+            from what_if import WhatIfSimulator
+            self._what_if = WhatIfSimulator(self)
+        return self._what_if
+
+    def get_role_bitsets(self):
+        if self._role_bitsets is None:
+            from role_mining import RoleBitsets
+            self._role_bitsets = RoleBitsets(self.get_access_graph().member_access, self.get_policy_index(),
+                                             self.get_roles_df()['key'])
+        return self._role_bitsets
+
+    def get_privilege_scores(self):
+        # effective privilege breadth and risk score per member, built on first use
+        if self._privilege_scores is None:
+            self._privilege_scores = self._score_privileges()
+        return self._privilege_scores
+
+    def _score_privileges(self):
+        from privilege import score_members
+        return score_members(self)
+
     def get_summary_metrics(self):
         return self.summary_metrics
 
+    def get_role_counter(self):
+        return self.role_counter
+
+    def get_policy_index(self):
+        return self.policy_index
+
     def get_members_df(self):
+        if self._dirty:
+            self._rebuild_dataframes()
         return self.members_df
 
     def get_roles_df(self):
+        if self._dirty:
+            self._rebuild_dataframes()
         return self.roles_df
 
     def get_teams_df(self):
+        if self._dirty:
+            self._rebuild_dataframes()
         return self.teams_df
 
+    def get_sources(self):
+        # the prepared teams, roles and members, e.g. the ld_data of a transformer a delta was applied to
+        if self._dirty:
+            self._rebuild_dataframes()
+        return {"teams": self.teams_source, "roles": self.roles_source, "members": self.members_source}
+
     def get_policies(self) -> dict:
         return self.policies
 
     def _save_data(self, msg=None, output_dir='output'):
         prefix = "transformed-"
         Utils.save_data_to_file(
-            self.roles_df.to_dict(orient="records"), f"{output_dir}/{prefix}roles.json")
+            with_statements(self.roles_df, self.policy_index).to_dict(orient="records"),
+            f"{output_dir}/{prefix}roles.json")
 
         Utils.save_data_to_file(
             self.teams_df.to_dict(orient="records"), f"{output_dir}/{prefix}teams.json")
 
-        Utils.save_data_to_file(
-            self.members_df.to_dict(orient="records"), f"{output_dir}/{prefix}members.json")
+        if any(isinstance(member, MemberRecord) for member in self.members_source):
+            # the members as the API sent them plus the derived fields, without NaN for keys they lack
+            members = [export_member(member) for member in self.members_source]
+        else:
+            members = self.members_df.to_dict(orient="records")
+        Utils.save_data_to_file(members, f"{output_dir}/{prefix}members.json")
 
-        Utils.save_data_to_file(
-            self.policies, f"{output_dir}/{prefix}policies.json")
+        policies = {_id: self.policy_index.resolve(hashes) for _id, hashes in self.policies.items()}
+        Utils.save_data_to_file(policies, f"{output_dir}/{prefix}policies.json")
 
 
 def main():
-
-    roles = Utils.read_json_file("./output/roles.json")
-    teams = Utils.read_json_file("./output/teams.json")
-    members = Utils.read_json_file("./output/members.json")
-    transformer = Transformer(roles=roles, members=members, teams=teams)
-    transformer.process()
-
-    Utils.save_data_to_file(
-        transformer.roles, "./output/transformer-out-roles.json")
-
-    Utils.save_data_to_file(
-        transformer.teams, "./output/transformer-out-teams.json")
-
-    Utils.save_data_to_file(
-        transformer.members, "./output/transformer-out-members.json")
-
-    members_df = transformer.member_df
+    output_dir = "./output"
+    ld_data = {
+        "teams": Utils.read_json_file(f"{output_dir}/teams.json"),
+        "roles": Utils.read_json_file(f"{output_dir}/roles.json"),
+        "members": Utils.read_json_file(f"{output_dir}/members.json"),
+    }
+    transformer = Transformer(ld_data=ld_data)
+    transformer.process(output_dir=output_dir)
+
+    members_df = transformer.get_members_df()
     print(members_df['customRoles'])
     print(members_df['customRoles_count'].mean())
 
@@ -0,0 +1,97 @@
+import datetime
+
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+
+from custom_utils import memoize
+from policy_index import diff_rows, diff_summary
+
+
+DEFAULT_METRICS = ['orphaned_roles', 'role_to_user_ratio', 'inactive_members_with_roles']
+
+
+class TrendsTab:
+    def __init__(self, store, account='default'):
+        self.store = store
+        self.account = account
+
+    def _select_range(self):
+        first, last = self.store.date_range(self.account)
+        first = datetime.date.fromisoformat(first)
+        last = datetime.date.fromisoformat(last)
+        default_start = max(first, last - datetime.timedelta(days=90))
+
+        selected = st.date_input("Date range", value=(default_start, last),
+                                 min_value=first, max_value=last, key=f"trends_range_{self.account}")
+        if isinstance(selected, (tuple, list)) and len(selected) == 2:
+            return selected[0].isoformat(), selected[1].isoformat()
+        return default_start.isoformat(), last.isoformat()
+
+    def _render_metric_trends(self, start, end):
+        metric_names = self.store.metric_names(self.account)
+        metrics = st.multiselect("Metrics", metric_names,
+                                 default=[m for m in DEFAULT_METRICS if m in metric_names],
+                                 key=f"trends_metrics_{self.account}")
+        if len(metrics) == 0:
+            return
+
+        df = self.store.metric_trends(self.account, start, end, metrics)
+        if df.empty:
+            st.info("No snapshots in the selected range.")
+            return
+
+        fig = px.line(df.reset_index(), x='snapshot_date', y=metrics, markers=True,
+                      labels={"snapshot_date": "Date", "value": "Value", "metric": "Metric"},
+                      title="Metrics over Time")
+        st.plotly_chart(fig, theme="streamlit")
+
+    def _render_role_trends(self, start, end):
+        df = self.store.role_trends(self.account, start=start, end=end)
+        if df.empty:
+            return
+
+        role_key = st.selectbox("Custom Role", sorted(df['role_key'].unique()),
+                                key=f"trends_role_{self.account}")
+        role_df = df[df['role_key'] == role_key]
+        fig = px.line(role_df, x='snapshot_date', y=['members_count', 'teams_count', 'permission_count'],
+                      markers=True,
+                      labels={"snapshot_date": "Date", "value": "Count", "variable": ""},
+                      title=f"{role_key} over Time")
+        st.plotly_chart(fig, theme="streamlit")
+
+    @memoize
+    def _policy_diff(self, start, end):
+        return self.store.policy_diff(self.account, start, end)
+
+    def _render_policy_changes(self, start, end):
+        st.markdown(f"##### Policy Changes {start} to {end}")
+        diff = self._policy_diff(start, end)
+        summary = diff_summary(diff)
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Roles Added", summary['added_roles'])
+        col2.metric("Roles Removed", summary['removed_roles'])
+        col3.metric("Roles Changed", summary['changed_roles'])
+        col4.metric("Statements Changed",
+                    summary['added_statements'] + summary['removed_statements'] + summary['modified_statements'])
+
+        rows = diff_rows(diff)
+        if len(rows) == 0:
+            st.info("No policy changes in the selected range.")
+            return
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+
+    def render(self):
+        if self.store.date_range(self.account)[0] is None:
+            st.info("No history yet. Set SAVE_HISTORY=True to record a snapshot on every run.")
+            return
+
+        start, end = self._select_range()
+        col1, col2 = st.columns([0.5, 0.5])
+        with col1:
+            self._render_metric_trends(start, end)
+        with col2:
+            self._render_role_trends(start, end)
+
+        self._render_policy_changes(start, end)
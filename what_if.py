@@ -0,0 +1,212 @@
+from collections import Counter
+
+from access_graph import DIRECT
+from role_metrics import RoleAssignmentOverlay
+from snapshot_store import INACTIVE_DAYS
+
+
+class WhatIfSimulator:
+    # Base state for what-if scenarios: effective access per member (from the access
+    # graph), team membership and the active member role counts behind role utilization.
+    # Built once per transformer, each Scenario then only touches the members and roles
+    # its changes affect.
+
+    def __init__(self, transformer):
+        graph = transformer.get_access_graph()
+        members = transformer.get_members_df()
+
+        self.counter = transformer.get_role_counter()
+        self.member_access = graph.member_access
+        self.member_labels = graph.member_labels
+
+        self.member_teams = dict(zip(members['_id'], members['team_list']))
+        self.team_members = {}
+        for member_id, team_list in self.member_teams.items():
+            for team_key in team_list:
+                self.team_members.setdefault(team_key, []).append(member_id)
+
+        # same population as MembersTab: members seen in the last INACTIVE_DAYS days
+        self.active_members = {member_id for member_id, days in zip(members['_id'], members['days_since_last_seen'])
+                               if days <= INACTIVE_DAYS}
+        self.active_role_counts = Counter()
+        self.active_with_roles = 0
+        for member_id in self.active_members:
+            access = self.member_access.get(member_id)
+            if access:
+                self.active_with_roles += 1
+                self.active_role_counts.update(access.keys())
+
+    def scenario(self, changes=()):
+        # changes are (Scenario method name, *args) tuples, e.g. ("remove_team_role", team_key, role_key)
+        scenario = Scenario(self)
+        for name, *args in changes:
+            getattr(scenario, name)(*args)
+        return scenario
+
+
+def overall_utilization(role_counts, active_with_roles):
+    # mean of the per-role rates of MembersTab, over the roles active members hold
+    if active_with_roles == 0 or len(role_counts) == 0:
+        return 0.0
+    return sum(role_counts.values()) / active_with_roles / len(role_counts) * 100
+
+
+class Scenario:
+    # Hypothetical changes as an overlay on a WhatIfSimulator. The base state is never
+    # modified; changed role lists and memberships are kept here, and the members whose
+    # effective access may change are collected for result().
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.overlay = RoleAssignmentOverlay(simulator.counter)
+        self.removed_roles = set()
+        # changed entries only, the rest falls through to the simulator
+        self.member_teams = {}
+        self.team_members = {}
+        self.affected = set()
+
+    def _team_members(self, team_key):
+        return self.team_members.get(team_key, self.simulator.team_members.get(team_key, []))
+
+    def _member_teams(self, member_id):
+        return self.member_teams.get(member_id, self.simulator.member_teams.get(member_id, []))
+
+    def _teams_with_role(self, role_key):
+        teams = set(self.simulator.counter.teams_with_role(role_key))
+        teams.update(key for key, roles in self.overlay.team_roles.items() if roles and role_key in roles)
+        return [key for key in teams if role_key in (self.overlay.team_role_keys(key) or [])]
+
+    def _members_with_role(self, role_key):
+        members = set(self.simulator.counter.members_with_role(role_key))
+        members.update(key for key, roles in self.overlay.member_roles.items() if roles and role_key in roles)
+        return [key for key in members if role_key in (self.overlay.member_role_keys(key) or [])]
+
+    def _known(self, team_key=None, member_id=None):
+        # changes kept across data reloads may refer to teams or members that are gone
+        counter = self.simulator.counter
+        return ((team_key is None or team_key in counter.team_roles)
+                and (member_id is None or member_id in self.simulator.member_teams))
+
+    def _set_team_roles(self, team_key, role_keys):
+        self.overlay.set_team(team_key, role_keys)
+        self.affected.update(self._team_members(team_key))
+
+    def _set_member_roles(self, member_id, role_keys):
+        self.overlay.set_member(member_id, role_keys)
+        self.affected.add(member_id)
+
+    def remove_role(self, role_key):
+        # like deleting the role through the API, its assignments go with it
+        for member_id in self._members_with_role(role_key):
+            self._set_member_roles(member_id, [key for key in self.overlay.member_role_keys(member_id) if key != role_key])
+        for team_key in self._teams_with_role(role_key):
+            self._set_team_roles(team_key, [key for key in self.overlay.team_role_keys(team_key) if key != role_key])
+        self.overlay.remove_role(role_key)
+        self.removed_roles.add(role_key)
+
+    def remove_team_role(self, team_key, role_key):
+        if not self._known(team_key=team_key):
+            return
+        role_keys = self.overlay.team_role_keys(team_key) or []
+        self._set_team_roles(team_key, [key for key in role_keys if key != role_key])
+
+    def add_team_role(self, team_key, role_key):
+        if not self._known(team_key=team_key):
+            return
+        role_keys = self.overlay.team_role_keys(team_key) or []
+        if role_key not in role_keys and role_key not in self.removed_roles:
+            self._set_team_roles(team_key, role_keys + [role_key])
+
+    def remove_member_role(self, member_id, role_key):
+        if not self._known(member_id=member_id):
+            return
+        role_keys = self.overlay.member_role_keys(member_id) or []
+        self._set_member_roles(member_id, [key for key in role_keys if key != role_key])
+
+    def add_member_role(self, member_id, role_key):
+        if not self._known(member_id=member_id):
+            return
+        role_keys = self.overlay.member_role_keys(member_id) or []
+        if role_key not in role_keys and role_key not in self.removed_roles:
+            self._set_member_roles(member_id, role_keys + [role_key])
+
+    def remove_team_member(self, team_key, member_id):
+        if not self._known(team_key, member_id):
+            return
+        self.member_teams[member_id] = [key for key in self._member_teams(member_id) if key != team_key]
+        self.team_members[team_key] = [key for key in self._team_members(team_key) if key != member_id]
+        self.affected.add(member_id)
+
+    def add_team_member(self, team_key, member_id):
+        if not self._known(team_key, member_id) or team_key in self._member_teams(member_id):
+            return
+        self.member_teams[member_id] = self._member_teams(member_id) + [team_key]
+        self.team_members[team_key] = self._team_members(team_key) + [member_id]
+        self.affected.add(member_id)
+
+    def member_access(self, member_id):
+        # role key -> [DIRECT and/or team keys] after the changes
+        access = {}
+        for role_key in self.overlay.member_role_keys(member_id) or []:
+            access.setdefault(role_key, []).append(DIRECT)
+        for team_key in self._member_teams(member_id):
+            for role_key in self.overlay.team_role_keys(team_key) or []:
+                access.setdefault(role_key, []).append(team_key)
+        return access
+
+    def result(self):
+        simulator = self.simulator
+        access_changes = []
+        role_counts = Counter(simulator.active_role_counts)
+        active_with_roles = simulator.active_with_roles
+
+        for member_id in sorted(self.affected, key=str):
+            before = simulator.member_access.get(member_id, {})
+            after = self.member_access(member_id)
+            member = simulator.member_labels.get(member_id, member_id)
+            for role_key in sorted(set(before) | set(after)):
+                if role_key in before and role_key not in after:
+                    change = "loses access"
+                elif role_key in after and role_key not in before:
+                    change = "gains access"
+                elif sorted(before[role_key]) != sorted(after[role_key]):
+                    change = "keeps access"
+                else:
+                    continue
+                access_changes.append({"member": member, "role": role_key, "change": change,
+                                       "before": _describe_paths(before.get(role_key)),
+                                       "after": _describe_paths(after.get(role_key))})
+
+            if member_id in simulator.active_members:
+                role_counts.subtract(before.keys())
+                role_counts.update(after.keys())
+                active_with_roles += (len(after) > 0) - (len(before) > 0)
+
+        role_counts = +role_counts
+        changed_roles = sorted({row["role"] for row in access_changes} | self.removed_roles)
+        utilization = []
+        for role_key in changed_roles:
+            before = _rate(simulator.active_role_counts.get(role_key, 0), simulator.active_with_roles)
+            after = _rate(role_counts.get(role_key, 0), active_with_roles)
+            utilization.append({"role": role_key, "before": before, "after": after,
+                                "change": round(after - before, 2)})
+
+        return {
+            "summary_metrics_before": simulator.counter.summary_metrics(),
+            "summary_metrics": self.overlay.summary_metrics(),
+            "utilization_before": overall_utilization(simulator.active_role_counts, simulator.active_with_roles),
+            "utilization": overall_utilization(role_counts, active_with_roles),
+            "access_changes": access_changes,
+            "members_losing_access": len({row["member"] for row in access_changes if row["change"] == "loses access"}),
+            "role_utilization": utilization,
+        }
+
+
+def _rate(count, total):
+    return round(count / total * 100, 2) if total else 0.0
+
+
+def _describe_paths(paths):
+    if not paths:
+        return ""
+    return ", ".join("direct" if path == DIRECT else f"team {path}" for path in paths)
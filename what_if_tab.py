@@ -0,0 +1,127 @@
+import time
+
+import streamlit as st
+import pandas as pd
+
+
+MAX_SEARCH_RESULTS = 200
+
+# label -> (Scenario method, its arguments)
+CHANGES = {
+    "Delete role": ("remove_role", ("role",)),
+    "Detach role from team": ("remove_team_role", ("team", "role")),
+    "Attach role to team": ("add_team_role", ("team", "role")),
+    "Remove role from member": ("remove_member_role", ("member", "role")),
+    "Assign role to member": ("add_member_role", ("member", "role")),
+    "Remove member from team": ("remove_team_member", ("team", "member")),
+    "Add member to team": ("add_team_member", ("team", "member")),
+}
+
+METRICS = [
+    ('total_assigned_roles', "Assigned Roles", "{}"),
+    ('orphaned_roles', "Orphaned Roles", "{}"),
+    ('role_to_user_ratio', "Role to User Ratio", "{:.2f}"),
+    ('role_to_team_ratio', "Role to Team Ratio", "{:.2f}"),
+]
+
+
+class WhatIfTab:
+    def __init__(self, transformer, account='default'):
+        self.simulator = transformer.get_what_if()
+        members = transformer.get_members_df()
+        self.member_emails = dict(zip(members['email'], members['_id'])) if 'email' in members else {}
+        self.role_keys = sorted(transformer.get_roles_df()['key'])
+        self.team_keys = sorted(transformer.get_teams_df()['key'])
+        # (Scenario method, *args) tuples and their labels, they survive reloads of the data
+        self.changes = st.session_state.setdefault(f"what_if_changes_{account}", [])
+        self.labels = st.session_state.setdefault(f"what_if_labels_{account}", [])
+
+    def _select_member(self):
+        search = st.text_input("Search member", key="what_if_member_search", placeholder="email")
+        search = (search or "").lower()
+        options = [email for email in self.member_emails if search in str(email).lower()][:MAX_SEARCH_RESULTS]
+        selected = st.selectbox("Member", options, key="what_if_member")
+        return self.member_emails.get(selected)
+
+    def _role_options(self, scenario, method, team_key, member_id):
+        # removals only offer what the team or member holds with the changes so far
+        if method == "remove_team_role":
+            return scenario.overlay.team_role_keys(team_key) or []
+        if method == "remove_member_role":
+            return scenario.overlay.member_role_keys(member_id) or []
+        return [key for key in self.role_keys if key not in scenario.removed_roles]
+
+    def _render_change_form(self, scenario):
+        label = st.selectbox("Change", list(CHANGES), key="what_if_change")
+        method, params = CHANGES[label]
+
+        team_key = st.selectbox("Team", self.team_keys, key="what_if_team") if "team" in params else None
+        member_id = self._select_member() if "member" in params else None
+        role_key = None
+        if "role" in params:
+            role_key = st.selectbox("Role", self._role_options(scenario, method, team_key, member_id),
+                                    key="what_if_role")
+
+        values = {"team": team_key, "member": member_id, "role": role_key}
+        args = tuple(values[param] for param in params)
+        # callbacks run before the rerun, so the results already include the change
+        st.button("Add change", key="what_if_add", disabled=any(arg is None for arg in args),
+                  on_click=self._add_change, args=(label, method, params, args))
+
+    def _add_change(self, label, method, params, args):
+        self.changes.append((method, *args))
+        described = ", ".join(f"{param} {self.simulator.member_labels.get(arg, arg) if param == 'member' else arg}"
+                              for param, arg in zip(params, args))
+        self.labels.append(f"{label}: {described}")
+
+    def _clear_changes(self):
+        self.changes.clear()
+        self.labels.clear()
+
+    def _render_changes(self):
+        st.markdown("##### Changes")
+        if len(self.changes) == 0:
+            st.caption("No changes yet.")
+            return
+
+        for label in self.labels:
+            st.markdown(f"- {label}")
+        st.button("Clear changes", key="what_if_clear", on_click=self._clear_changes)
+
+    def _render_result(self, result, elapsed_ms):
+        before = result['summary_metrics_before']
+        after = result['summary_metrics']
+
+        columns = st.columns(len(METRICS) + 2)
+        for column, (key, label, fmt) in zip(columns, METRICS):
+            column.metric(label, fmt.format(after[key]), fmt.format(after[key] - before[key]), delta_color="off")
+        columns[-2].metric("Utilization Rate", f"{result['utilization']:.2f}%",
+                           f"{result['utilization'] - result['utilization_before']:.2f}%", delta_color="off")
+        columns[-1].metric("Members Losing Access", result['members_losing_access'])
+        st.caption(f"Simulated in {elapsed_ms:.1f} ms")
+
+        st.markdown("##### Access Changes")
+        st.dataframe(pd.DataFrame(result['access_changes'], columns=["member", "role", "change", "before", "after"]),
+                     hide_index=True, use_container_width=True)
+
+        st.markdown("##### Role Utilization last 30 days")
+        st.dataframe(pd.DataFrame(result['role_utilization'], columns=["role", "before", "after", "change"]),
+                     hide_index=True, use_container_width=True)
+
+    def render(self):
+        start = time.perf_counter()
+        scenario = self.simulator.scenario(self.changes)
+        result = scenario.result() if self.changes else None
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        col1, col2 = st.columns([0.35, 0.65])
+        with col1:
+            self._render_change_form(scenario)
+            self._render_changes()
+
+        with col2:
+            if result is None:
+                st.info("Add a change to see which members lose access and how the metrics shift. "
+                        "Nothing is changed in LaunchDarkly.")
+                return
+            self._render_result(result, elapsed_ms)